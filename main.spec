@@ -5,13 +5,18 @@ import os
 src_dir = os.path.join(os.getcwd(), 'src')  # 等价于 D:\tank_war\src
 
 # 所有自定义模块列表
-CUSTOM_MODULES = ['tank', 'map', 'sound_manager', 'bullet', 'game_objects']
+CUSTOM_MODULES = ['tank', 'map', 'sound_manager', 'bullet', 'game_objects', 'asset_pack', 'chunked_map']
+
+# 资源包：打包前先运行 python src/asset_pack.py build 生成 build/assets.pack
+# （音效已转换为混音器格式、地图已预编译、缩略图已绘制），存在时只打包这一个文件，否则打包散装的 assets 目录
+ASSET_PACK = os.path.join(os.getcwd(), 'build', 'assets.pack')
+DATAS = [(ASSET_PACK, '.')] if os.path.exists(ASSET_PACK) else [('assets', 'assets')]
 
 a = Analysis(
     ['src\\main.py'],
     pathex=[src_dir],  # 告诉PyInstaller src目录的位置
     binaries=[],
-    datas=[('assets', 'assets')],  # 打包资源
+    datas=DATAS,  # 打包资源（资源包或散装目录）
     hiddenimports=CUSTOM_MODULES,  # 强制包含所有自定义模块
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# 游戏模块之间按顶层模块互相导入（from tank import Tank），
+# 因此无论以 python -m src 还是 python src 启动，都先把本目录加入搜索路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+if __name__ == "__main__":
+    from cli import main
+    main()
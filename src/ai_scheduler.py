@@ -0,0 +1,87 @@
+import time
+import weakref
+
+# 按与玩家的距离划分决策频率：(距离上限, 每几帧决策一次)
+DEFAULT_RATES = ((250, 1), (450, 2), (float("inf"), 4))
+DEFAULT_BUDGET_MS = 3.0  # 每帧AI决策的时间预算（毫秒）
+MAX_DEFER = 8  # 单个坦克最多连续推迟决策的帧数，超过后不受预算限制
+
+
+class AIScheduler:
+    """AI决策调度器：按距离降频、错开各坦克的决策帧，并限制每帧的决策耗时
+
+    到期的坦克执行完整决策（ai_think），其余坦克只执行廉价的惯性步（ai_coast）。
+    预算用完后剩余的到期坦克顺延到下一帧，推迟最久的优先；BOSS 每帧都决策。
+    """
+    def __init__(self, budget_ms=DEFAULT_BUDGET_MS, rates=DEFAULT_RATES, max_defer=MAX_DEFER):
+        self.budget = budget_ms / 1000.0
+        self.rates = tuple((distance * distance, interval) for distance, interval in rates)
+        self.max_defer = max_defer
+        self.frame = 0
+        self._next_phase = 0
+        # 坦克 -> [错峰相位, 距上次决策的帧数]；坦克被清理后自动移除
+        self._state = weakref.WeakKeyDictionary()
+
+        # 最近一帧的统计（调试与性能测试用）
+        self.last_thinks = 0
+        self.last_deferred = 0
+        self.last_ms = 0.0
+
+    def reset(self):
+        self.frame = 0
+        self._next_phase = 0
+        self._state.clear()
+
+    def interval_for(self, tank, target):
+        """根据与目标的距离返回决策间隔（帧）"""
+        if tank.is_boss:
+            return 1
+        dx = tank.rect.centerx - target.rect.centerx
+        dy = tank.rect.centery - target.rect.centery
+        dist_sq = dx * dx + dy * dy
+        for limit, interval in self.rates:
+            if dist_sq <= limit:
+                return interval
+        return self.rates[-1][1]
+
+    def update(self, tanks, target, game_map, sound_manager=None, events=None):
+        """推进所有AI坦克一帧"""
+        self.frame += 1
+        due = []
+        coast = []
+        for tank in tanks:
+            if tank.health <= 0:
+                continue
+            state = self._state.get(tank)
+            if state is None:
+                # 新坦克分配递增的相位，使同一波生成的坦克错开决策帧
+                state = [self._next_phase, 0]
+                self._next_phase += 1
+                self._state[tank] = state
+            state[1] += 1
+            interval = self.interval_for(tank, target)
+            # 到达自己的错峰帧，或因预算不足/间隔变化错过了决策帧
+            if (state[1] >= interval and (self.frame + state[0]) % interval == 0) or state[1] > interval:
+                due.append((state[1], tank))
+            else:
+                coast.append(tank)
+
+        # 推迟最久的优先决策
+        due.sort(key=lambda item: -item[0])
+        start = time.perf_counter()
+        deadline = start + self.budget
+        thinks = 0
+        for waited, tank in due:
+            if thinks and waited <= self.max_defer and time.perf_counter() > deadline:
+                coast.append(tank)
+                continue
+            tank.update(None, game_map, target, sound_manager, events, think=True)
+            self._state[tank][1] = 0
+            thinks += 1
+
+        for tank in coast:
+            tank.update(None, game_map, target, sound_manager, events, think=False)
+
+        self.last_thinks = thinks
+        self.last_deferred = len(due) - thinks
+        self.last_ms = (time.perf_counter() - start) * 1000.0
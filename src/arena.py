@@ -0,0 +1,236 @@
+import argparse
+import os
+import random
+import time
+from collections import Counter, deque
+from match import Match
+from recording import RandomPolicy
+from tank_env import ActionKeys
+
+TICK_RATE = 60  # 每个对局的目标帧率（Hz）
+MAX_STRIDE = 8  # 被降速的对局最慢每8个周期推进一帧
+SHED_LOAD = 0.9  # 一个周期的模拟耗时超过周期长度的该比例即视为主机跟不上
+RESTORE_LOAD = 0.6  # 低于该比例视为有余量，可以逐步恢复被降速的对局
+SHED_PATIENCE = 3  # 连续落后几个周期才降速（避免偶发卡顿触发）
+RESTORE_PATIENCE = 60  # 连续有余量几个周期才恢复一次
+HISTORY = 600  # 保留最近多少个周期的耗时用于统计
+
+
+class HostedMatch:
+    """竞技场中托管的一局：独立的对局、随机数生成器、玩家机器人和统计
+
+    priority 越大越重要：主机跟不上时先降速优先级低的对局。
+    """
+    def __init__(self, match_id, seed=0, mode="ENDLESS", map_path=None, priority=0, policy=None):
+        self.id = match_id
+        self.seed = seed
+        self.priority = priority
+        self.rng = random.Random(seed)
+        self.match = Match(map_path, mode, verbose=False, rng=self.rng)
+        self.policy = policy if policy is not None else RandomPolicy(seed)
+        self.keys = ActionKeys()
+        self.stride = 1  # 每几个周期推进一帧（1为全速）
+        self.waited = 0  # 距上次推进经过的周期数
+
+        # 统计
+        self.frames = 0
+        self.cpu_seconds = 0.0
+        self.last_ms = 0.0
+        self.games = 0
+        self.results = Counter()
+
+    def step(self):
+        """推进一帧（对局结束时记录结果并用同一随机序列开始新的一局）"""
+        match = self.match
+        if match.over:
+            self.games += 1
+            self.results[match.result] += 1
+            match.reset()
+        start = time.thread_time()
+        self.keys.set_action(self.policy.act())
+        match.step(self.keys)
+        cost = time.thread_time() - start
+        self.cpu_seconds += cost
+        self.last_ms = cost * 1000.0
+        self.frames += 1
+        self.waited = 0
+
+    def mean_ms(self):
+        return self.cpu_seconds * 1000.0 / self.frames if self.frames else 0.0
+
+
+class ArenaHost:
+    """在一个进程中托管多局互不相关的无界面对局
+
+    每个周期（1/rate 秒）轮转推进所有到期的对局：优先级高的先推进，同优先级的
+    起始位置逐周期轮换；周期时间用完时剩余对局顺延到下一周期。主机持续跟不上时
+    把优先级最低的对局降速（隔几个周期才推进一帧），有余量时再逐步恢复。
+    """
+    def __init__(self, rate=TICK_RATE, shed_load=SHED_LOAD, restore_load=RESTORE_LOAD):
+        self.rate = rate
+        self.period = 1.0 / rate
+        self.shed_load = shed_load
+        self.restore_load = restore_load
+        self.matches = []
+        self.ticks = 0
+        self._next_id = 0
+        self._cursor = 0
+        self._over = 0
+        self._under = 0
+
+        # 统计
+        self.tick_ms = deque(maxlen=HISTORY)
+        self.busy_seconds = 0.0  # 所有周期的模拟耗时总和（含调度开销）
+        self.deferred = 0  # 因周期时间用完被顺延的推进次数
+        self.late_ticks = 0  # 实时运行时落后超过一个周期的次数
+        self.sheds = 0
+        self.restores = 0
+
+    def add(self, seed=None, mode="ENDLESS", map_path=None, priority=0, policy=None):
+        seed = self._next_id if seed is None else seed
+        hosted = HostedMatch(self._next_id, seed, mode, map_path, priority, policy)
+        self._next_id += 1
+        self.matches.append(hosted)
+        return hosted
+
+    def remove(self, hosted):
+        if hosted in self.matches:
+            self.matches.remove(hosted)
+
+    def tick(self):
+        """一个调度周期，返回本周期的模拟耗时（秒）"""
+        self.ticks += 1
+        matches = self.matches
+        if not matches:
+            return 0.0
+        start = time.perf_counter()
+        deadline = start + self.period
+        self._cursor = (self._cursor + 1) % len(matches)
+        order = matches[self._cursor:] + matches[:self._cursor]
+        order.sort(key=lambda hosted: -hosted.priority)
+        for hosted in order:
+            hosted.waited += 1
+            if hosted.waited < hosted.stride:
+                continue
+            if time.perf_counter() > deadline:
+                self.deferred += 1
+                continue
+            hosted.step()
+        elapsed = time.perf_counter() - start
+        self.tick_ms.append(elapsed * 1000.0)
+        self.busy_seconds += elapsed
+        self._balance(elapsed / self.period)
+        return elapsed
+
+    def _balance(self, load):
+        """根据本周期负载调整降速：持续过载时降速，持续有余量时恢复"""
+        if load > self.shed_load:
+            self._over += 1
+            self._under = 0
+        elif load < self.restore_load:
+            self._under += 1
+            self._over = 0
+        else:
+            self._over = self._under = 0
+
+        if self._over >= SHED_PATIENCE:
+            self._over = 0
+            # 按超出的耗时一次降速足够多的对局：优先级最低、当前最快的先降，同等条件下先降开销大的
+            excess_ms = (load - self.shed_load) * self.period * 1000.0
+            candidates = sorted((hosted for hosted in self.matches if hosted.stride < MAX_STRIDE),
+                                key=lambda h: (h.priority, h.stride, -h.mean_ms()))
+            for hosted in candidates:
+                if excess_ms <= 0:
+                    break
+                # 步长翻倍后每周期平均节省 mean/(2*stride)
+                excess_ms -= hosted.mean_ms() / (2 * hosted.stride)
+                hosted.stride *= 2
+                self.sheds += 1
+        elif self._under >= RESTORE_PATIENCE:
+            self._under = 0
+            slowed = [hosted for hosted in self.matches if hosted.stride > 1]
+            if slowed:
+                hosted = max(slowed, key=lambda h: (h.priority, -h.stride))
+                hosted.stride //= 2
+                self.restores += 1
+
+    def run(self, seconds=None, ticks=None, realtime=True):
+        """按固定频率运行（realtime=False 时周期之间不等待，用于测量开销）"""
+        end_time = time.perf_counter() + seconds if seconds is not None else None
+        next_tick = time.perf_counter()
+        count = 0
+        while (ticks is None or count < ticks) and (end_time is None or time.perf_counter() < end_time):
+            self.tick()
+            count += 1
+            if not realtime:
+                continue
+            next_tick += self.period
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -self.period:
+                # 落后超过一个周期时不再追赶，避免之后连续超载
+                self.late_ticks += 1
+                next_tick = time.perf_counter()
+
+    def report(self):
+        """汇总统计：每局开销、整体负载和单核在目标帧率下可托管的对局数"""
+        frames = sum(hosted.frames for hosted in self.matches)
+        cpu = sum(hosted.cpu_seconds for hosted in self.matches)
+        mean_ms = cpu * 1000.0 / frames if frames else 0.0
+        # 按主机实际耗时（含调度开销）折算每帧成本
+        host_ms = self.busy_seconds * 1000.0 / frames if frames else 0.0
+        ordered = sorted(self.tick_ms)
+        return {
+            "matches": len(self.matches),
+            "ticks": self.ticks,
+            "frames": frames,
+            "mean_match_ms": mean_ms,
+            "mean_tick_ms": sum(ordered) / len(ordered) if ordered else 0.0,
+            "p99_tick_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] if ordered else 0.0,
+            # 全速对局数：降速的对局按实际推进频率折算
+            "full_rate_equivalent": sum(1.0 / hosted.stride for hosted in self.matches),
+            "host_ms_per_frame": host_ms,
+            "matches_per_core": self.period * 1000.0 / host_ms if host_ms else 0.0,
+            "deferred": self.deferred,
+            "late_ticks": self.late_ticks,
+            "sheds": self.sheds,
+            "restores": self.restores,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多局托管：在一个进程中以固定频率运行多局无界面对局")
+    parser.add_argument("--matches", type=int, default=24, help="托管的对局数量")
+    parser.add_argument("--low-priority", type=int, default=None, help="其中低优先级对局的数量（默认一半）")
+    parser.add_argument("--seconds", type=float, default=10.0, help="运行时长")
+    parser.add_argument("--rate", type=int, default=TICK_RATE, help="目标帧率（Hz）")
+    parser.add_argument("--mode", choices=["CLASSIC", "ENDLESS"], default="ENDLESS")
+    parser.add_argument("--map", default=None, help="地图文件（默认随机生成）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-realtime", action="store_true", help="周期之间不等待，测量满负荷开销")
+    args = parser.parse_args(argv)
+
+    host = ArenaHost(args.rate)
+    low = args.matches // 2 if args.low_priority is None else args.low_priority
+    for i in range(args.matches):
+        host.add(args.seed + i, args.mode, args.map, priority=0 if i < low else 1)
+
+    host.run(args.seconds, realtime=not args.no_realtime)
+
+    for hosted in host.matches:
+        results = ", ".join(f"{name} {count}" for name, count in sorted(hosted.results.items())) or "-"
+        print(f"对局 {hosted.id:>3} 优先级 {hosted.priority} 种子 {hosted.seed:>4}: {hosted.frames:>6} 帧 "
+              f"({args.rate / hosted.stride:.1f}Hz), 平均 {hosted.mean_ms():.3f}ms/帧, 波次 {hosted.match.current_wave}, "
+              f"已结束 {hosted.games} 局 ({results})")
+    stats = host.report()
+    print(f"共 {stats['matches']} 局, {stats['ticks']} 个周期, {stats['frames']} 帧; "
+          f"周期耗时 平均 {stats['mean_tick_ms']:.2f}ms p99 {stats['p99_tick_ms']:.2f}ms (周期 {host.period * 1000:.2f}ms)")
+    print(f"降速 {stats['sheds']} 次, 恢复 {stats['restores']} 次, 顺延 {stats['deferred']} 次, 落后 {stats['late_ticks']} 次; "
+          f"当前折合全速对局 {stats['full_rate_equivalent']:.1f} 局")
+    print(f"每局每帧平均 {stats['mean_match_ms']:.3f}ms CPU（含调度 {stats['host_ms_per_frame']:.3f}ms）→ 单核 {args.rate}Hz 可托管约 {stats['matches_per_core']:.0f} 局"
+          f"（本机 {os.cpu_count() or 1} 核，多核需每核运行一个进程）")
+
+
+if __name__ == "__main__":
+    main()
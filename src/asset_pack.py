@@ -0,0 +1,291 @@
+import argparse
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+
+PACK_NAME = "assets.pack"  # 打包后位于资源根目录（与 assets 目录同级）
+PACK_PREFIX = "pack:"  # 资源包中文件的路径前缀，如 "pack:maps/镜像战场.twmap"
+MAGIC = b"TWPK"
+VERSION = 1
+ALIGNMENT = 4096  # 每个文件按页对齐，地图可以直接作为 mmap 中的零拷贝视图使用
+# 文件头：魔数, 版本, 保留, 索引偏移, 索引长度
+HEADER = struct.Struct("<4sHHQQ")
+SOUND_EXT = ".pcm"  # 已转换为混音器格式的原始采样
+MAP_EXT = ".twmap"  # 预编译的分块地图（与 chunked_map.CHUNKED_SUFFIX 相同）
+THUMBNAIL_EXT = ".rgb"  # 预先绘制的地图缩略图（RGB原始像素）
+
+_default = None
+_default_loaded = False
+
+
+def is_pack_path(path):
+    return isinstance(path, str) and path.startswith(PACK_PREFIX)
+
+
+def _resource_base():
+    """资源根目录：打包后为 sys._MEIPASS，开发时为项目根目录（与 main.get_resource_path 一致）"""
+    try:
+        return sys._MEIPASS
+    except AttributeError:
+        return os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def find_pack():
+    """资源包路径：TANK_WAR_ASSET_PACK 指定路径（"0" 表示不使用），否则查找资源根目录下的 assets.pack"""
+    setting = os.environ.get("TANK_WAR_ASSET_PACK", "")
+    if setting == "0":
+        return None
+    path = setting or os.path.join(_resource_base(), PACK_NAME)
+    return path if os.path.isfile(path) else None
+
+
+def default_pack():
+    """进程内共用的资源包（首次调用时打开，没有资源包时返回None）"""
+    global _default, _default_loaded
+    if not _default_loaded:
+        _default_loaded = True
+        path = find_pack()
+        if path:
+            try:
+                _default = AssetPack(path)
+                print(f"[资源包] 使用 {path}（{len(_default)} 个文件）")
+            except Exception as e:
+                print(f"[资源包] 打开失败，改用散装资源: {e}")
+    return _default
+
+
+class AssetPack:
+    """只读资源包：一次 mmap 整个文件，按索引取出各个文件的零拷贝视图
+
+    启动时只需打开一个文件、读取一次索引，之后取资源不再访问文件系统。
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, _, index_offset, index_size = HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"不是资源包文件或版本不支持: {path}")
+            index = json.loads(bytes(self._mm[index_offset:index_offset + index_size]).decode("utf-8"))
+        except Exception:
+            self._mm.close()
+            raise
+        self.entries = {name: tuple(entry) for name, entry in index["entries"].items()}  # 名称 -> (偏移, 长度)
+        self.sound_format = tuple(index.get("sound_format", ()))  # 转换音效时的混音器格式
+        self.thumbnail_size = tuple(index.get("thumbnail_size", ()))
+        self.maps = index.get("maps", {})  # 地图文件名（不含扩展名）-> 地图名称
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name):
+        return self._name(name) in self.entries
+
+    @staticmethod
+    def _name(name):
+        return name[len(PACK_PREFIX):] if is_pack_path(name) else name
+
+    def names(self, prefix=""):
+        return [name for name in self.entries if name.startswith(prefix)]
+
+    def locate(self, name):
+        """返回 (mmap, 偏移, 长度)，供需要直接在映射上建视图的读取方使用"""
+        offset, size = self.entries[self._name(name)]
+        return self._mm, offset, size
+
+    def view(self, name):
+        """文件内容的零拷贝 memoryview"""
+        offset, size = self.entries[self._name(name)]
+        return memoryview(self._mm)[offset:offset + size]
+
+    def read(self, name):
+        offset, size = self.entries[self._name(name)]
+        return self._mm[offset:offset + size]
+
+    def load_sound(self, filename):
+        """加载音效：混音器格式与打包时一致时直接使用转换好的采样，否则解码打包的原始WAV"""
+        import pygame
+
+        stem = os.path.splitext(filename)[0]
+        if pygame.mixer.get_init() == self.sound_format and f"sounds/{stem}{SOUND_EXT}" in self.entries:
+            return pygame.mixer.Sound(buffer=self.view(f"sounds/{stem}{SOUND_EXT}"))
+        if f"sounds/{filename}" in self.entries:
+            return pygame.mixer.Sound(file=io.BytesIO(self.read(f"sounds/{filename}")))
+        return None
+
+    def map_paths(self):
+        """资源包中的地图路径列表（"pack:" 开头，可直接传给 Map）"""
+        return [f"{PACK_PREFIX}maps/{stem}{MAP_EXT}" for stem in sorted(self.maps)]
+
+    def thumbnail(self, map_path, size):
+        """预先绘制的缩略图；尺寸不一致或不存在时返回None"""
+        import pygame
+
+        stem = os.path.splitext(os.path.basename(self._name(map_path)))[0]
+        name = f"thumbnails/{stem}{THUMBNAIL_EXT}"
+        if tuple(size) != self.thumbnail_size or name not in self.entries:
+            return None
+        return pygame.image.frombuffer(self.read(name), size, "RGB")
+
+    def close(self):
+        self._mm.close()
+
+
+def build_pack(assets_dir, out_path, mixer_format=None):
+    """构建资源包：音效转换为混音器格式、地图JSON预编译为分块地图并预先绘制缩略图
+
+    mixer_format 为 (频率, 位数, 声道)，默认使用 pygame.mixer.init() 的默认格式（与游戏相同）。
+    原始WAV也一并打包，运行时混音器格式不同时改为解码原始文件。地图的 terrain、tile_hp
+    字段写入分块地图的元数据，使用砖块地形的地图同样预编译。返回各类文件的数量。
+    """
+    import pygame
+    from chunked_map import compile_map_data
+    from thumbnails import THUMBNAIL_SIZE, render_thumbnail
+
+    pygame.mixer.init(*(mixer_format or ()))
+    sound_format = pygame.mixer.get_init()
+    files = {}
+    maps = {}
+
+    sounds_dir = os.path.join(assets_dir, "sounds")
+    for filename in sorted(os.listdir(sounds_dir)) if os.path.isdir(sounds_dir) else []:
+        if not filename.endswith(".wav"):
+            continue
+        path = os.path.join(sounds_dir, filename)
+        with open(path, "rb") as f:
+            files[f"sounds/{filename}"] = f.read()
+        files[f"sounds/{os.path.splitext(filename)[0]}{SOUND_EXT}"] = pygame.mixer.Sound(path).get_raw()
+
+    maps_dir = os.path.join(assets_dir, "maps")
+    for filename in sorted(os.listdir(maps_dir)) if os.path.isdir(maps_dir) else []:
+        if not filename.endswith(".json"):
+            continue
+        stem = os.path.splitext(filename)[0]
+        with open(os.path.join(maps_dir, filename), "r", encoding="utf-8") as f:
+            map_data = json.load(f)
+        files[f"maps/{stem}{MAP_EXT}"], _ = compile_map_data(map_data, stem)
+        thumbnail = render_thumbnail(map_data, THUMBNAIL_SIZE)
+        files[f"thumbnails/{stem}{THUMBNAIL_EXT}"] = pygame.image.tobytes(thumbnail, "RGB")
+        maps[stem] = map_data.get("name", stem)
+    pygame.mixer.quit()
+
+    entries = {}
+    tmp_path = out_path + ".tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(tmp_path, "wb") as f:
+        f.write(b"\0" * HEADER.size)
+        for name, data in files.items():
+            f.write(b"\0" * (-f.tell() % ALIGNMENT))
+            entries[name] = (f.tell(), len(data))
+            f.write(data)
+        index = json.dumps({"entries": entries, "sound_format": sound_format, "thumbnail_size": THUMBNAIL_SIZE,
+                            "maps": maps}, ensure_ascii=False).encode("utf-8")
+        index_offset = f.tell()
+        f.write(index)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, 0, index_offset, len(index)))
+    os.replace(tmp_path, out_path)
+    return {"sounds": sum(name.endswith(SOUND_EXT) for name in files), "maps": len(maps),
+            "sound_format": sound_format, "bytes": os.path.getsize(out_path)}
+
+
+# 冷启动测试在新进程中执行，用 sys._MEIPASS 指向模拟的打包目录（与 PyInstaller 解压后的布局相同）：
+# 导入pygame、初始化混音器、加载音效、列出地图并生成全部缩略图（空缓存，相当于首次启动），最后加载第一张地图
+_STARTUP_PROBE = """
+import os, sys, time, json
+start = time.perf_counter()
+sys._MEIPASS = {bundle!r}
+sys.path.insert(0, {src!r})
+import pygame
+pygame.init()
+import main
+from sound_manager import SoundManager
+from thumbnails import ThumbnailCache
+from map import Map
+t_import = time.perf_counter()
+SoundManager()
+t_sound = time.perf_counter()
+maps = main.load_available_maps()
+cache = ThumbnailCache(cache_dir={cache!r})
+cache.request(maps)
+while cache.pending():
+    time.sleep(0.0005)
+t_thumbs = time.perf_counter()
+Map(maps[0])
+t_map = time.perf_counter()
+print(json.dumps({{"import": t_import - start, "sounds": t_sound - t_import, "thumbnails": t_thumbs - t_sound,
+                  "map": t_map - t_thumbs, "total": t_map - start, "maps": len(maps)}}))
+"""
+
+
+def measure_startup(bundle_dir, runs=5):
+    """在新进程中测量以 bundle_dir 为资源根目录启动时各阶段的耗时（秒，取中位数）"""
+    import subprocess
+    import tempfile
+
+    src = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1")
+    env.pop("TANK_WAR_ASSET_PACK", None)
+    samples = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as cache:
+            output = subprocess.run([sys.executable, "-c", _STARTUP_PROBE.format(bundle=bundle_dir, src=src, cache=cache)],
+                                    env=env, capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {key: sorted(sample[key] for sample in samples)[len(samples) // 2] for key in samples[0]}
+
+
+def benchmark(assets_dir, pack_path, runs=5):
+    """分别模拟打包散装 assets 目录和只打包资源包的目录，比较冷启动各阶段耗时"""
+    import shutil
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as root:
+        loose = os.path.join(root, "loose")
+        packed = os.path.join(root, "packed")
+        shutil.copytree(assets_dir, os.path.join(loose, "assets"))
+        os.makedirs(packed)
+        shutil.copy(pack_path, os.path.join(packed, PACK_NAME))
+        return {"loose": measure_startup(loose, runs), "pack": measure_startup(packed, runs)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="资源包：构建打包用的单文件资源包并测量冷启动耗时")
+    sub = parser.add_subparsers(dest="command", required=True)
+    default_assets = os.path.join(_resource_base(), "assets")
+    default_out = os.path.join(_resource_base(), "build", PACK_NAME)
+
+    build_cmd = sub.add_parser("build", help="构建资源包（PyInstaller 打包前运行）")
+    build_cmd.add_argument("--assets", default=default_assets, help="资源目录")
+    build_cmd.add_argument("-o", "--output", default=default_out)
+
+    bench_cmd = sub.add_parser("bench", help="对比打包散装资源与资源包时的冷启动耗时")
+    bench_cmd.add_argument("--assets", default=default_assets, help="资源目录")
+    bench_cmd.add_argument("--pack", default=default_out)
+    bench_cmd.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        result = build_pack(args.assets, args.output)
+        print(f"已写入 {args.output}: 音效 {result['sounds']} 个（混音器格式 {result['sound_format']}）, "
+              f"地图 {result['maps']} 张, 大小 {result['bytes'] / 1e6:.1f}MB, 耗时 {time.perf_counter() - start:.1f}s")
+        return
+
+    if not os.path.isfile(args.pack):
+        print(f"资源包不存在: {args.pack}（先运行 build）")
+        return
+    results = benchmark(args.assets, args.pack, args.runs)
+    for label, result in (("散装资源", results["loose"]), ("资源包", results["pack"])):
+        print(f"{label}: 总计 {result['total'] * 1000:.0f}ms（导入 {result['import'] * 1000:.0f}ms, "
+              f"音效 {result['sounds'] * 1000:.1f}ms, 地图列表与缩略图 {result['thumbnails'] * 1000:.1f}ms, "
+              f"加载地图 {result['map'] * 1000:.1f}ms）, {result['maps']} 张地图")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+import argparse
+import math
+import os
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import pygame
+
+HORIZON = 30  # 每次推演的帧数
+SPLIT = 10  # 候选计划在第几帧切换到第二段移动方向
+REPLAN = 6  # 每隔几帧重新规划一次（上一次请求完成之前不会再提交）
+WORKER_BUDGET_MS = 12.0  # 工作进程每个任务的推演时间上限（超时只比较已推演的候选计划）
+MAIN_BUDGET_MS = 2.0  # 主线程每帧花在规划上的CPU时间上限（超出时降低规划频率）
+MAX_REPLAN = 30
+RESTORE_LOAD = 0.5  # 主线程耗时低于预算的该比例视为有余量
+RESTORE_PATIENCE = 120  # 连续有余量多少帧才把规划间隔减半一次（逐步回到 REPLAN）
+
+TANK_SIZE = 30
+BULLET_SIZE = 5
+BULLET_SPEED = 5
+BOSS_COOLDOWN = 10
+PLAYER_COOLDOWN = 15
+GUN_OFFSET = 20
+IDEAL_DISTANCE = 200  # BOSS偏好的交战距离
+AIM_TOLERANCE = 18  # 玩家中心到弹道的距离小于该值才开火
+
+DIRECTIONS = [(0, 0), (1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+# 发给工作进程的轻量世界状态（只含推演需要的数值，可直接序列化）
+# boss/player: (x, y, speed, shoot_cooldown)，子弹: (x, y, dx, dy)，obstacles: 障碍物矩形元组
+PlanState = namedtuple("PlanState", "frame boss player player_velocity player_direction boss_bullets player_bullets obstacles")
+
+
+def _aim(dx, dy):
+    """与 Tank._ai_aim 相同的8方向瞄准"""
+    if abs(dx) > abs(dy):
+        if abs(dy) > abs(dx) * 0.3:
+            return (1 if dx > 0 else -1, 1 if dy > 0 else -1)
+        return (1 if dx > 0 else -1, 0)
+    if abs(dx) > abs(dy) * 0.3:
+        return (1 if dx > 0 else -1, 1 if dy > 0 else -1)
+    return (0, 1 if dy > 0 else -1)
+
+
+def _muzzle(x, y, direction):
+    """炮口处的子弹左上角（与 Tank.shoot 一致：按8方向角度偏移）"""
+    angle = math.atan2(-direction[1], direction[0])
+    return (x + TANK_SIZE // 2 + math.cos(angle) * GUN_OFFSET - 2,
+            y + TANK_SIZE // 2 - math.sin(angle) * GUN_OFFSET - 2)
+
+
+def _advance_bullets(bullets, obstacles, target):
+    """推进子弹一帧，返回命中目标的次数（出界或撞上障碍物的子弹移除）"""
+    hits = 0
+    survivors = []
+    for x, y, dx, dy in bullets:
+        x += dx * BULLET_SPEED
+        y += dy * BULLET_SPEED
+        if x < 0 or x > 800 or y < 0 or y > 600:
+            continue
+        rect = pygame.Rect(x, y, BULLET_SIZE, BULLET_SIZE)
+        if rect.colliderect(target):
+            hits += 1
+            continue
+        if rect.collidelist(obstacles) != -1:
+            continue
+        survivors.append((x, y, dx, dy))
+    bullets[:] = survivors
+    return hits
+
+
+def rollout(state, first, second, horizon=HORIZON, split=SPLIT):
+    """按“前 split 帧走 first、之后走 second”的计划推演，返回(得分, 每帧的(dx, dy, 开火))
+
+    玩家按当前速度继续移动，并在冷却结束时沿当前朝向开火（偏悲观的对手模型）；
+    BOSS 每帧瞄准玩家，弹道对准时开火。得分 = 命中玩家 - 被命中 - 偏离理想距离 - 被障碍物挡住。
+    """
+    obstacles = state.obstacles
+    bx, by, boss_speed, boss_cooldown = state.boss
+    px, py, player_speed, player_cooldown = state.player
+    pvx, pvy = state.player_velocity
+    player_direction = state.player_direction
+    boss_bullets = list(state.boss_bullets)
+    player_bullets = list(state.player_bullets)
+    boss_rect = pygame.Rect(bx, by, TANK_SIZE, TANK_SIZE)
+    player_rect = pygame.Rect(px, py, TANK_SIZE, TANK_SIZE)
+    dealt = taken = blocked = 0
+    steps = []
+    for t in range(horizon):
+        dx, dy = first if t < split else second
+        if dx or dy:
+            nx, ny = bx + dx * boss_speed, by + dy * boss_speed
+            boss_rect.topleft = (nx, ny)
+            if 0 <= nx <= 770 and 0 <= ny <= 570 and boss_rect.collidelist(obstacles) == -1:
+                bx, by = nx, ny
+            else:
+                blocked += 1
+            boss_rect.topleft = (bx, by)
+
+        if pvx or pvy:
+            nx, ny = px + pvx, py + pvy
+            player_rect.topleft = (nx, ny)
+            if 0 <= nx <= 770 and 0 <= ny <= 570 and player_rect.collidelist(obstacles) == -1:
+                px, py = nx, ny
+            else:
+                pvx = pvy = 0
+            player_rect.topleft = (px, py)
+
+        # BOSS 瞄准玩家，弹道经过玩家附近时开火
+        vx, vy = px - bx, py - by
+        aim = _aim(vx, vy)
+        fire = False
+        if boss_cooldown <= 0:
+            length = math.hypot(aim[0], aim[1])
+            if abs(vx * aim[1] - vy * aim[0]) / length < AIM_TOLERANCE:
+                fire = True
+                boss_bullets.append(_muzzle(bx, by, aim) + aim)
+                boss_cooldown = BOSS_COOLDOWN
+        else:
+            boss_cooldown -= 1
+        if player_cooldown <= 0:
+            player_bullets.append(_muzzle(px, py, player_direction) + player_direction)
+            player_cooldown = PLAYER_COOLDOWN
+        else:
+            player_cooldown -= 1
+        steps.append((dx, dy, fire))
+
+        dealt += _advance_bullets(boss_bullets, obstacles, player_rect)
+        taken += _advance_bullets(player_bullets, obstacles, boss_rect)
+
+    distance = math.hypot(px - bx, py - by)
+    score = dealt * 10.0 - taken * 14.0 - abs(distance - IDEAL_DISTANCE) / 50.0 - blocked * 0.05
+    return score, steps
+
+
+def candidate_plans():
+    """全部两段式候选计划，直线计划排在前面（时间预算不够时至少比较过它们）"""
+    straight = [(d, d) for d in DIRECTIONS]
+    turns = [(a, b) for a in DIRECTIONS for b in DIRECTIONS if a != b]
+    return straight + turns
+
+
+def plan_chunk(state, plans, budget_ms=WORKER_BUDGET_MS, horizon=HORIZON):
+    """工作进程：在时间预算内推演一组候选计划，返回(最高得分, 计划每帧动作, 推演数量)"""
+    deadline = time.perf_counter() + budget_ms / 1000.0
+    best = None
+    evaluated = 0
+    for first, second in plans:
+        score, steps = rollout(state, first, second, horizon)
+        evaluated += 1
+        if best is None or score > best[0]:
+            best = (score, steps)
+        if time.perf_counter() > deadline:
+            break
+    return best[0], best[1], evaluated
+
+
+def snapshot(match, boss, player_velocity, obstacles):
+    """复制推演需要的数值（主线程上执行，只有几十个元组）"""
+    player = match.player_tank
+    return PlanState(
+        match.frame,
+        (boss.rect.x, boss.rect.y, boss.speed, boss.shoot_cooldown),
+        (player.rect.x, player.rect.y, player.speed, player.shoot_cooldown),
+        player_velocity,
+        player.direction,
+        tuple((b.rect.x, b.rect.y) + tuple(b.direction) for b in boss.bullets if b.active),
+        tuple((b.rect.x, b.rect.y) + tuple(b.direction) for b in player.bullets if b.active),
+        obstacles,
+    )
+
+
+class BossPlanner:
+    """BOSS前瞻规划：在工作进程中推演候选的移动/开火计划，BOSS执行得分最高的计划
+
+    主线程每隔几帧提交一次轻量世界状态，之后每帧只检查结果是否就绪、从不等待；
+    结果到达时按已经过去的帧数跳过计划开头，BOSS逐帧执行剩余步骤，
+    计划用完或规划失败时回到原有的AI。主线程耗时超过预算时自动降低规划频率，持续有余量时再逐步恢复。
+    启用后对局不再可复现（计划到达的时机取决于进程调度）。
+    """
+    def __init__(self, workers=None, replan=REPLAN, worker_budget_ms=WORKER_BUDGET_MS, main_budget_ms=MAIN_BUDGET_MS):
+        self.workers = workers or max(1, min(2, os.cpu_count() or 1))
+        self.replan = replan
+        self.base_replan = replan
+        self._under = 0  # 连续低于预算的帧数
+        self.worker_budget_ms = worker_budget_ms
+        self.main_budget_ms = main_budget_ms
+        self._pool = None
+        self._pending = []
+        self._pending_boss = None
+        self._pending_frame = 0
+        self._last_submit = None
+        self._player_track = None  # (帧号, x, y)，用于估计玩家速度
+        self._obstacles_key = None
+        self._obstacles = ()
+        self.failed = False
+        plans = candidate_plans()
+        # 交错分组：每个任务都包含直线计划
+        self._chunks = [plans[i::self.workers] for i in range(self.workers)]
+
+        # 统计（调试与性能测试用）
+        self.requests = 0
+        self.plans_applied = 0
+        self.plans_dropped = 0
+        self.rollouts = 0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+
+    def start(self):
+        """创建并预热进程池（工作进程在第一次提交时才启动，耗时数毫秒，不应发生在对局中）"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            for _ in range(self.workers):
+                self._pool.submit(candidate_plans)
+        return self._pool
+
+    def _player_velocity(self, match):
+        player = match.player_tank
+        track = self._player_track
+        self._player_track = (match.frame, player.rect.x, player.rect.y)
+        if track is None or match.frame <= track[0]:
+            return (0, 0)
+        frames = match.frame - track[0]
+        vx = (player.rect.x - track[1]) / frames
+        vy = (player.rect.y - track[2]) / frames
+        limit = player.speed
+        return (max(-limit, min(limit, vx)), max(-limit, min(limit, vy)))
+
+    def _obstacle_rects(self, game_map):
+        """障碍物矩形（只在地图变化时重建；砖块地形按仍有砖块的原掩体近似，不考虑被打出的缺口）"""
+        key = (id(game_map), game_map.revision, game_map.cover_count())
+        if key != self._obstacles_key:
+            self._obstacles_key = key
+            self._obstacles = tuple(tuple(obstacle.rect) for obstacle in game_map.cover_obstacles())
+        return self._obstacles
+
+    def update(self, match):
+        """每帧在AI更新之前调用：收取已完成的规划，到时间时提交新的规划请求"""
+        self.last_ms = 0.0
+        if self.failed:
+            return
+        # 按本线程的CPU时间计：单核机器上工作进程抢占造成的等待不算主线程开销
+        start = time.thread_time()
+        boss = match.boss_tank
+        if boss is None or boss.health <= 0 or match.player_tank.health <= 0:
+            self._pending = []
+            self._player_track = None
+            return
+        velocity = self._player_velocity(match)
+        try:
+            self._collect(match, boss)
+            if not self._pending and (self._last_submit is None or match.frame - self._last_submit >= self.replan
+                                      or match.frame < self._last_submit):
+                self._submit(match, boss, velocity)
+        except Exception as e:
+            print(f"BOSS规划失败，改用原有AI: {e}")
+            self.failed = True
+            boss.ai_plan = None
+            return
+        self.last_ms = (time.thread_time() - start) * 1000.0
+        self.max_ms = max(self.max_ms, self.last_ms)
+        self._balance()
+
+    def _balance(self):
+        """超出预算时立即降低规划频率，持续有余量时再逐步恢复（偶发卡顿不会永久降频）"""
+        if self.last_ms > self.main_budget_ms:
+            self.replan = min(self.replan * 2, MAX_REPLAN)
+            self._under = 0
+        elif self.replan > self.base_replan and self.last_ms < self.main_budget_ms * RESTORE_LOAD:
+            self._under += 1
+            if self._under >= RESTORE_PATIENCE:
+                self._under = 0
+                self.replan = max(self.replan // 2, self.base_replan)
+        else:
+            self._under = 0
+
+    def _submit(self, match, boss, velocity):
+        pool = self.start()
+        state = snapshot(match, boss, velocity, self._obstacle_rects(match.game_map))
+        self._pending = [pool.submit(plan_chunk, state, chunk, self.worker_budget_ms) for chunk in self._chunks]
+        self._pending_boss = boss
+        self._pending_frame = match.frame
+        self._last_submit = match.frame
+        self.requests += 1
+
+    def _collect(self, match, boss):
+        if not self._pending or not all(future.done() for future in self._pending):
+            return
+        results = [future.result() for future in self._pending]  # 工作进程中的异常在此抛出
+        self._pending = []
+        if self._pending_boss is not boss:
+            self.plans_dropped += 1
+            return
+        self.rollouts += sum(result[2] for result in results)
+        score, steps, _ = max(results, key=lambda result: result[0])
+        # 结果到达前BOSS已按旧计划或原有AI走了几帧，跳过计划开头对应的步骤
+        skip = match.frame - self._pending_frame
+        if skip >= len(steps):
+            self.plans_dropped += 1
+            return
+        boss.ai_plan = deque(steps[skip:])
+        self.plans_applied += 1
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        self._pending = []
+
+
+def benchmark(frames=900, seed=0, workers=None):
+    """在BOSS波中分别用原有AI和规划器对局，比较玩家受到的伤害和主线程耗时"""
+    import random
+    from match import Match
+    from recording import RandomPolicy
+    from tank_env import ActionKeys
+
+    def run(planner):
+        rng = random.Random(seed)
+        match = Match(None, "ENDLESS", verbose=False, rng=rng, boss_planner=planner)
+        match.current_wave = 5
+        match.spawn_wave()
+        del match.tanks[2:]  # 只保留BOSS，避免小弟干扰比较
+        policy = RandomPolicy(seed)
+        keys = ActionKeys()
+        damage = 0
+        main_ms = []
+        wall_ms = []
+        for _ in range(frames):
+            if match.over or match.boss_tank is None:
+                break
+            health = match.player_tank.health
+            keys.set_action(policy.act())
+            start = time.perf_counter()
+            if planner is not None:
+                planner.update(match)
+                main_ms.append(planner.last_ms)
+                wall_ms.append((time.perf_counter() - start) * 1000.0)
+            match.boss_planner = None  # 规划器已在上面单独计时
+            match.step(keys)
+            match.boss_planner = planner
+            damage += max(0, health - match.player_tank.health)
+            match.keep_player_alive()
+            time.sleep(1 / 60)  # 按实际帧率运行，让工作进程有时间完成推演
+        return damage, main_ms, wall_ms
+
+    baseline, _, _ = run(None)
+    planner = BossPlanner(workers)
+    planner.start()
+    try:
+        planned, main_ms, wall_ms = run(planner)
+    finally:
+        planner.close()
+    main_ms.sort()
+    wall_ms.sort()
+    return {
+        "frames": frames,
+        "baseline_damage": baseline,
+        "planner_damage": planned,
+        "requests": planner.requests,
+        "applied": planner.plans_applied,
+        "dropped": planner.plans_dropped,
+        "rollouts": planner.rollouts,
+        "main_mean_ms": sum(main_ms) / len(main_ms) if main_ms else 0.0,
+        "main_max_ms": main_ms[-1] if main_ms else 0.0,
+        "wall_p99_ms": wall_ms[int(len(wall_ms) * 0.99)] if wall_ms else 0.0,
+        "replan": planner.replan,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="BOSS前瞻规划：与原有AI对比玩家受到的伤害和主线程耗时")
+    parser.add_argument("--frames", type=int, default=900)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="推演进程数")
+    args = parser.parse_args(argv)
+
+    result = benchmark(args.frames, args.seed, args.workers)
+    print(f"{result['frames']} 帧: 原有AI造成伤害 {result['baseline_damage']}, 规划器造成伤害 {result['planner_damage']}")
+    print(f"规划请求 {result['requests']} 次, 采用 {result['applied']} 次, 过期 {result['dropped']} 次, "
+          f"推演 {result['rollouts']} 个计划; 当前规划间隔 {result['replan']} 帧")
+    print(f"主线程CPU耗时: 平均 {result['main_mean_ms']:.3f}ms, 最长 {result['main_max_ms']:.3f}ms (预算 {MAIN_BUDGET_MS}ms); "
+          f"实际经过时间 p99 {result['wall_p99_ms']:.3f}ms（单核时包含被工作进程抢占的时间）")
+
+
+if __name__ == "__main__":
+    main()
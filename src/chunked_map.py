@@ -0,0 +1,448 @@
+import argparse
+import json
+import mmap
+import os
+import random
+import struct
+import time
+from collections import OrderedDict
+import numpy as np
+from game_objects import GameObject
+from asset_pack import default_pack, is_pack_path
+
+CHUNKED_SUFFIX = ".twmap"  # 分块地图文件的扩展名
+MAGIC = b"TWCM"
+VERSION = 1
+CHUNK_SIZE = 256  # 区块边长（像素）
+STREAM_MARGIN = 640  # 以玩家为中心、向四周加载多远的区块（覆盖整个800x600画面）
+MAX_RESIDENT = 64  # 最多同时加载的区块数（LRU淘汰），不足以覆盖加载范围时自动放宽
+LOADS_PER_FRAME = 3  # 每帧最多加载几个区块（由近到远，越过区块边界时分几帧加载完）
+KIND_WALL = 0
+KIND_COVER = 1
+MAP_FIELDS = ("terrain", "tile_hp")  # 预编译时原样保留在元数据中的JSON地图字段
+
+# 文件头：魔数, 版本, 区块边长, 原点x, 原点y, 列数, 行数, 记录数, 掩体最大宽, 最大高, 元数据长度
+HEADER = struct.Struct("<4sHHiiIIIHHI")
+# 区块目录：每个区块的首条记录下标和记录数，按行优先排列
+DIRECTORY_DTYPE = np.dtype([("start", "<u4"), ("count", "<u4")])
+# 障碍物记录：16字节定长
+RECORD_DTYPE = np.dtype([("x", "<i4"), ("y", "<i4"), ("w", "<u2"), ("h", "<u2"),
+                         ("r", "u1"), ("g", "u1"), ("b", "u1"), ("kind", "u1")])
+
+
+def _align(offset, alignment=16):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def _split_wall(x, y, w, h, chunk_size, ox, oy):
+    """把跨区块的墙体按区块网格切开，每段完整位于一个区块内（碰撞结果不变）"""
+    pieces = []
+    col0, col1 = (x - ox) // chunk_size, (x + w - 1 - ox) // chunk_size
+    row0, row1 = (y - oy) // chunk_size, (y + h - 1 - oy) // chunk_size
+    for row in range(row0, row1 + 1):
+        top = max(y, oy + row * chunk_size)
+        bottom = min(y + h, oy + (row + 1) * chunk_size)
+        for col in range(col0, col1 + 1):
+            left = max(x, ox + col * chunk_size)
+            right = min(x + w, ox + (col + 1) * chunk_size)
+            pieces.append((left, top, right - left, bottom - top))
+    return pieces
+
+
+def encode_chunked(walls, covers, name="分块地图", description="", chunk_size=CHUNK_SIZE, extra=None):
+    """把障碍物编码为分块地图的字节内容，返回 (字节, 记录数)
+
+    walls、covers 为 (x, y, 宽, 高, 颜色) 序列。墙体按区块切开；掩体不切（被击中时整体摧毁），
+    归入左上角所在的区块，加载时向左上多取掩体最大尺寸的范围，保证不漏掉跨区块的掩体。
+    extra 为额外写入元数据的地图字段（如 terrain、tile_hp）。
+    """
+    walls = list(walls)
+    covers = list(covers)
+    if not walls and not covers:
+        raise ValueError("地图中没有障碍物")
+    everything = walls + covers
+    ox = min(x for x, _, _, _, _ in everything) // chunk_size * chunk_size
+    oy = min(y for _, y, _, _, _ in everything) // chunk_size * chunk_size
+    right = max(x + w for x, _, w, _, _ in everything)
+    bottom = max(y + h for _, y, _, h, _ in everything)
+    cols = max(1, -(-(right - ox) // chunk_size))
+    rows = max(1, -(-(bottom - oy) // chunk_size))
+
+    rows_out = []
+    for x, y, w, h, color in walls:
+        for piece in _split_wall(x, y, w, h, chunk_size, ox, oy):
+            rows_out.append(piece + tuple(color) + (KIND_WALL,))
+    for x, y, w, h, color in covers:
+        rows_out.append((x, y, w, h) + tuple(color) + (KIND_COVER,))
+    records = np.array(rows_out, dtype=RECORD_DTYPE)
+
+    chunk_index = ((records["y"] - oy) // chunk_size) * cols + (records["x"] - ox) // chunk_size
+    order = np.argsort(chunk_index, kind="stable")
+    records = records[order]
+    counts = np.bincount(chunk_index[order], minlength=cols * rows)
+    directory = np.zeros(cols * rows, dtype=DIRECTORY_DTYPE)
+    directory["count"] = counts
+    directory["start"][1:] = np.cumsum(counts)[:-1]
+
+    cover_mask = records["kind"] == KIND_COVER
+    max_w = int(records["w"][cover_mask].max()) if cover_mask.any() else 0
+    max_h = int(records["h"][cover_mask].max()) if cover_mask.any() else 0
+    meta = json.dumps({"name": name, "description": description, **(extra or {})}, ensure_ascii=False).encode("utf-8")
+
+    directory_offset = _align(HEADER.size + len(meta))
+    records_offset = _align(directory_offset + directory.nbytes)
+    data = bytearray(records_offset + records.nbytes)
+    HEADER.pack_into(data, 0, MAGIC, VERSION, chunk_size, ox, oy, cols, rows, len(records), max_w, max_h, len(meta))
+    data[HEADER.size:HEADER.size + len(meta)] = meta
+    data[directory_offset:directory_offset + directory.nbytes] = directory.tobytes()
+    data[records_offset:] = records.tobytes()
+    return bytes(data), len(records)
+
+
+def write_chunked(path, walls, covers, name="分块地图", description="", chunk_size=CHUNK_SIZE):
+    """把障碍物写成分块地图文件（参数同 encode_chunked），返回写入的记录数"""
+    data, count = encode_chunked(walls, covers, name, description, chunk_size)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return count
+
+
+def compile_map_data(map_data, name, chunk_size=CHUNK_SIZE):
+    """把已解析的JSON地图编码为分块地图（与 Map 加载JSON时使用相同的默认尺寸、颜色和边界），返回 (字节, 记录数)
+
+    砖块地形相关的字段（terrain、tile_hp）原样写入元数据，加载时与JSON地图一样生效。
+    """
+    from map import OBSTACLE_KINDS, obstacle_signature
+
+    (wall_key, wall_size, wall_color), (cover_key, cover_size, cover_color) = OBSTACLE_KINDS
+    walls = [obstacle_signature(obs, wall_size, wall_color) for obs in map_data.get(wall_key, [])]
+    covers = [obstacle_signature(obs, cover_size, cover_color) for obs in map_data.get(cover_key, [])]
+    if not walls:
+        walls = _borders(800, 600)
+    extra = {key: map_data[key] for key in MAP_FIELDS if key in map_data}
+    return encode_chunked(walls, covers, map_data.get("name", name), map_data.get("description", ""), chunk_size, extra)
+
+
+def compile_map(json_path, out_path=None, chunk_size=CHUNK_SIZE):
+    """把JSON地图转换为分块地图文件，返回输出路径"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        map_data = json.load(f)
+    out_path = out_path or os.path.splitext(json_path)[0] + CHUNKED_SUFFIX
+    data, _ = compile_map_data(map_data, os.path.splitext(os.path.basename(json_path))[0], chunk_size)
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def _borders(width, height, color=(100, 100, 100)):
+    """与 Map._generate_borders 相同的四面边界墙"""
+    return [(-10, 0, 10, height, color), (width, 0, 10, height, color),
+            (0, -10, width, 10, color), (0, height, width, 10, color)]
+
+
+def generate_world(path, width=20000, height=20000, covers_per_chunk=6, seed=0, chunk_size=CHUNK_SIZE):
+    """生成一张超大的随机世界（四面边界加逐区块随机掩体），直接写成分块地图文件，返回记录数"""
+    from map_generator import generate_obstacle_rects
+
+    rng = random.Random(seed)
+    covers = []
+    for y0 in range(0, height - chunk_size + 1, chunk_size):
+        for x0 in range(0, width - chunk_size + 1, chunk_size):
+            for x, y, w, h in generate_obstacle_rects(rng, covers_per_chunk, (x0 + 8, y0 + 8, chunk_size - 16, chunk_size - 16)):
+                covers.append((x, y, w, h, (0, 200, 0)))
+    return write_chunked(path, _borders(width, height), covers, f"随机世界 {width}x{height}",
+                         f"种子 {seed}，{len(covers)} 个掩体", chunk_size)
+
+
+class ChunkStream:
+    """用 mmap 打开分块地图，只把焦点附近的区块构造成障碍物对象
+
+    区块目录和记录都是对映射内存的零拷贝视图，打开文件的耗时与地图大小无关。
+    超过 max_chunks 时卸下最久未用的区块，并通知系统回收对应的映射页，
+    常驻的障碍物对象和内存因此有上限。被摧毁的掩体（以及开局时压住坦克而移除的墙体）
+    按 (区块, 记录下标) 记住，区块重新加载时不会复活。path 也可以是资源包中的地图（"pack:" 开头），直接使用资源包的映射。
+    """
+    def __init__(self, path, max_chunks=MAX_RESIDENT, margin=STREAM_MARGIN, loads_per_frame=LOADS_PER_FRAME):
+        if is_pack_path(path):
+            pack = default_pack()
+            if pack is None:
+                raise FileNotFoundError(f"资源包不可用: {path}")
+            self._mm, base, _ = pack.locate(path)
+            self._owns_mm = False
+        else:
+            with open(path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            base = 0
+            self._owns_mm = True
+        try:
+            (magic, version, self.chunk_size, self.origin_x, self.origin_y, self.cols, self.rows,
+             count, self.max_w, self.max_h, meta_len) = HEADER.unpack_from(self._mm, base)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"不是分块地图文件或版本不支持: {path}")
+            meta = json.loads(bytes(self._mm[base + HEADER.size:base + HEADER.size + meta_len]).decode("utf-8"))
+            directory_offset = base + _align(HEADER.size + meta_len)
+            self._records_offset = _align(directory_offset + self.cols * self.rows * DIRECTORY_DTYPE.itemsize)
+            self.directory = np.frombuffer(self._mm, DIRECTORY_DTYPE, self.cols * self.rows, directory_offset)
+            self.records = np.frombuffer(self._mm, RECORD_DTYPE, count, self._records_offset)
+        except Exception:
+            self.directory = self.records = None
+            if self._owns_mm:
+                self._mm.close()
+            raise
+        self.path = path
+        self.name = meta.get("name", os.path.splitext(os.path.basename(path))[0])
+        self.description = meta.get("description", "")
+        self.terrain = meta.get("terrain")  # "tiles" 表示地图要求使用砖块地形
+        self.tile_hp = meta.get("tile_hp")
+        self.margin = margin
+        self.loads_per_frame = loads_per_frame
+        span = (2 * margin + max(self.max_w, self.max_h)) // self.chunk_size + 2
+        self.max_chunks = max(max_chunks, span * span)  # 至少能容纳一次加载范围
+        self.resident = OrderedDict()  # (列, 行) -> (墙体列表, 掩体列表)，按最近使用排序
+        self.destroyed = {}  # (列, 行) -> 已移除障碍物的记录下标集合
+        self._origin = {}  # 已加载的障碍物 -> ((列, 行), 记录下标)
+        self._window = None
+        self._needed = set()
+        self._pending = []  # 加载范围内尚未加载的区块（由近到远）
+
+        # 统计
+        self.loads = 0
+        self.evictions = 0
+        self.peak_objects = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def bounds(self):
+        return (self.origin_x, self.origin_y, self.cols * self.chunk_size, self.rows * self.chunk_size)
+
+    def resident_objects(self):
+        return sum(len(walls) + len(covers) for walls, covers in self.resident.values())
+
+    def focus(self, x, y, complete=False):
+        """以 (x, y) 为中心加载附近的区块并按LRU卸下多余区块
+
+        每帧最多加载 loads_per_frame 个区块，离焦点近的先加载（加载范围留有余量，
+        远处的区块晚几帧加载不影响玩家附近的碰撞）。返回 (新增墙体, 新增掩体, 卸下的障碍物)；
+        焦点仍在同一范围内且没有待加载的区块时直接返回空结果。complete=True 时一次加载完整个范围（开局时使用）。
+        """
+        size = self.chunk_size
+        window = (max(0, int(x - self.margin - self.max_w - self.origin_x) // size),
+                  max(0, int(y - self.margin - self.max_h - self.origin_y) // size),
+                  min(self.cols - 1, int(x + self.margin - self.origin_x) // size),
+                  min(self.rows - 1, int(y + self.margin - self.origin_y) // size))
+        if window == self._window and not self._pending:
+            return (), (), ()
+        if window != self._window:
+            self._window = window
+            col0, row0, col1, row1 = window
+            focus_col = int(x - self.origin_x) // size
+            focus_row = int(y - self.origin_y) // size
+            self._needed = {(col, row) for row in range(row0, row1 + 1) for col in range(col0, col1 + 1)}
+            for key in self._needed:
+                if key in self.resident:
+                    self.resident.move_to_end(key)
+            self._pending = sorted((key for key in self._needed if key not in self.resident),
+                                   key=lambda key: max(abs(key[0] - focus_col), abs(key[1] - focus_row)))
+
+        walls, covers, removed = [], [], []
+        budget = len(self._pending) if complete else self.loads_per_frame
+        loading, self._pending = self._pending[:budget], self._pending[budget:]
+        for key in loading:
+            chunk_walls, chunk_covers = self._load(key)
+            walls.extend(chunk_walls)
+            covers.extend(chunk_covers)
+        while len(self.resident) > self.max_chunks:
+            key = next(iter(self.resident))
+            if key in self._needed:
+                break
+            removed.extend(self._evict(key))
+        self.peak_objects = max(self.peak_objects, self.resident_objects())
+        return walls, covers, removed
+
+    def _load(self, key):
+        col, row = key
+        start, count = (int(value) for value in self.directory[row * self.cols + col])
+        destroyed = self.destroyed.get(key, ())
+        walls, covers = [], []
+        for index, (x, y, w, h, r, g, b, kind) in enumerate(self.records[start:start + count].tolist()):
+            if index in destroyed:
+                continue
+            obstacle = GameObject(x, y, w, h, (r, g, b))
+            self._origin[obstacle] = (key, index)
+            (walls if kind == KIND_WALL else covers).append(obstacle)
+        self.resident[key] = (walls, covers)
+        self.loads += 1
+        return walls, covers
+
+    def _evict(self, key):
+        walls, covers = self.resident.pop(key)
+        for obstacle in walls + covers:
+            self._origin.pop(obstacle, None)
+        self.evictions += 1
+        self._release(key)
+        return walls + covers
+
+    def _release(self, key):
+        """通知系统回收卸下区块的映射页（只能整页回收，与相邻区块共用的首尾页保留）"""
+        if not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        col, row = key
+        start, count = (int(value) for value in self.directory[row * self.cols + col])
+        begin = self._records_offset + start * RECORD_DTYPE.itemsize
+        end = begin + count * RECORD_DTYPE.itemsize
+        begin = _align(begin, mmap.PAGESIZE)
+        end = end // mmap.PAGESIZE * mmap.PAGESIZE
+        if end > begin:
+            try:
+                self._mm.madvise(mmap.MADV_DONTNEED, begin, end - begin)
+            except OSError:
+                pass
+
+    def covers_within(self, width, height):
+        """全部掩体是否都位于 (0, 0, width, height) 范围内"""
+        covers = self.records[self.records["kind"] == KIND_COVER]
+        return bool(((covers["x"] >= 0) & (covers["y"] >= 0) & (covers["x"] + covers["w"] <= width)
+                     & (covers["y"] + covers["h"] <= height)).all())
+
+    def load_all(self):
+        """一次构造全部障碍物（不经过区块流），返回 (墙体列表, 掩体列表)"""
+        walls, covers = [], []
+        for x, y, w, h, r, g, b, kind in self.records.tolist():
+            (walls if kind == KIND_WALL else covers).append(GameObject(x, y, w, h, (r, g, b)))
+        return walls, covers
+
+    def mark_destroyed(self, obstacle):
+        """记录被摧毁的掩体或被移除的墙体（之后重新加载该区块时跳过）"""
+        origin = self._origin.pop(obstacle, None)
+        if origin is None:
+            return
+        key, index = origin
+        self.destroyed.setdefault(key, set()).add(index)
+        for objects in self.resident.get(key, ()):
+            if obstacle in objects:
+                objects.remove(obstacle)
+
+    def close(self):
+        self.directory = self.records = None
+        self.resident.clear()
+        self._origin.clear()
+        if self._owns_mm:
+            self._mm.close()
+
+
+def benchmark(path, json_path=None, frames=3000, speed=6):
+    """从左上角沿对角线以每帧speed像素移动，统计每帧流式加载耗时和常驻障碍物数；给出JSON地图时对比整体加载"""
+    import tracemalloc
+
+    result = {}
+    tracemalloc.start()
+    start = time.perf_counter()
+    stream = ChunkStream(path)
+    result["open_ms"] = (time.perf_counter() - start) * 1000.0
+    result["records"] = len(stream)
+    ox, oy, width, height = stream.bounds()
+    step = speed / 2 ** 0.5
+    focus_ms = []
+    for frame in range(frames):
+        distance = min(frame * step, width, height)
+        start = time.perf_counter()
+        stream.focus(ox + distance, oy + distance)
+        focus_ms.append((time.perf_counter() - start) * 1000.0)
+    result["peak_python_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    focus_ms.sort()
+    result.update(
+        frames=len(focus_ms),
+        focus_mean_ms=sum(focus_ms) / len(focus_ms),
+        focus_p99_ms=focus_ms[int(len(focus_ms) * 0.99)],
+        focus_max_ms=focus_ms[-1],
+        peak_objects=stream.peak_objects,
+        loads=stream.loads,
+        evictions=stream.evictions,
+    )
+    stream.close()
+
+    if json_path:
+        from map import Map
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        game_map = Map(json_path)
+        result["json_load_ms"] = (time.perf_counter() - start) * 1000.0
+        result["json_objects"] = len(game_map.obstacles) + len(game_map.destroyable_obstacles)
+        result["json_peak_python_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return result
+
+
+def _write_json(path, walls, covers, name):
+    """把生成的世界同时写成JSON地图（仅用于与整体加载对比）"""
+    def obstacles(items):
+        return [{"x": x, "y": y, "width": w, "height": h, "color": list(color)} for x, y, w, h, color in items]
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"name": name, "obstacles": obstacles(walls), "destroyable_obstacles": obstacles(covers)}, f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="分块地图：转换、生成超大世界和流式加载测试")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    compile_cmd = sub.add_parser("compile", help="把JSON地图转换为分块地图")
+    compile_cmd.add_argument("json_path")
+    compile_cmd.add_argument("-o", "--output", default=None)
+    compile_cmd.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    generate_cmd = sub.add_parser("generate", help="生成超大随机世界")
+    generate_cmd.add_argument("output")
+    generate_cmd.add_argument("--width", type=int, default=20000)
+    generate_cmd.add_argument("--height", type=int, default=20000)
+    generate_cmd.add_argument("--covers", type=int, default=6, help="每个区块的掩体数量")
+    generate_cmd.add_argument("--seed", type=int, default=0)
+    generate_cmd.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    generate_cmd.add_argument("--json", default=None, help="同时写出等价的JSON地图（用于对比）")
+
+    bench_cmd = sub.add_parser("bench", help="沿对角线移动，测量流式加载耗时和常驻障碍物数")
+    bench_cmd.add_argument("path")
+    bench_cmd.add_argument("--json", default=None, help="对比整体加载的等价JSON地图")
+    bench_cmd.add_argument("--frames", type=int, default=3000)
+    bench_cmd.add_argument("--speed", type=float, default=6, help="每帧移动的像素数")
+    args = parser.parse_args(argv)
+
+    if args.command == "compile":
+        out_path = compile_map(args.json_path, args.output, args.chunk_size)
+        stream = ChunkStream(out_path)
+        print(f"已写入 {out_path}: {len(stream)} 条记录, {stream.cols}x{stream.rows} 个区块")
+        stream.close()
+    elif args.command == "generate":
+        start = time.perf_counter()
+        count = generate_world(args.output, args.width, args.height, args.covers, args.seed, args.chunk_size)
+        print(f"已写入 {args.output}: {count} 条记录, 大小 {os.path.getsize(args.output) / 1e6:.1f}MB, "
+              f"耗时 {time.perf_counter() - start:.1f}s")
+        if args.json:
+            stream = ChunkStream(args.output)
+            walls, covers = [], []
+            for x, y, w, h, r, g, b, kind in stream.records.tolist():
+                (walls if kind == KIND_WALL else covers).append((x, y, w, h, (r, g, b)))
+            name = stream.name
+            stream.close()
+            _write_json(args.json, walls, covers, name)
+            print(f"已写入 {args.json}: 大小 {os.path.getsize(args.json) / 1e6:.1f}MB")
+    else:
+        result = benchmark(args.path, args.json, args.frames, args.speed)
+        print(f"打开 {args.path}: {result['records']} 条记录, 耗时 {result['open_ms']:.2f}ms")
+        print(f"移动 {result['frames']} 帧: 每帧加载 平均 {result['focus_mean_ms']:.3f}ms p99 {result['focus_p99_ms']:.3f}ms "
+              f"最长 {result['focus_max_ms']:.3f}ms; 加载 {result['loads']} 个区块, 卸下 {result['evictions']} 个")
+        print(f"常驻障碍物最多 {result['peak_objects']} 个, Python内存峰值 {result['peak_python_mb']:.1f}MB")
+        if "json_load_ms" in result:
+            print(f"JSON整体加载: {result['json_objects']} 个障碍物, 耗时 {result['json_load_ms']:.0f}ms, "
+                  f"Python内存峰值 {result['json_peak_python_mb']:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
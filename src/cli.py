@@ -0,0 +1,242 @@
+import argparse
+import os
+import sys
+import time
+
+# 各子命令只在执行时导入所需模块：不需要pygame的工具（如遥测汇总、地图生成）几毫秒即可启动
+MODES = ["CLASSIC", "ENDLESS"]
+
+
+def _headless():
+    """无界面运行时使用dummy驱动，并隐藏pygame的欢迎信息（须在导入pygame之前调用）"""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+
+def cmd_play(args):
+    # main 在导入时读取这些配置
+    if args.threaded_render:
+        os.environ["TANK_WAR_THREADED_RENDER"] = "1"
+    if args.telemetry:
+        os.environ["TANK_WAR_TELEMETRY"] = "1"
+    if args.share_world:
+        os.environ["TANK_WAR_SHARE_WORLD"] = "1"
+    if args.tile_terrain:
+        os.environ["TANK_WAR_TILE_TERRAIN"] = "1"
+    if args.ai_budget is not None:
+        os.environ["TANK_WAR_AI_BUDGET_MS"] = str(args.ai_budget)
+    if args.ai_threads is not None:
+        os.environ["TANK_WAR_AI_THREADS"] = str(args.ai_threads)
+    if args.boss_planner:
+        os.environ["TANK_WAR_BOSS_PLANNER"] = "1"
+    if args.inline_waves:
+        os.environ["TANK_WAR_PREBUILD_WAVES"] = "0"
+    from main import main as run_game
+    run_game()
+
+
+def _record_path(path, index, total):
+    if total == 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}_{index}{ext or '.json'}"
+
+
+def cmd_simulate(args):
+    _headless()
+    from recording import Recording, simulate
+
+    total_frames = 0
+    start = time.perf_counter()
+    for i in range(args.matches):
+        seed = args.seed + i
+        recording = Recording(seed, args.map, args.mode)
+        match = None
+        for match in simulate(seed, args.map, args.mode, args.frames, recording=recording):
+            pass
+        total_frames += len(recording)
+        result = match.result if match and match.result else "未结束"
+        print(f"种子 {seed}: {len(recording)} 帧, 结果 {result}, 波次 {match.current_wave}, 等级 {match.player_level}")
+        if args.record:
+            path = _record_path(args.record, i, args.matches)
+            recording.save(path)
+            print(f"  录像已保存: {path}")
+    elapsed = time.perf_counter() - start
+    print(f"共 {args.matches} 局 {total_frames} 帧，耗时 {elapsed:.2f}s（{total_frames / elapsed if elapsed else 0:.0f} 帧/秒）")
+
+
+def cmd_bench(args):
+    _headless()
+    if args.target == "env":
+        import tank_env
+        tank_env.main(["--envs", str(args.envs), "--steps", str(args.steps), "--workers", str(args.workers),
+                       "--mode", args.mode, "--seed", str(args.seed)])
+        return
+
+    import random
+    from match import Match
+    from tank_env import ActionKeys, NUM_ACTIONS
+
+    random.seed(args.seed)
+    match = Match(None, args.mode, verbose=False, ai_budget_ms=args.ai_budget or None)
+    keys = ActionKeys()
+    step_times = []
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        if match.over:
+            match.reset()
+        match.keep_player_alive()
+        keys.set_action(random.randrange(NUM_ACTIONS))
+        step_start = time.perf_counter()
+        match.step(keys)
+        step_times.append((time.perf_counter() - step_start) * 1000)
+    elapsed = time.perf_counter() - start
+    step_times.sort()
+    p99 = step_times[min(len(step_times) - 1, int(len(step_times) * 0.99))]
+    print(f"对局模拟: {args.steps} 帧, {args.steps / elapsed:.0f} 帧/秒, "
+          f"平均 {sum(step_times) / len(step_times):.3f}ms, p99 {p99:.3f}ms, 最长 {step_times[-1]:.3f}ms")
+
+
+def cmd_replay(args):
+    if args.export or args.headless:
+        _headless()
+    from recording import Recording, replay
+
+    recording = Recording.load(args.file)
+    print(f"录像: 种子 {recording.seed}, 模式 {recording.mode}, 地图 {recording.map_path or '默认'}, {len(recording)} 帧")
+
+    if args.export:
+        from video_export import export_match
+        stats = export_match(replay(recording), args.export, args.format, args.workers, max(1, args.every), recording.mode)
+        print(f"导出 {stats['exported']} 帧，耗时 {stats['seconds']:.1f}s")
+        return
+
+    if args.headless:
+        match = None
+        for match in replay(recording):
+            pass
+        if match:
+            print(f"结束于第 {match.frame} 帧, 结果 {match.result or '未结束'}, 波次 {match.current_wave}")
+        return
+
+    # 窗口回放：ESC或关闭窗口退出
+    import pygame
+    from main import SCREEN_WIDTH, SCREEN_HEIGHT, FPS, load_fonts
+    from sprites import SpriteAtlas
+    from render_pipeline import PacketBuilder, FrameRenderer
+    from particles import ParticleSystem, EVENT_KINDS
+
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("坦克大战 - 录像回放")
+    renderer = FrameRenderer(screen, SpriteAtlas(), load_fonts()[0])
+    builder = PacketBuilder()
+    particles = ParticleSystem()
+    clock = pygame.time.Clock()
+    try:
+        for match in replay(recording):
+            if match.frame == 1:
+                match.events.subscribe(particles.handle_events, EVENT_KINDS)
+            particles.update()
+            if any(event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE)
+                   for event in pygame.event.get()):
+                break
+            renderer.render(builder.build(match, recording.mode, particles))
+            pygame.display.flip()
+            clock.tick(FPS * args.speed)
+    finally:
+        pygame.quit()
+
+
+# 已有的独立工具：子命令 -> (模块名, 说明)，参数原样转交给模块的 main(argv)
+TOOLS = {
+    "soak": ("soak", "无尽模式内存浸泡测试"),
+    "mapgen": ("map_generator", "批量生成随机地图"),
+    "report": ("telemetry_report", "汇总对局遥测"),
+    "export": ("video_export", "模拟对局并导出视频"),
+    "particles": ("particles", "粒子系统压力测试"),
+    "world": ("world_share", "读取共享内存世界状态（观战窗口、实时统计）"),
+    "fuzz": ("collision_fuzz", "碰撞检测差分模糊测试"),
+    "terrain": ("tile_terrain", "砖块地形碰撞与重绘性能测试"),
+    "ai": ("parallel_ai", "并行AI性能测试（串行与线程池对比）"),
+    "arena": ("arena", "单进程托管多局无界面对局（负载统计与降速）"),
+    "boss": ("boss_planner", "BOSS前瞻规划与原有AI对比"),
+    "waves": ("wave_builder", "波次预先准备性能对比"),
+    "chunks": ("chunked_map", "分块地图转换、超大世界生成与流式加载测试"),
+    "pack": ("asset_pack", "构建打包用的资源包并测量冷启动耗时"),
+}
+HEADLESS_TOOLS = {"soak", "export", "particles", "terrain", "ai", "arena", "boss", "waves", "chunks", "pack"}
+
+
+def run_tool(name, argv):
+    if name in HEADLESS_TOOLS:
+        _headless()
+    module = __import__(TOOLS[name][0])
+    module.main(argv)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="tank_war", description="坦克大战命令行工具")
+    subparsers = parser.add_subparsers(dest="command", metavar="命令")
+
+    play = subparsers.add_parser("play", help="启动游戏（默认命令）")
+    play.add_argument("--threaded-render", action="store_true", help="在独立线程中渲染对局画面")
+    play.add_argument("--telemetry", action="store_true", help="记录对局遥测")
+    play.add_argument("--share-world", action="store_true", help="把世界状态发布到共享内存（供 world watch/spectate 读取）")
+    play.add_argument("--tile-terrain", action="store_true", help="把可破坏掩体转换为可逐块击碎的砖块地形")
+    play.add_argument("--ai-budget", type=float, default=None, help="每帧AI决策的时间预算（毫秒，0为不限制）")
+    play.add_argument("--ai-threads", type=int, default=None,
+                      help="并行AI线程数（0为不启用；仅在无GIL的解释器上真正并行，否则串行决策）")
+    play.add_argument("--boss-planner", action="store_true", help="BOSS使用前瞻规划（工作进程推演，对局不可复现）")
+    play.add_argument("--inline-waves", action="store_true", help="不预先准备波次，波次切换时当场生成全部敌人")
+    play.set_defaults(func=cmd_play)
+
+    simulate = subparsers.add_parser("simulate", help="无界面自动对局（随机操作玩家）")
+    simulate.add_argument("--matches", type=int, default=1, help="对局数量（种子依次递增）")
+    simulate.add_argument("--frames", type=int, default=3600, help="每局最多模拟的帧数")
+    simulate.add_argument("--seed", type=int, default=0)
+    simulate.add_argument("--map", default=None, help="地图文件（默认随机生成）")
+    simulate.add_argument("--mode", choices=MODES, default="CLASSIC")
+    simulate.add_argument("--record", default=None, help="保存录像的路径（多局时自动加序号）")
+    simulate.set_defaults(func=cmd_simulate)
+
+    bench = subparsers.add_parser("bench", help="性能测试")
+    bench.add_argument("target", nargs="?", choices=["match", "env"], default="match",
+                       help="match: 单局模拟帧耗时; env: 向量化训练环境吞吐量")
+    bench.add_argument("--steps", type=int, default=3000)
+    bench.add_argument("--mode", choices=MODES, default="ENDLESS")
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("--ai-budget", type=float, default=0, help="match: AI调度时间预算（毫秒，0为不调度）")
+    bench.add_argument("--envs", type=int, default=16, help="env: 并行对局数量")
+    bench.add_argument("--workers", type=int, default=0, help="env: 工作进程数")
+    bench.set_defaults(func=cmd_bench)
+
+    replay = subparsers.add_parser("replay", help="回放录像（窗口播放、无界面校验或导出视频）")
+    replay.add_argument("file", help="录像文件")
+    replay.add_argument("--speed", type=float, default=1.0, help="窗口回放速度倍数")
+    replay.add_argument("--headless", action="store_true", help="不打开窗口，只重放并打印结果")
+    replay.add_argument("--export", default=None, help="导出路径（png 为目录，raw 为文件）")
+    replay.add_argument("--format", choices=["png", "raw"], default="png")
+    replay.add_argument("--workers", type=int, default=None, help="导出编码进程数")
+    replay.add_argument("--every", type=int, default=1, help="每隔几帧导出一帧")
+    replay.set_defaults(func=cmd_replay)
+
+    # 已有的独立工具（仅用于帮助信息，实际在解析前直接转交参数）
+    for name, (_, help_text) in TOOLS.items():
+        subparsers.add_parser(name, help=f"{help_text}（参数见 {name} --help）", add_help=False)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in TOOLS:
+        run_tool(argv[0], argv[1:])
+        return
+    # 不带子命令时直接启动游戏
+    args = build_parser().parse_args(argv or ["play"])
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
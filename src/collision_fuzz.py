@@ -0,0 +1,564 @@
+import argparse
+import json
+import random
+import time
+from game_objects import GameObject
+from bullet import Bullet
+from map import Map
+from match import find_bullet_target
+from map_generator import generate_map, SYMMETRIES
+
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 600
+TANK_SIZE = 30
+WALL_COLOR = (100, 100, 100)
+COVER_COLOR = (0, 200, 0)
+TANK_COLOR = (255, 0, 0)
+GRID_CELL = 64  # 网格索引的单元尺寸
+
+# 被检验的碰撞检测：
+#   map_collision  Map.check_collision（坦克移动）
+#   bullet_map     Map.check_bullet_collision（子弹打墙/摧毁掩体，按顺序处理整群子弹）
+#   bullet_object  Bullet.check_collision
+#   bullet_tanks   子弹与坦克的碰撞（match.find_bullet_target）
+CHECKS = ("map_collision", "bullet_map", "bullet_object", "bullet_tanks")
+
+
+# ---------------------------------------------------------------------------
+# 实现：参考实现原样保留当前的逐个扫描逻辑，其余实现必须在所有场景下与它结果一致
+# ---------------------------------------------------------------------------
+
+class LinearReference:
+    """参考实现：当前游戏代码的逐个扫描逻辑的冻结副本（游戏代码被优化后仍以此为准）"""
+    name = "reference"
+
+    def __init__(self, walls, covers):
+        self.walls = walls
+        self.covers = covers
+
+    def check_collision(self, rect):
+        for obstacle in self.walls + self.covers:
+            if rect and obstacle.rect and rect.colliderect(obstacle.rect):
+                return True
+        return False
+
+    def check_bullet_collision(self, bullet):
+        for obstacle in self.walls:
+            if bullet and bullet.rect and obstacle.rect and bullet.rect.colliderect(obstacle.rect):
+                bullet.active = False
+                return True
+        for obstacle in self.covers[:]:
+            if bullet and bullet.rect and obstacle.rect and bullet.rect.colliderect(obstacle.rect):
+                self.covers.remove(obstacle)
+                bullet.active = False
+                return True
+        return False
+
+    def bullet_hits(self, bullet, obj):
+        if bullet.active and bullet.rect.colliderect(obj.rect):
+            bullet.active = False
+            return True
+        return False
+
+    def bullet_target(self, bullet, tanks, shooter):
+        for target in tanks:
+            if target != shooter and target.health > 0 and bullet.rect.colliderect(target.rect):
+                return target
+        return None
+
+
+class LiveCode:
+    """当前游戏代码本身：Map、Bullet 与 match.find_bullet_target（对其做的优化直接接受检验）"""
+    name = "live"
+
+    def __init__(self, walls, covers):
+        # 跳过 Map.__init__（不加载文件、不生成随机掩体），只填入碰撞检测用到的字段
+        self.map = Map.__new__(Map)
+        self.map.obstacles = walls
+        self.map.destroyable_obstacles = covers
+        self.map.cover_index = None
+        self.map.terrain = None  # 砖块地形另有独立的检测，这里只检验矩形掩体
+        self.map.stream = None  # 不使用分块地图流式加载
+
+    def check_collision(self, rect):
+        return self.map.check_collision(rect)
+
+    def check_bullet_collision(self, bullet):
+        return self.map.check_bullet_collision(bullet)
+
+    def bullet_hits(self, bullet, obj):
+        return bullet.check_collision(obj)
+
+    def bullet_target(self, bullet, tanks, shooter):
+        return find_bullet_target(bullet, tanks, shooter)
+
+
+class CollideListIndex:
+    """候选实现：用 Rect.collidelist 在C中按顺序扫描，返回第一个碰撞的下标，顺序语义与逐个扫描相同"""
+    name = "collidelist"
+
+    def __init__(self, walls, covers):
+        self.walls = walls
+        self.covers = covers
+        self._wall_rects = [obstacle.rect for obstacle in walls]
+        self._cover_rects = [obstacle.rect for obstacle in covers]
+
+    def check_collision(self, rect):
+        return rect.collidelist(self._wall_rects) >= 0 or rect.collidelist(self._cover_rects) >= 0
+
+    def check_bullet_collision(self, bullet):
+        rect = bullet.rect
+        if rect.collidelist(self._wall_rects) >= 0:
+            bullet.active = False
+            return True
+        i = rect.collidelist(self._cover_rects)
+        if i >= 0:
+            del self._cover_rects[i]
+            del self.covers[i]
+            bullet.active = False
+            return True
+        return False
+
+    def bullet_hits(self, bullet, obj):
+        if bullet.active and bullet.rect.colliderect(obj.rect):
+            bullet.active = False
+            return True
+        return False
+
+    def bullet_target(self, bullet, tanks, shooter):
+        rects = [tank.rect for tank in tanks]
+        start = 0
+        while True:
+            i = bullet.rect.collidelist(rects[start:])
+            if i < 0:
+                return None
+            target = tanks[start + i]
+            if target is not shooter and target.health > 0:
+                return target
+            start += i + 1
+
+
+class GridIndex:
+    """候选实现：均匀网格空间哈希，只检查查询矩形附近的障碍物，命中多个时取列表中最靠前的"""
+    name = "grid"
+
+    def __init__(self, walls, covers, cell=GRID_CELL):
+        self.cell = cell
+        self.walls = walls
+        self.covers = covers
+        self._wall_grid = self._build(walls)
+        self._cover_grid = self._build(covers)
+
+    def _cells(self, rect):
+        x, y, w, h = rect
+        # 负宽高的矩形同样会发生碰撞，按规范化后的范围登记
+        if w < 0:
+            x, w = x + w, -w
+        if h < 0:
+            y, h = y + h, -h
+        cell = self.cell
+        col0, col1 = x // cell, (x + w - 1) // cell
+        row0, row1 = y // cell, (y + h - 1) // cell
+        if col0 == col1 and row0 == row1:
+            return ((col0, row0),)
+        return [(col, row) for col in range(col0, col1 + 1) for row in range(row0, row1 + 1)]
+
+    def _build(self, objects):
+        grid = {}
+        for order, obj in enumerate(objects):
+            for key in self._cells(obj.rect):
+                grid.setdefault(key, []).append((order, obj))
+        return grid
+
+    def _first(self, grid, rect):
+        """返回与rect碰撞且在原列表中最靠前的 (顺序, 对象)"""
+        best = None
+        for key in self._cells(rect):
+            for entry in grid.get(key, ()):
+                if (best is None or entry[0] < best[0]) and rect.colliderect(entry[1].rect):
+                    best = entry
+        return best
+
+    def check_collision(self, rect):
+        return self._first(self._wall_grid, rect) is not None or self._first(self._cover_grid, rect) is not None
+
+    def check_bullet_collision(self, bullet):
+        rect = bullet.rect
+        if self._first(self._wall_grid, rect) is not None:
+            bullet.active = False
+            return True
+        hit = self._first(self._cover_grid, rect)
+        if hit is None:
+            return False
+        obstacle = hit[1]
+        for key in self._cells(obstacle.rect):
+            self._cover_grid[key].remove(hit)
+        self.covers.remove(obstacle)
+        bullet.active = False
+        return True
+
+    def bullet_hits(self, bullet, obj):
+        if bullet.active and bullet.rect.colliderect(obj.rect):
+            bullet.active = False
+            return True
+        return False
+
+    def bullet_target(self, bullet, tanks, shooter):
+        # 坦克每帧都在移动，建网格的开销高于直接扫描，这里沿用逐个扫描
+        return find_bullet_target(bullet, tanks, shooter)
+
+
+BACKENDS = {cls.name: cls for cls in (LinearReference, LiveCode, CollideListIndex, GridIndex)}
+
+
+# ---------------------------------------------------------------------------
+# 场景：全部由整数列表组成，可以直接保存为JSON并原样复现
+#   walls/covers: [x, y, w, h]    tanks: [x, y, health]
+#   rects: [x, y, w, h]（坦克移动的查询矩形）
+#   bullets: [x, y, active, shooter]（shooter 为开火坦克的下标，-1 表示阵亡坦克遗留的子弹）
+# ---------------------------------------------------------------------------
+
+def _near_edge(rng, rect, width, height):
+    """生成一个紧贴rect某条边（相差-1、0或1像素）的矩形左上角，专门覆盖边界情况"""
+    x, y, w, h = rect
+    if w < 0:
+        x, w = x + w, -w
+    if h < 0:
+        y, h = y + h, -h
+    offset = rng.choice((-1, 0, 1))
+    side = rng.randrange(4)
+    if side == 0:
+        return x - width + offset, rng.randint(y - height, y + h)
+    if side == 1:
+        return x + w + offset, rng.randint(y - height, y + h)
+    if side == 2:
+        return rng.randint(x - width, x + w), y - height + offset
+    return rng.randint(x - width, x + w), y + h + offset
+
+
+def _odd_rect(rng):
+    """退化或极端的障碍物：零宽高、负宽高、覆盖大半屏幕"""
+    kind = rng.randrange(3)
+    x, y = rng.randint(-20, SCREEN_WIDTH), rng.randint(-20, SCREEN_HEIGHT)
+    if kind == 0:
+        return [x, y, rng.choice((0, rng.randint(1, 40))), rng.choice((0, rng.randint(1, 40)))]
+    if kind == 1:
+        return [x, y, rng.randint(-40, -1), rng.randint(-40, 40)]
+    return [x, y, rng.randint(200, 900), rng.randint(200, 700)]
+
+
+def generate_scenario(rng):
+    """随机地图（含对称和墙体）+ 少量极端障碍物 + 坦克 + 查询矩形和子弹群"""
+    map_data = generate_map(rng=rng, obstacles=rng.randint(0, 40), walls=rng.randint(0, 4),
+                            symmetry=rng.choice(SYMMETRIES), min_size=rng.randint(5, 30), max_size=rng.randint(30, 60))
+
+    def rect_of(obs):
+        return [obs["x"], obs["y"], obs["width"], obs["height"]]
+
+    walls = [rect_of(obs) for obs in map_data["obstacles"]]
+    covers = [rect_of(obs) for obs in map_data["destroyable_obstacles"]]
+    for _ in range(rng.randint(0, 3)):
+        (walls if rng.random() < 0.3 else covers).append(_odd_rect(rng))
+    if covers and rng.random() < 0.3:
+        covers.append(list(rng.choice(covers)))  # 完全重叠的掩体：只能摧毁列表中靠前的那个
+
+    targets = walls + covers
+    tanks = []
+    for _ in range(rng.randint(1, 24)):
+        if tanks and rng.random() < 0.2:
+            x, y, _ = rng.choice(tanks)
+            x, y = x + rng.randint(-TANK_SIZE, TANK_SIZE), y + rng.randint(-TANK_SIZE, TANK_SIZE)  # 相互重叠
+        else:
+            x, y = rng.randint(0, SCREEN_WIDTH - TANK_SIZE), rng.randint(0, SCREEN_HEIGHT - TANK_SIZE)
+        tanks.append([x, y, rng.choice((-1, 0, 1, 3, 3, 5, 10))])
+
+    rects = []
+    for _ in range(rng.randint(20, 120)):
+        if targets and rng.random() < 0.5:
+            x, y = _near_edge(rng, rng.choice(targets), TANK_SIZE, TANK_SIZE)
+        else:
+            x, y = rng.randint(-40, SCREEN_WIDTH + 10), rng.randint(-40, SCREEN_HEIGHT + 10)
+        rects.append([x, y, TANK_SIZE, TANK_SIZE])
+
+    bullets = []
+    tank_rects = [[x, y, TANK_SIZE, TANK_SIZE] for x, y, _ in tanks]
+    for _ in range(rng.randint(50, 400)):
+        roll = rng.random()
+        if roll < 0.35 and targets:
+            x, y = _near_edge(rng, rng.choice(targets), 5, 5)
+        elif roll < 0.7:
+            x, y = _near_edge(rng, rng.choice(tank_rects), 5, 5)
+        else:
+            x, y = rng.randint(-10, SCREEN_WIDTH + 5), rng.randint(-10, SCREEN_HEIGHT + 5)
+        shooter = rng.randrange(len(tanks)) if rng.random() < 0.8 else -1
+        bullets.append([x, y, 1 if rng.random() < 0.9 else 0, shooter])
+    return {"walls": walls, "covers": covers, "tanks": tanks, "rects": rects, "bullets": bullets}
+
+
+def case_rng(seed, case):
+    return random.Random(f"{seed}:{case}")
+
+
+class _FuzzTank(GameObject):
+    """只带碰撞检测用到的属性的坦克（避免创建 Tank 时的精灵和AI状态）"""
+    def __init__(self, x, y, health):
+        super().__init__(x, y, TANK_SIZE, TANK_SIZE, TANK_COLOR)
+        self.health = health
+
+
+def _build(scenario, backend_cls):
+    """为一个实现创建全新的对象（障碍物会被摧毁，各实现之间不能共享）"""
+    walls = [GameObject(*rect, WALL_COLOR) for rect in scenario["walls"]]
+    covers = [GameObject(*rect, COVER_COLOR) for rect in scenario["covers"]]
+    tanks = [_FuzzTank(*tank) for tank in scenario["tanks"]]
+    origin = {id(obstacle): i for i, obstacle in enumerate(covers)}
+    return backend_cls(walls, covers), covers, tanks, origin
+
+
+def _make_bullet(spec):
+    x, y, active, _ = spec
+    bullet = Bullet(x, y, (0, 0))
+    bullet.active = bool(active)
+    return bullet
+
+
+def run_check(check, backend_cls, scenario):
+    """按顺序执行一种碰撞检测的全部查询，返回每次查询的结果（可比较的普通值）"""
+    backend, covers, tanks, origin = _build(scenario, backend_cls)
+    outcomes = []
+    if check == "map_collision":
+        import pygame
+        for rect in scenario["rects"]:
+            outcomes.append(backend.check_collision(pygame.Rect(rect)))
+    elif check == "bullet_map":
+        for spec in scenario["bullets"]:
+            bullet = _make_bullet(spec)
+            before = {id(obstacle) for obstacle in covers}
+            hit = backend.check_bullet_collision(bullet)
+            removed = sorted(origin[key] for key in before - {id(obstacle) for obstacle in covers})
+            outcomes.append((hit, bullet.active, tuple(removed)))
+    elif check == "bullet_object":
+        objects = tanks + covers
+        for spec in scenario["bullets"]:
+            bullet = _make_bullet(spec)
+            hits = tuple(i for i, obj in enumerate(objects) if backend.bullet_hits(bullet, obj))
+            outcomes.append((hits, bullet.active))
+    elif check == "bullet_tanks":
+        for spec in scenario["bullets"]:
+            shooter = tanks[spec[3]] if 0 <= spec[3] < len(tanks) else None
+            target = backend.bullet_target(_make_bullet(spec), tanks, shooter)
+            outcomes.append(None if target is None else tanks.index(target))
+    else:
+        raise ValueError(f"未知的碰撞检测: {check}")
+    return outcomes
+
+
+def first_mismatch(check, backend_cls, scenario):
+    """返回第一处不一致 (查询下标, 参考结果, 候选结果)，完全一致时返回None"""
+    expected = run_check(check, LinearReference, scenario)
+    actual = run_check(check, backend_cls, scenario)
+    for i, (want, got) in enumerate(zip(expected, actual)):
+        if want != got:
+            return i, want, got
+    if len(expected) != len(actual):
+        return min(len(expected), len(actual)), None, None
+    return None
+
+
+# ---------------------------------------------------------------------------
+# 缩减：不断删除障碍物、坦克和查询，只要不一致仍然存在就保留删除，得到最小复现场景
+# ---------------------------------------------------------------------------
+
+PROBES = {"map_collision": "rects"}
+
+
+def _drop_tanks(scenario, drop):
+    """删除坦克并重新映射子弹的开火者下标（被删除的开火者视为阵亡，子弹变为遗留子弹）"""
+    remap, kept = {}, []
+    for i, tank in enumerate(scenario["tanks"]):
+        if i not in drop:
+            remap[i] = len(kept)
+            kept.append(tank)
+    bullets = [[x, y, active, remap.get(shooter, -1)] for x, y, active, shooter in scenario["bullets"]]
+    return dict(scenario, tanks=kept, bullets=bullets)
+
+
+def shrink(check, backend_cls, scenario, max_tries=5000):
+    """贪心缩减（先成块删除再逐个删除），返回仍然不一致的最小场景"""
+    probe_key = PROBES.get(check, "bullets")
+    fields = ["walls", "covers", "tanks", probe_key]
+    tries = 0
+
+    def still_fails(candidate):
+        nonlocal tries
+        tries += 1
+        return first_mismatch(check, backend_cls, candidate) is not None
+
+    # 只保留到第一处不一致为止的查询，本项检测用不到的查询直接清空
+    index = first_mismatch(check, backend_cls, scenario)[0]
+    unused = "bullets" if probe_key == "rects" else "rects"
+    scenario = dict(scenario, **{probe_key: scenario[probe_key][:index + 1], unused: []})
+
+    changed = True
+    while changed and tries < max_tries:
+        changed = False
+        for field in fields:
+            chunk = max(1, len(scenario[field]) // 2)
+            while chunk >= 1 and tries < max_tries:
+                start = 0
+                while start < len(scenario[field]) and tries < max_tries:
+                    drop = set(range(start, min(start + chunk, len(scenario[field]))))
+                    if field == "tanks":
+                        candidate = _drop_tanks(scenario, drop)
+                    else:
+                        candidate = dict(scenario, **{field: [item for i, item in enumerate(scenario[field]) if i not in drop]})
+                    if still_fails(candidate):
+                        scenario = candidate
+                        changed = True
+                    else:
+                        start += chunk
+                chunk //= 2
+    return scenario
+
+
+# ---------------------------------------------------------------------------
+# 运行与报告
+# ---------------------------------------------------------------------------
+
+def fuzz_case(seed, case, checks=CHECKS, backends=None):
+    """检验单个场景，返回缩减后的第一处不一致，全部一致时返回None"""
+    scenario = generate_scenario(case_rng(seed, case))
+    for check in checks:
+        for name in backends or BACKENDS:
+            if name == LinearReference.name:
+                continue
+            backend_cls = BACKENDS[name]
+            if first_mismatch(check, backend_cls, scenario) is None:
+                continue
+            minimal = shrink(check, backend_cls, scenario)
+            index, expected, actual = first_mismatch(check, backend_cls, minimal)
+            return {
+                "seed": seed, "case": case, "check": check, "backend": name,
+                "probe": index, "expected": expected, "actual": actual, "scenario": minimal,
+            }
+    return None
+
+
+def fuzz(seed=0, cases=200, start=0, checks=CHECKS, backends=None, verbose=True):
+    """差分模糊测试：场景编号从start开始，返回第一处不一致（已缩减），全部一致时返回None"""
+    for case in range(start, start + cases):
+        result = fuzz_case(seed, case, checks, backends)
+        if result:
+            return result
+        if verbose and (case - start + 1) % 50 == 0:
+            print(f"已通过 {case - start + 1}/{cases} 个场景")
+    return None
+
+
+def benchmark(seed=0, cases=50, checks=CHECKS, backends=None):
+    """在同一批场景上比较各实现的查询吞吐量（不含建索引），返回 {检测: {实现: (查询/秒, 建索引毫秒)}}"""
+    import pygame
+    scenarios = [generate_scenario(case_rng(seed, case)) for case in range(cases)]
+    backends = backends or list(BACKENDS)
+    if LinearReference.name not in backends:
+        backends = [LinearReference.name] + list(backends)
+    results = {}
+    for check in checks:
+        results[check] = {}
+        for name in backends:
+            backend_cls = BACKENDS[name]
+            elapsed = build_time = 0.0
+            queries = 0
+            for scenario in scenarios:
+                start = time.perf_counter()
+                backend, covers, tanks, _ = _build(scenario, backend_cls)
+                build_time += time.perf_counter() - start
+                if check == "map_collision":
+                    probes = [pygame.Rect(rect) for rect in scenario["rects"]]
+                    start = time.perf_counter()
+                    for rect in probes:
+                        backend.check_collision(rect)
+                elif check == "bullet_map":
+                    probes = [_make_bullet(spec) for spec in scenario["bullets"]]
+                    start = time.perf_counter()
+                    for bullet in probes:
+                        backend.check_bullet_collision(bullet)
+                elif check == "bullet_object":
+                    probes = [(_make_bullet(spec), obj) for spec in scenario["bullets"] for obj in tanks]
+                    start = time.perf_counter()
+                    for bullet, obj in probes:
+                        backend.bullet_hits(bullet, obj)
+                else:
+                    probes = [(_make_bullet(spec), tanks[spec[3]] if spec[3] >= 0 else None) for spec in scenario["bullets"]]
+                    start = time.perf_counter()
+                    for bullet, shooter in probes:
+                        backend.bullet_target(bullet, tanks, shooter)
+                elapsed += time.perf_counter() - start
+                queries += len(probes)
+            results[check][name] = (queries / elapsed if elapsed else 0.0, build_time * 1000 / len(scenarios))
+    return results
+
+
+def load_repro(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="碰撞检测差分模糊测试：候选实现与逐个扫描的参考实现逐次比对")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cases", type=int, default=200, help="随机场景数量")
+    parser.add_argument("--case", type=int, default=None, help="只运行指定编号的场景（复现用）")
+    parser.add_argument("--check", choices=CHECKS, action="append", help="只检验指定的碰撞检测（可重复）")
+    parser.add_argument("--backend", choices=list(BACKENDS), action="append", help="只检验指定实现（可重复）")
+    parser.add_argument("--out", default=None, help="发现不一致时把最小复现场景保存为JSON")
+    parser.add_argument("--repro", default=None, help="重新运行保存的复现场景")
+    parser.add_argument("--bench", action="store_true", help="比较各实现的吞吐量")
+    args = parser.parse_args(argv)
+    checks = args.check or list(CHECKS)
+
+    if args.repro:
+        repro = load_repro(args.repro)
+        if repro["backend"] not in BACKENDS:
+            print(f"未知的实现: {repro['backend']}")
+            raise SystemExit(2)
+        mismatch = first_mismatch(repro["check"], BACKENDS[repro["backend"]], repro["scenario"])
+        print("仍然不一致: " + json.dumps(mismatch, ensure_ascii=False) if mismatch else "已一致")
+        if mismatch:
+            raise SystemExit(1)
+        return
+
+    if args.bench:
+        results = benchmark(args.seed, min(args.cases, 50), checks, args.backend)
+        for check, rows in results.items():
+            reference_rate = rows[LinearReference.name][0]
+            print(f"[{check}]")
+            for name, (rate, build_ms) in rows.items():
+                speedup = rate / reference_rate if reference_rate else 0.0
+                print(f"  {name:<12} {rate:>12,.0f} 次/秒  {speedup:5.2f}x  建索引 {build_ms:.3f}ms")
+        return
+
+    # 报告中的场景编号可直接用 --case 复现
+    start_case, cases = (args.case, 1) if args.case is not None else (0, args.cases)
+    start = time.perf_counter()
+    result = fuzz(args.seed, cases, start_case, checks, args.backend)
+    elapsed = time.perf_counter() - start
+
+    if result is None:
+        print(f"全部一致: {cases} 个场景, 检测 {', '.join(checks)}, 耗时 {elapsed:.1f}s")
+        return
+    scenario = result["scenario"]
+    print(f"发现不一致: 实现 {result['backend']} 的 {result['check']}（种子 {result['seed']}, 场景 {result['case']}）")
+    print(f"  复现: python collision_fuzz.py --seed {result['seed']} --case {result['case']} "
+          f"--check {result['check']} --backend {result['backend']}")
+    print(f"  第 {result['probe']} 次查询: 参考结果 {result['expected']!r}, 候选结果 {result['actual']!r}")
+    print("  最小场景: " + json.dumps(scenario, ensure_ascii=False))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"  已保存: {args.out}")
+    raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import math
+import pygame
+
+# 掩护点配置
+TANK_SIZE = 30  # 掩护点按坦克尺寸计算
+COVER_GAP = 2  # 掩护点与障碍物之间的间隙
+COVER_STEP = 20  # 沿障碍物边缘的采样间距
+INDEX_CELL = 60  # 网格索引的单元尺寸
+SCREEN_RECT = pygame.Rect(0, 0, 800, 600)
+
+# 8个方向（与坦克炮管方向一致），掩护点记录障碍物挡住了哪些方向射来的子弹
+DIRECTIONS = [(1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1)]
+
+
+class CoverPoint:
+    """掩护点：紧贴障碍物的坦克站位，以及该障碍物挡住的方向"""
+    __slots__ = ("x", "y", "center", "obstacle", "blocked")
+
+    def __init__(self, x, y, obstacle, blocked):
+        self.x = x  # 坦克左上角坐标
+        self.y = y
+        self.center = (x + TANK_SIZE // 2, y + TANK_SIZE // 2)
+        self.obstacle = obstacle
+        self.blocked = blocked  # 方向位掩码（对应DIRECTIONS下标）
+
+    def blocks_direction(self, dx, dy):
+        """判断来自(dx, dy)方向的威胁是否大致被障碍物挡住"""
+        length = math.hypot(dx, dy)
+        if length == 0:
+            return False
+        for i, (bx, by) in enumerate(DIRECTIONS):
+            if self.blocked & (1 << i):
+                # 夹角小于约67.5度视为同一侧
+                if (dx * bx + dy * by) / (length * math.hypot(bx, by)) > 0.38:
+                    return True
+        return False
+
+
+class CoverIndex:
+    """掩护点网格索引：地图加载时预计算，可破坏掩体被摧毁时同步移除"""
+    def __init__(self, game_map):
+        self.cells = {}  # (列, 行) -> [CoverPoint]
+        self.by_obstacle = {}  # id(障碍物) -> [CoverPoint]
+        self.build(game_map)
+
+    def build(self, game_map):
+        """根据地图的全部障碍物重新计算掩护点"""
+        self.cells.clear()
+        self.by_obstacle.clear()
+        for obstacle in game_map.cover_obstacles():
+            self._add_obstacle(obstacle, game_map)
+
+    def _add_obstacle(self, obstacle, game_map):
+        rect = obstacle.rect
+        # 屏幕外的边界墙不提供掩护
+        if not SCREEN_RECT.contains(rect):
+            rect = rect.clip(SCREEN_RECT)
+            if rect.width < TANK_SIZE // 2 and rect.height < TANK_SIZE // 2:
+                return
+
+        points = []
+        # 左右两侧：障碍物挡住从对侧来的火力
+        left_x = rect.left - TANK_SIZE - COVER_GAP
+        right_x = rect.right + COVER_GAP
+        for y in self._samples(rect.top - TANK_SIZE // 2, rect.bottom - TANK_SIZE // 2):
+            points.append((left_x, y, 1 << 0))  # 挡住右方
+            points.append((right_x, y, 1 << 4))  # 挡住左方
+        # 上下两侧
+        top_y = rect.top - TANK_SIZE - COVER_GAP
+        bottom_y = rect.bottom + COVER_GAP
+        for x in self._samples(rect.left - TANK_SIZE // 2, rect.right - TANK_SIZE // 2):
+            points.append((x, top_y, 1 << 6))  # 挡住下方
+            points.append((x, bottom_y, 1 << 2))  # 挡住上方
+
+        valid = []
+        for x, y, blocked in points:
+            tank_rect = pygame.Rect(x, y, TANK_SIZE, TANK_SIZE)
+            if not SCREEN_RECT.contains(tank_rect) or game_map.check_collision(tank_rect):
+                continue
+            point = CoverPoint(x, y, obstacle, blocked)
+            valid.append(point)
+            key = (point.center[0] // INDEX_CELL, point.center[1] // INDEX_CELL)
+            self.cells.setdefault(key, []).append(point)
+        if valid:
+            self.by_obstacle[id(obstacle)] = valid
+
+    @staticmethod
+    def _samples(start, end):
+        """在[start, end]区间内按COVER_STEP采样，保证包含两端"""
+        values = list(range(start, end, COVER_STEP))
+        values.append(end)
+        return values
+
+    def remove_obstacle(self, obstacle):
+        """障碍物被摧毁后移除依附于它的掩护点"""
+        points = self.by_obstacle.pop(id(obstacle), None)
+        if not points:
+            return
+        for point in points:
+            key = (point.center[0] // INDEX_CELL, point.center[1] // INDEX_CELL)
+            cell = self.cells.get(key)
+            if cell and point in cell:
+                cell.remove(point)
+                if not cell:
+                    del self.cells[key]
+
+    def update_obstacles(self, game_map, removed=(), added=()):
+        """局部更新：只重算变化障碍物及其相邻障碍物的掩护点
+
+        新增障碍物可能挡住相邻障碍物旁的站位，移除障碍物则可能腾出站位，
+        因此受影响范围内的障碍物都要重新采样。
+        """
+        changed = list(removed) + list(added)
+        if not changed:
+            return
+        reach = TANK_SIZE + COVER_GAP
+        regions = [obstacle.rect.inflate(reach * 2, reach * 2) for obstacle in changed]
+        removed_ids = {id(obstacle) for obstacle in removed}
+        added_ids = {id(obstacle) for obstacle in added}
+        neighbours = [
+            obstacle for obstacle in game_map.cover_obstacles()
+            if id(obstacle) not in added_ids
+            and obstacle.rect.inflate(reach * 2, reach * 2).collidelist(regions) != -1
+        ]
+        for obstacle in list(removed) + neighbours:
+            self.remove_obstacle(obstacle)
+        for obstacle in neighbours + list(added):
+            if id(obstacle) not in removed_ids:
+                self._add_obstacle(obstacle, game_map)
+
+    def nearby(self, pos, radius):
+        """返回半径内的掩护点及其距离（按距离升序）"""
+        cx, cy = pos
+        min_col, max_col = int((cx - radius) // INDEX_CELL), int((cx + radius) // INDEX_CELL)
+        min_row, max_row = int((cy - radius) // INDEX_CELL), int((cy + radius) // INDEX_CELL)
+        result = []
+        for col in range(min_col, max_col + 1):
+            for row in range(min_row, max_row + 1):
+                for point in self.cells.get((col, row), ()):
+                    distance = math.hypot(point.center[0] - cx, point.center[1] - cy)
+                    if distance <= radius:
+                        result.append((distance, point))
+        result.sort(key=lambda item: item[0])
+        return result
+
+    def find_cover(self, pos, threat_pos, radius):
+        """查找半径内离pos最近、且对threat_pos不可见的掩护点，没有则返回None"""
+        for distance, point in self.nearby(pos, radius):
+            dx = threat_pos[0] - point.center[0]
+            dy = threat_pos[1] - point.center[1]
+            if not point.blocks_direction(dx, dy):
+                continue
+            # 精确检查：威胁到掩护点的连线必须穿过依附的障碍物
+            if point.obstacle.rect.clipline(threat_pos, point.center):
+                return point
+        return None
+
+    def __len__(self):
+        return sum(len(points) for points in self.cells.values())
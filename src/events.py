@@ -0,0 +1,55 @@
+from collections import namedtuple
+
+# 事件类型
+SHOT = "shot"  # 坦克开火
+HIT = "hit"  # 子弹击中坦克
+KILL = "kill"  # 坦克被击毁
+COVER_DESTROYED = "cover_destroyed"  # 可破坏掩体被摧毁
+PICKUP = "pickup"  # 玩家拾取血包
+LEVEL_UP = "level_up"  # 玩家升级
+WAVE = "wave"  # 新一波敌人生成
+SPAWN = "spawn"  # 敌人进场（波次分批进场时每个敌人一条）
+GAME_OVER = "game_over"  # 玩家阵亡
+VICTORY = "victory"  # 玩家胜利
+
+# 事件记录：actor 为事件发起方（如开火的坦克），target 为承受方（如被击中的坦克）
+GameEvent = namedtuple("GameEvent", "kind frame x y actor target")
+
+
+class EventBus:
+    """每帧事件缓冲区：模拟过程中只追加记录，帧结束时一次性分发给订阅者"""
+    def __init__(self):
+        self.frame = 0
+        self.events = []
+        self._subscribers = []  # [(回调, 关注的事件类型集合或None)]
+
+    def emit(self, kind, x=0, y=0, actor=None, target=None):
+        """追加一条事件（热路径上只做一次列表追加）"""
+        self.events.append(GameEvent(kind, self.frame, x, y, actor, target))
+
+    def subscribe(self, callback, kinds=None):
+        """订阅事件；callback 每帧最多调用一次，参数为本帧事件列表"""
+        self._subscribers.append((callback, frozenset(kinds) if kinds else None))
+
+    def unsubscribe(self, callback):
+        self._subscribers = [(cb, kinds) for cb, kinds in self._subscribers if cb != callback]
+
+    def flush(self):
+        """分发本帧事件并清空缓冲区"""
+        batch = self.events
+        self.events = []
+        self.frame += 1
+        if not batch:
+            return
+        for callback, kinds in self._subscribers:
+            if kinds is None:
+                callback(batch)
+                continue
+            selected = [event for event in batch if event.kind in kinds]
+            if selected:
+                callback(selected)
+
+    def clear(self):
+        """丢弃未分发的事件（重置对局时调用）"""
+        self.events = []
+        self.frame = 0
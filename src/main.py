@@ -1,12 +1,9 @@
 import pygame
-import math
 import os
 import traceback
-import random
 import sys
-from tank import Tank
-from map import Map
-from sound_manager import SoundManager
+import time
+from asset_pack import default_pack, is_pack_path
 
 # ========== 核心修复：添加动态路径获取函数 ==========
 def get_resource_path(relative_path):
@@ -25,10 +22,6 @@ def get_resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 
-# 初始化pygame
-pygame.init()
-pygame.font.init()
-
 # 游戏配置
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
@@ -38,49 +31,27 @@ BLACK = (0, 0, 0)
 RED = (255, 0, 0)
 GREEN = (0, 255, 0)
 SELECTED_COLOR = (0, 0, 255)  # 选中项颜色
+FONT_NAMES = ["SimHei", "WenQuanYi Micro Hei", "Heiti SC", "Arial"]
+# 是否在独立线程中渲染对局画面（模拟与绘制并行，需显卡驱动支持跨线程flip）
+THREADED_RENDER = os.environ.get("TANK_WAR_THREADED_RENDER", "0") == "1"
+# 是否记录对局遥测（JSON Lines，目录可通过 TANK_WAR_TELEMETRY_DIR 指定）
+TELEMETRY_ENABLED = os.environ.get("TANK_WAR_TELEMETRY", "0") == "1"
+# 是否把每帧世界状态发布到共享内存（供观战、统计面板等其他进程读取）
+SHARE_WORLD = os.environ.get("TANK_WAR_SHARE_WORLD", "0") == "1"
+# 每帧AI决策的时间预算（毫秒），0 表示不限制、每个敌人每帧都完整决策
+AI_BUDGET_MS = float(os.environ.get("TANK_WAR_AI_BUDGET_MS", "3"))
+# 并行AI的线程数，0 表示不启用；启用后每帧所有敌人完整决策，无GIL的解释器上分给多个线程
+AI_THREADS = int(os.environ.get("TANK_WAR_AI_THREADS", "0"))
+# 是否为BOSS启用前瞻规划（在工作进程中推演候选计划，主线程不等待；启用后对局不可复现）
+BOSS_PLANNER = os.environ.get("TANK_WAR_BOSS_PLANNER", "0") == "1"
+# 无尽模式是否在后台线程提前准备下一波敌人，并让敌人分批进场（不影响对局的可复现性）
+PREBUILD_WAVES = os.environ.get("TANK_WAR_PREBUILD_WAVES", "1") == "1"
+# 是否把所有地图的可破坏掩体转换为砖块地形（可逐块击碎）；未设置时由地图文件的 "terrain" 字段决定
+TILE_TERRAIN = os.environ.get("TANK_WAR_TILE_TERRAIN", "0") == "1"
 
 # 无尽模式配置
 GAME_MODES = ["CLASSIC", "ENDLESS"]  # 游戏模式
-current_mode = "CLASSIC"  # 当前模式
-current_wave = 1  # 当前波次
-player_level = 1  # 玩家等级
-player_exp = 0  # 玩家经验
-boss_tank = None  # BOSS坦克变量
-
-# 创建游戏窗口
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("坦克大战 - 真男人版")
-
-# 字体设置（修复跨平台兼容）
-try:
-    small_font = pygame.font.SysFont(["SimHei", "WenQuanYi Micro Hei", "Heiti SC", "Arial"], 24)
-    medium_font = pygame.font.SysFont(["SimHei", "WenQuanYi Micro Hei", "Heiti SC", "Arial"], 36)
-    large_font = pygame.font.SysFont(["SimHei", "WenQuanYi Micro Hei", "Heiti SC", "Arial"], 72)
-    title_font = pygame.font.SysFont(["SimHei", "WenQuanYi Micro Hei", "Heiti SC", "Arial"], 50)
-except Exception as e:
-    print(f"加载字体失败: {e}")
-    small_font = pygame.font.Font(None, 24)
-    medium_font = pygame.font.Font(None, 36)
-    large_font = pygame.font.Font(None, 72)
-    title_font = pygame.font.Font(None, 50)
-
-# 时钟和音效管理器
-clock = pygame.time.Clock()
-try:
-    sound_manager = SoundManager()
-except Exception as e:
-    print(f"音效管理器初始化失败: {e}")
-    class DummySoundManager:
-        def __getattr__(self, name):
-            return lambda *args, **kwargs: None
-    sound_manager = DummySoundManager()
-
-# 游戏状态
-GAME_STATE = "MENU"  # MENU, MAP_SELECT, PLAYING, GAME_OVER
-winner_text = ""
-selected_map_index = 0
-available_maps = []
-scroll_offset = 0  # 地图列表滚动偏移量
+
 
 # 加载可用地图（修复打包后路径问题）
 def load_available_maps():
@@ -88,24 +59,24 @@ def load_available_maps():
     try:
         # ========== 修复：使用动态路径 ==========
         maps_dir = get_resource_path("assets/maps")  # 替换原有的硬编码路径
-        
+
         print(f"[调试] 当前脚本目录: {os.path.dirname(os.path.abspath(__file__))}")
         print(f"[调试] 地图目录: {maps_dir} {'(存在)' if os.path.exists(maps_dir) else '(不存在)'}")
-        
-        # 如果目录不存在则创建
+
+        # 读取JSON地图文件（目录不存在时创建，供之后放入自定义地图）
+        map_files = []
         if not os.path.exists(maps_dir):
             os.makedirs(maps_dir, exist_ok=True)
             print(f"[调试] 创建地图目录: {maps_dir}")
-            return []
-        
-        # 读取JSON地图文件
-        map_files = []
         for file in os.listdir(maps_dir):
             if file.endswith(".json"):
-                map_path = get_resource_path(f"assets/maps/{file}")  # 修复：用动态路径
+                map_path = os.path.normpath(get_resource_path(f"assets/maps/{file}"))  # 修复：用动态路径
                 map_files.append(map_path)
                 print(f"[调试] 找到地图文件: {map_path}")
-        
+
+        map_files = with_packed_maps(map_files)
+        if default_pack() is not None:
+            print(f"[调试] 资源包中的地图: {sum(is_pack_path(path) for path in map_files)} 个")
         print(f"[调试] 共找到 {len(map_files)} 个地图文件")
         return map_files
     except Exception as e:
@@ -113,443 +84,452 @@ def load_available_maps():
         traceback.print_exc()
         return []
 
-# 强制重新加载地图并打印结果
-available_maps = load_available_maps()
-print(f"最终可用地图列表: {[os.path.basename(p) for p in available_maps]}")
-
-# 初始化游戏对象
-try:
-    game_map = Map()
-except Exception as e:
-    print(f"地图初始化失败: {e}")
-    class DummyMap:
-        name = "默认地图"
-        destroyable_obstacles = []
-        obstacles = []
-        def __getattr__(self, name):
-            if name == 'draw':
-                return lambda screen: None
-            elif name == 'check_bullet_collision':
-                return lambda bullet: False
-            return lambda *args, **kwargs: False
-    game_map = DummyMap()
-
-# 坦克初始化
-try:
-    player_tank = Tank(100, 100, (0, 0, 255), is_player=True)
-    enemy_tank1 = Tank(600, 100, (255, 0, 0))
-    enemy_tank2 = Tank(100, 400, (0, 255, 0))
-    enemy_tank3 = Tank(600, 400, (255, 255, 0))
-    tanks = [player_tank, enemy_tank1, enemy_tank2, enemy_tank3]
-except Exception as e:
-    print(f"坦克初始化失败: {e}")
-    tanks = []
-
-def reset_game(selected_map=None, mode="CLASSIC"):
-    """重置游戏状态"""
-    global game_map, player_tank, enemy_tank1, enemy_tank2, enemy_tank3, tanks, GAME_STATE, winner_text
-    global current_mode, current_wave, player_level, player_exp, boss_tank
-    
-    current_mode = mode
-    current_wave = 1 if mode == "ENDLESS" else current_wave
-    # 重置玩家等级和经验（如果是新游戏）
-    if mode == "ENDLESS":
-        player_level = 1
-        player_exp = 0
-    
+
+def with_packed_maps(loose_maps):
+    """散装地图列表后接资源包中的预编译地图（与散装地图同名时使用散装文件，便于编辑和热更新）"""
+    pack = default_pack()
+    if pack is None:
+        return list(loose_maps)
+    loose = {os.path.splitext(os.path.basename(path))[0] for path in loose_maps}
+    return list(loose_maps) + [path for path in pack.map_paths()
+                               if os.path.splitext(os.path.basename(path))[0] not in loose]
+
+
+def load_fonts():
+    """加载界面字体（修复跨平台兼容），返回 (小, 中, 大, 标题)"""
     try:
-        if selected_map is not None and available_maps and 0 <= selected_map < len(available_maps):
-            try:
-                game_map = Map(available_maps[selected_map])
-                print(f"加载选中地图: {os.path.basename(available_maps[selected_map])}")
-            except Exception as e:
-                print(f"加载选中地图失败: {e}")
-                game_map = Map()
-        else:
-            game_map = Map()
-            print("使用默认地图")
-        
-        # 初始化坦克（无尽模式初始敌人更少）
-        player_tank = Tank(100, 100, (0, 0, 255), is_player=True)
-        if mode == "ENDLESS":
-            tanks = [player_tank] + [Tank(random.randint(100, 700), random.randint(100, 500), (255, 0, 0))]
-            spawn_wave()  # 生成第一波敌人
-        else:
-            enemy_tank1 = Tank(600, 100, (255, 0, 0))
-            enemy_tank2 = Tank(100, 400, (0, 255, 0))
-            enemy_tank3 = Tank(600, 400, (255, 255, 0))
-            tanks = [player_tank, enemy_tank1, enemy_tank2, enemy_tank3]
-        
-        boss_tank = None
-        
-        # 检查并移除与坦克重叠的掩体
-        if hasattr(game_map, 'obstacles') and hasattr(game_map, 'destroyable_obstacles'):
-            # 定义碰撞检测函数
-            def is_overlapping_tank(obstacle):
-                for tank in tanks:
-                    if hasattr(tank, 'rect') and hasattr(obstacle, 'rect'):
-                        if obstacle.rect.colliderect(tank.rect):
-                            return True
-                return False
-            
-            # 过滤与坦克重叠的掩体
-            original_obstacles = len(game_map.obstacles)
-            game_map.obstacles = [obs for obs in game_map.obstacles if not is_overlapping_tank(obs)]
-            removed_obstacles = original_obstacles - len(game_map.obstacles)
-            
-            original_destroyable = len(game_map.destroyable_obstacles)
-            game_map.destroyable_obstacles = [obs for obs in game_map.destroyable_obstacles if not is_overlapping_tank(obs)]
-            removed_destroyable = original_destroyable - len(game_map.destroyable_obstacles)
-            
-            if removed_obstacles > 0 or removed_destroyable > 0:
-                print(f"移除与坦克重叠的掩体: 不可破坏{removed_obstacles}个, 可破坏{removed_destroyable}个")
-        
-        winner_text = ""
-        GAME_STATE = "PLAYING"
+        return tuple(pygame.font.SysFont(FONT_NAMES, size) for size in (24, 36, 72, 50))
     except Exception as e:
-        print(f"重置游戏失败: {e}")
-        traceback.print_exc()
-        GAME_STATE = "MENU"
-
-def spawn_wave():
-    """生成敌人波次"""
-    global tanks, current_wave, boss_tank
-    
-    # 计算当前波次要生成的敌人数量（1-10个）
-    enemy_count = min(1 + current_wave // 2, 10)
-    is_boss_wave = current_wave % 5 == 0
-    
-    # 清除现有敌人（保留玩家）
-    tanks = [tank for tank in tanks if tank.is_player]
-    
-    if is_boss_wave:
-        # 生成BOSS坦克和2个小弟
-        boss_tank = Tank(400, 100, (128, 0, 128), is_boss=True)  # 紫色BOSS坦克
-        boss_tank.max_health = 10 + (current_wave // 5) * 2
-        boss_tank.health = boss_tank.max_health
-        boss_tank.speed = 3  # BOSS速度稍快
-        tanks.append(boss_tank)
-        
-        # 添加2个小弟
-        for _ in range(2):
-            x = random.randint(100, 700)
-            y = random.randint(100, 500)
-            minion = Tank(x, y, (255, 165, 0))  # 橙色小弟
-            minion.speed = 2.5
-            minion.max_health = 5
-            minion.health = minion.max_health
-            tanks.append(minion)
-    else:
-        # 生成普通敌人
-        for i in range(enemy_count):
-            x = random.randint(100, 700)
-            y = random.randint(100, 500)
-            enemy = Tank(x, y, (255, 0, 0))
-            # 敌人随波次增强
-            enemy.max_health = 3 + (current_wave // 3)
-            enemy.health = enemy.max_health
-            enemy.speed = 2 + (current_wave // 5) * 0.5
-            enemy.ai_difficulty = 1 + (current_wave // 5)  # AI难度提升
-            tanks.append(enemy)
-    
-    print(f"第 {current_wave} 波敌人生成，共 {len(tanks)-1} 个敌人")
-
-def level_up_player():
-    """玩家升级"""
-    global player_level, player_tank
-    player_level += 1
-    player_tank.max_health += 1
-    player_tank.health = player_tank.max_health  # 升级满血
-    player_tank.speed += 0.3  # 提升移速
-    print(f"玩家升级到 {player_level} 级！速度: {player_tank.speed:.1f}, 最大生命值: {player_tank.max_health}")
-    sound_manager.play_levelup_sound()
-
-# 游戏主循环
-running = True
-try:
-    while running:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            if event.type == pygame.KEYDOWN:
-                try:
-                    if GAME_STATE == "MENU":
-                        if event.key == pygame.K_1:
-                            GAME_STATE = "MAP_SELECT"
-                            current_mode = "CLASSIC"
-                            print("选择经典模式")
-                        elif event.key == pygame.K_2:
-                            reset_game(mode="ENDLESS")
-                            print("选择无尽模式")
-                    elif GAME_STATE == "MAP_SELECT":
-                        if available_maps:
-                            if event.key == pygame.K_UP:
-                                selected_map_index = (selected_map_index - 1) % len(available_maps)
-                                print(f"选中地图索引: {selected_map_index}")
-                            elif event.key == pygame.K_DOWN:
-                                selected_map_index = (selected_map_index + 1) % len(available_maps)
-                                print(f"选中地图索引: {selected_map_index}")
-                            elif event.key == pygame.K_SPACE:
-                                reset_game(selected_map_index, current_mode)
-                        if event.key == pygame.K_ESCAPE:
-                            GAME_STATE = "MENU"
-                            print("返回主菜单")
-                    elif GAME_STATE == "GAME_OVER":
-                        if event.key == pygame.K_r:
-                            if current_mode == "ENDLESS":
-                                reset_game(mode="ENDLESS")
-                            else:
-                                reset_game(selected_map_index if (available_maps and selected_map_index < len(available_maps)) else None)
-                        elif event.key == pygame.K_ESCAPE:
-                            GAME_STATE = "MENU"
-                        # 开发者复活功能
-                        elif event.key == pygame.K_KP_MULTIPLY or event.key == pygame.K_asterisk:
-                            if current_mode == "ENDLESS":
-                                player_tank.health = player_tank.max_health
-                                player_tank.alive = True
-                                GAME_STATE = "PLAYING"
-                                print("开发者复活")
-                except Exception as e:
-                    print(f"事件处理错误: {e}")
-                    traceback.print_exc()
+        print(f"加载字体失败: {e}")
+        return tuple(pygame.font.Font(None, size) for size in (24, 36, 72, 50))
+
+
+class DummySoundManager:
+    """音效初始化失败时的替身，所有方法都不做任何事"""
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class Game:
+    """游戏窗口与状态机（菜单、选图、对局、结算）
 
-        if GAME_STATE == "MENU":
+    创建实例时才初始化pygame、打开窗口并加载字体、音效和地图列表，
+    导入本模块本身没有副作用，工具和测试可以放心复用其中的函数。
+    """
+    def __init__(self):
+        from match import Match
+        from sound_manager import SoundManager
+        from sprites import SpriteAtlas
+        from render_pipeline import PacketBuilder, FrameRenderer, RenderThread
+        from thumbnails import ThumbnailCache
+        from map_watcher import MapWatcher
+        from particles import ParticleSystem, EVENT_KINDS
+        self._match_class = Match
+
+        # 初始化pygame
+        pygame.init()
+        pygame.font.init()
+
+        self.current_mode = "CLASSIC"  # 当前模式
+        self.match = None  # 当前对局（地图、坦克、波次、等级等状态）
+        self.telemetry = None  # 当前对局的遥测统计
+
+        # 创建游戏窗口
+        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        pygame.display.set_caption("坦克大战 - 真男人版")
+        self.small_font, self.medium_font, self.large_font, self.title_font = load_fonts()
+
+        # 坦克精灵图集（窗口创建后预渲染，每帧批量绘制）
+        self.sprite_atlas = SpriteAtlas()
+
+        # 对局画面渲染：模拟每帧生成不可变数据包，由渲染器（或渲染线程）绘制
+        self.packet_builder = PacketBuilder()
+        self.frame_renderer = FrameRenderer(self.screen, self.sprite_atlas, self.small_font)
+        self.particles = ParticleSystem()  # 开火、命中和爆炸的粒子效果（全局数量上限）
+        self._particle_kinds = EVENT_KINDS
+        self.render_thread = None
+        if THREADED_RENDER:
+            self.render_thread = RenderThread(self.frame_renderer)
+            self.render_thread.start()
+
+        # 遥测写入器（后台线程写盘）
+        self.telemetry_writer = None
+        if TELEMETRY_ENABLED:
             try:
-                screen.fill(WHITE)
-                title = title_font.render("坦克大战-真男人版", True, BLACK)
-                screen.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 150))
-                
-                features = [
-                    "Ctrl+空格键切换至英文",
-                    "可破坏掩体",
-                    "8方向移动与瞄准",
-                    "生命值显示",
-                    "无尽模式与BOSS战",
-                    "玩家升级系统"
-                ]
-                for i, feature in enumerate(features):
-                    feature_text = small_font.render(f"• {feature}", True, BLACK)
-                    screen.blit(feature_text, (250, 250 + i * 40))
-                
-                mode_text = medium_font.render("按1选择经典模式，按2选择无尽模式", True, BLACK)
-                screen.blit(mode_text, (SCREEN_WIDTH//2 - mode_text.get_width()//2, 500))
+                from telemetry import TelemetryWriter
+                self.telemetry_writer = TelemetryWriter()
+                print(f"[遥测] 写入: {self.telemetry_writer.path}")
             except Exception as e:
-                print(f"菜单渲染错误: {e}")
+                print(f"遥测初始化失败: {e}")
 
-        elif GAME_STATE == "MAP_SELECT":
+        # 共享内存世界状态（其他进程零拷贝读取）
+        self.world_publisher = None
+        if SHARE_WORLD:
             try:
-                screen.fill(WHITE)
-                title = title_font.render("选择地图", True, BLACK)
-                screen.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 50))
-                
-                if not available_maps:
-                    no_map_text = medium_font.render("未找到地图文件，按ESC返回", True, RED)
-                    screen.blit(no_map_text, (SCREEN_WIDTH//2 - no_map_text.get_width()//2, 250))
-                    
-                    hint_text = small_font.render("请在assets/maps 目录下放置JSON地图文件", True, BLACK)
-                    screen.blit(hint_text, (SCREEN_WIDTH//2 - hint_text.get_width()//2, 320))
-                else:
-                    # 计算滚动偏移量，确保选中的地图在可视区域内
-                    visible_count = 8  # 一次显示8个地图
-                    scroll_offset = max(0, min(selected_map_index - visible_count // 2, 
-                                              len(available_maps) - visible_count))
-                    
-                    # 绘制地图列表
-                    for i in range(scroll_offset, min(scroll_offset + visible_count, len(available_maps))):
-                        map_path = available_maps[i]
-                        map_name = os.path.basename(map_path).replace(".json", "")
-                        color = SELECTED_COLOR if i == selected_map_index else BLACK
-                        map_text = medium_font.render(map_name, True, color)
-                        y_pos = 120 + (i - scroll_offset) * 50
-                        screen.blit(map_text, (SCREEN_WIDTH//2 - map_text.get_width()//2, y_pos))
-                    
-                    # 绘制滚动提示（当地图数量超过可视数量时）
-                    if len(available_maps) > visible_count:
-                        scroll_hint = small_font.render("↑↓ 键滚动查看更多地图", True, BLACK)
-                        screen.blit(scroll_hint, (20, SCREEN_HEIGHT - 30))
-                    
-                    hint_text = small_font.render("空格键确认选择 | ESC返回菜单", True, BLACK)
-                    screen.blit(hint_text, (SCREEN_WIDTH//2 - hint_text.get_width()//2, 550))
+                from world_share import WorldPublisher
+                self.world_publisher = WorldPublisher()
+                print(f"[共享世界状态] 共享内存: {self.world_publisher.name}")
             except Exception as e:
-                print(f"地图选择界面渲染错误: {e}")
-                traceback.print_exc()
-                GAME_STATE = "MENU"
+                print(f"共享世界状态初始化失败: {e}")
 
-        elif GAME_STATE == "PLAYING":
+        self.boss_planner = None
+        if BOSS_PLANNER:
             try:
-                # 更新玩家坦克
-                if tanks and len(tanks) > 0:
-                    keys = pygame.key.get_pressed()
-                    tanks[0].update(keys, game_map, None, sound_manager)
-
-                # 更新AI坦克
-                if tanks and len(tanks) > 1:
-                    for tank in tanks[1:]:
-                        if hasattr(tank, 'health') and tank.health > 0:
-                            tank.update(None, game_map, tanks[0] if tanks else None, sound_manager)
-
-                # 改进的子弹碰撞检测系统
-                if tanks:
-                    for tank in tanks:
-                        if hasattr(tank, 'bullets') and hasattr(tank, 'health') and tank.health > 0:
-                            # 遍历子弹副本进行安全操作
-                            for bullet in tank.bullets[:]:
-                                if bullet.active:
-                                    # 更新子弹位置
-                                    bullet.update()
-                                    
-                                    # 首先检测子弹与地图障碍物的碰撞（包括灰色和绿色掩体）
-                                    if game_map.check_bullet_collision(bullet):
-                                        bullet.active = False
-                                        # 如果是可破坏掩体被击中，需要处理掩体销毁
-                                        if hasattr(game_map, 'destroyable_obstacles'):
-                                            for obstacle in game_map.destroyable_obstacles[:]:
-                                                if hasattr(obstacle, 'rect') and bullet.rect.colliderect(obstacle.rect):
-                                                    game_map.destroyable_obstacles.remove(obstacle)
-                                                    break
-                                        continue
-                                    
-                                    # 然后检测子弹与其他坦克的碰撞
-                                    hit_target = False
-                                    for target in tanks:
-                                        if target != tank and hasattr(target, 'health') and target.health > 0:
-                                            if hasattr(target, 'rect') and bullet.rect.colliderect(target.rect):
-                                                target.health -= 1
-                                                bullet.active = False
-                                                sound_manager.play_hit_sound()
-                                                if target.health <= 0:
-                                                    sound_manager.play_explosion_sound()
-                                                    # 敌人死亡时掉落血包
-                                                    if hasattr(target, 'drop_health'):
-                                                        target.drop_health()
-                                                hit_target = True
-                                                break
-                                    
-                                    # 移除失效子弹
-                                    if not bullet.active and bullet in tank.bullets:
-                                        tank.bullets.remove(bullet)
-
-                # 检查游戏结束条件
-                alive_enemies = []
-                if tanks and len(tanks) > 1:
-                    alive_enemies = [tank for tank in tanks[1:] if hasattr(tank, 'health') and tank.health > 0]
-                
-                if tanks and len(tanks) > 0 and hasattr(tanks[0], 'health') and tanks[0].health <= 0:
-                    if current_mode == "ENDLESS":
-                        winner_text = f"无尽模式结束！波次: {current_wave} | 等级: {player_level}"
-                    else:
-                        winner_text = "AI胜利!"
-                    GAME_STATE = "GAME_OVER"
-                    sound_manager.play_game_over_sound()
-                elif len(alive_enemies) == 0 and tanks and len(tanks) > 1:
-                    if current_mode == "ENDLESS":
-                        # 无尽模式下波次完成
-                        current_wave += 1
-                        spawn_wave()
-                        # 玩家获得波次奖励
-                        player_exp += 100 * current_wave
-                        # 检查是否升级
-                        if player_exp >= player_level * 200:
-                            player_exp -= player_level * 200
-                            level_up_player()
-                    else:
-                        winner_text = "玩家胜利!"
-                        GAME_STATE = "GAME_OVER"
-                        sound_manager.play_victory_sound()
-
-                # 绘制游戏画面
-                screen.fill(WHITE)
-                game_map.draw(screen)
-                
-                if tanks:
-                    for tank in tanks:
-                        if hasattr(tank, 'health') and tank.health > 0:
-                            tank.draw(screen)
-                
-                # 绘制血包
-                health_packs = []
-                for tank in tanks:
-                    if hasattr(tank, 'health') and tank.health <= 0 and hasattr(tank, 'health_pack') and tank.health_pack:
-                        health_packs.append(tank.health_pack)
-                        pygame.draw.rect(screen, (255, 0, 255), tank.health_pack.rect)
-                
-                # 检测玩家拾取血包
-                if tanks and len(tanks) > 0 and hasattr(tanks[0], 'rect'):
-                    player_rect = tanks[0].rect
-                    for tank in tanks:
-                        if hasattr(tank, 'health_pack') and tank.health_pack:
-                            if player_rect.colliderect(tank.health_pack.rect):
-                                # 玩家拾取血包
-                                tanks[0].health = min(tanks[0].health + 1, tanks[0].max_health)
-                                tank.health_pack = None
-                                sound_manager.play_powerup_sound()
-
-                # 信息显示
-                if current_mode == "ENDLESS":
-                    wave_text = small_font.render(f"波次: {current_wave}", True, BLACK)
-                    level_text = small_font.render(f"等级: {player_level}", True, BLACK)
-                    exp_text = small_font.render(f"经验: {player_exp}/{player_level * 200}", True, BLACK)
-                    screen.blit(wave_text, (10, 10))
-                    screen.blit(level_text, (10, 40))
-                    screen.blit(exp_text, (10, 70))
-                    
-                    if boss_tank and hasattr(boss_tank, 'health') and boss_tank.health > 0:
-                        boss_health_text = small_font.render(f"BOSS生命值: {boss_tank.health}/{boss_tank.max_health}", True, (128, 0, 128))
-                        screen.blit(boss_health_text, (SCREEN_WIDTH - 200, 10))
-                else:
-                    map_name_text = small_font.render(f"地图: {getattr(game_map, 'name', '未知')}", True, BLACK)
-                    screen.blit(map_name_text, (10, 10))
-                
-                enemy_count_text = small_font.render(f"敌方剩余: {len(alive_enemies)}", True, BLACK)
-                screen.blit(enemy_count_text, (10, 100 if current_mode == "ENDLESS" else 40))
-                
-                if tanks and len(tanks) > 0 and hasattr(tanks[0], 'health'):
-                    player_health_text = small_font.render(f"玩家生命值: {tanks[0].health}/{getattr(tanks[0], 'max_health', 3)}", True, BLACK)
-                    screen.blit(player_health_text, (10, 130 if current_mode == "ENDLESS" else 70))
-                
-                destroyable_count = small_font.render(f"掩体剩余: {len(getattr(game_map, 'destroyable_obstacles', []))}", True, BLACK)
-                screen.blit(destroyable_count, (10, 160 if current_mode == "ENDLESS" else 100))
-                
-                # 显示开发者复活提示（仅在无尽模式）
-                if current_mode == "ENDLESS":
-                    dev_text = small_font.render("按*键复活（开发者功能）", True, (128, 128, 128))
-                    screen.blit(dev_text, (SCREEN_WIDTH - 220, SCREEN_HEIGHT - 30))
+                from boss_planner import BossPlanner
+                self.boss_planner = BossPlanner()
+                self.boss_planner.start()
             except Exception as e:
-                print(f"游戏逻辑错误: {e}")
-                traceback.print_exc()
-                GAME_STATE = "GAME_OVER"
-                winner_text = "游戏出错!"
+                print(f"BOSS规划器初始化失败: {e}")
+                self.boss_planner = None
 
-        elif GAME_STATE == "GAME_OVER":
-            try:
-                screen.fill(WHITE)
-                result_text = large_font.render(winner_text, True, RED if "AI" in winner_text or "出错" in winner_text else GREEN)
-                screen.blit(result_text, (SCREEN_WIDTH//2 - result_text.get_width()//2, 200))
-                
-                if current_mode == "ENDLESS":
-                    stats_text = medium_font.render(f"最终波次: {current_wave} | 最终等级: {player_level}", True, BLACK)
-                    screen.blit(stats_text, (SCREEN_WIDTH//2 - stats_text.get_width()//2, 280))
-                else:
-                    map_text = medium_font.render(f"地图: {getattr(game_map, 'name', '未知')}", True, BLACK)
-                    screen.blit(map_text, (SCREEN_WIDTH//2 - map_text.get_width()//2, 280))
-                
-                stats_text2 = small_font.render(f"剩余掩体: {len(getattr(game_map, 'destroyable_obstacles', []))}", True, BLACK)
-                screen.blit(stats_text2, (SCREEN_WIDTH//2 - stats_text2.get_width()//2, 330))
-                
-                if current_mode == "ENDLESS":
-                    restart_text = small_font.render("按R键重新开始 | 按ESC键返回菜单 | 按*键复活", True, BLACK)
+        # 时钟和音效管理器
+        self.clock = pygame.time.Clock()
+        try:
+            self.sound_manager = SoundManager()
+        except Exception as e:
+            print(f"音效管理器初始化失败: {e}")
+            self.sound_manager = DummySoundManager()
+
+        # 游戏状态
+        self.state = "MENU"  # MENU, MAP_SELECT, PLAYING, GAME_OVER
+        self.winner_text = ""
+        self.selected_map_index = 0
+        self.scroll_offset = 0  # 地图列表滚动偏移量
+        self.running = False
+
+        # 强制重新加载地图并打印结果
+        self.available_maps = load_available_maps()
+        print(f"最终可用地图列表: {[os.path.basename(p) for p in self.available_maps]}")
+
+        # 地图缩略图：启动时即在后台线程生成（磁盘缓存命中时只需读取），选图界面不等待
+        self.thumbnail_cache = None
+        try:
+            self.thumbnail_cache = ThumbnailCache()
+            self.thumbnail_cache.request(self.available_maps)
+        except Exception as e:
+            print(f"缩略图生成器初始化失败: {e}")
+
+        # 地图目录监视：编辑地图文件后无需重启即可看到变化
+        self.map_watcher = MapWatcher(get_resource_path("assets/maps"))
+
+    def refresh_maps(self):
+        """轮询地图目录：更新地图列表和缩略图，当前对局的地图被修改时热更新"""
+        changes = self.map_watcher.poll()
+        if not changes:
+            return
+        print(f"[地图目录] 新增{len(changes.added)}个, 修改{len(changes.changed)}个, 删除{len(changes.removed)}个")
+
+        # 保持选中项指向同一张地图（被删除时退回到相近位置）
+        available_maps = self.available_maps
+        index = self.selected_map_index
+        selected_path = available_maps[index] if 0 <= index < len(available_maps) else None
+        removed = set(changes.removed)
+        loose_maps = [path for path in available_maps if not is_pack_path(path) and path not in removed]
+        available_maps = with_packed_maps(loose_maps + changes.added)
+        appeared = [path for path in available_maps if path not in self.available_maps]
+        if selected_path in available_maps:
+            self.selected_map_index = available_maps.index(selected_path)
+        else:
+            self.selected_map_index = min(index, max(0, len(available_maps) - 1))
+        self.available_maps = available_maps
+
+        if self.thumbnail_cache:
+            for path in changes.changed + changes.removed:
+                self.thumbnail_cache.invalidate(path)
+            self.thumbnail_cache.request(appeared + changes.changed)
+
+        match = self.match
+        if match and match.map_path and os.path.normpath(match.map_path) in changes.changed:
+            match.reload_map()
+
+    def reset_game(self, selected_map=None, mode="CLASSIC"):
+        """重置游戏状态"""
+        self.current_mode = mode
+        if self.telemetry:
+            self.telemetry.finish()
+            self.telemetry = None
+        try:
+            map_path = None
+            available_maps = self.available_maps
+            if selected_map is not None and available_maps and 0 <= selected_map < len(available_maps):
+                map_path = available_maps[selected_map]
+                print(f"加载选中地图: {os.path.basename(map_path)}")
+            else:
+                print("使用默认地图")
+
+            self.match = self._match_class(map_path, mode, self.sound_manager, ai_budget_ms=AI_BUDGET_MS,
+                                             tile_terrain=True if TILE_TERRAIN else None,
+                                             ai_threads=AI_THREADS or None, boss_planner=self.boss_planner,
+                                             prebuild_waves=PREBUILD_WAVES)
+            self.particles.clear()
+            self.match.events.subscribe(self.particles.handle_events, self._particle_kinds)
+            if self.telemetry_writer:
+                from telemetry import MatchTelemetry
+                self.telemetry = MatchTelemetry(self.match, self.telemetry_writer)
+            self.winner_text = ""
+            self.state = "PLAYING"
+        except Exception as e:
+            print(f"重置游戏失败: {e}")
+            traceback.print_exc()
+            self.state = "MENU"
+
+    def handle_key(self, key):
+        """处理按键（按当前界面分发）"""
+        if self.state == "MENU":
+            if key == pygame.K_1:
+                self.state = "MAP_SELECT"
+                self.current_mode = "CLASSIC"
+                print("选择经典模式")
+            elif key == pygame.K_2:
+                self.reset_game(mode="ENDLESS")
+                print("选择无尽模式")
+        elif self.state == "MAP_SELECT":
+            if self.available_maps:
+                if key == pygame.K_UP:
+                    self.selected_map_index = (self.selected_map_index - 1) % len(self.available_maps)
+                    print(f"选中地图索引: {self.selected_map_index}")
+                elif key == pygame.K_DOWN:
+                    self.selected_map_index = (self.selected_map_index + 1) % len(self.available_maps)
+                    print(f"选中地图索引: {self.selected_map_index}")
+                elif key == pygame.K_SPACE:
+                    self.reset_game(self.selected_map_index, self.current_mode)
+            if key == pygame.K_ESCAPE:
+                self.state = "MENU"
+                print("返回主菜单")
+        elif self.state == "GAME_OVER":
+            if key == pygame.K_r:
+                if self.current_mode == "ENDLESS":
+                    self.reset_game(mode="ENDLESS")
                 else:
-                    restart_text = small_font.render("按R键重新开始 | 按ESC键返回菜单", True, BLACK)
-                screen.blit(restart_text, (SCREEN_WIDTH//2 - restart_text.get_width()//2, 380))
-            except Exception as e:
-                print(f"游戏结束界面错误: {e}")
-
-        pygame.display.flip()
-        clock.tick(FPS)
-        
-except Exception as e:
-    print(f"主循环错误: {e}")
-    traceback.print_exc()
-finally:
-    pygame.quit()
-    print("游戏已退出")
\ No newline at end of file
+                    has_map = self.available_maps and self.selected_map_index < len(self.available_maps)
+                    self.reset_game(self.selected_map_index if has_map else None)
+            elif key == pygame.K_ESCAPE:
+                self.state = "MENU"
+            # 开发者复活功能
+            elif key == pygame.K_KP_MULTIPLY or key == pygame.K_asterisk:
+                if self.current_mode == "ENDLESS" and self.match:
+                    self.match.revive_player()
+                    self.state = "PLAYING"
+                    print("开发者复活")
+
+    def draw_menu(self):
+        screen = self.screen
+        screen.fill(WHITE)
+        title = self.title_font.render("坦克大战-真男人版", True, BLACK)
+        screen.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 150))
+
+        features = [
+            "Ctrl+空格键切换至英文",
+            "可破坏掩体",
+            "8方向移动与瞄准",
+            "生命值显示",
+            "无尽模式与BOSS战",
+            "玩家升级系统"
+        ]
+        for i, feature in enumerate(features):
+            feature_text = self.small_font.render(f"• {feature}", True, BLACK)
+            screen.blit(feature_text, (250, 250 + i * 40))
+
+        mode_text = self.medium_font.render("按1选择经典模式，按2选择无尽模式", True, BLACK)
+        screen.blit(mode_text, (SCREEN_WIDTH//2 - mode_text.get_width()//2, 500))
+
+    def draw_map_select(self):
+        screen = self.screen
+        small_font = self.small_font
+        available_maps = self.available_maps
+        thumbnail_cache = self.thumbnail_cache
+        screen.fill(WHITE)
+        title = self.title_font.render("选择地图", True, BLACK)
+        screen.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 50))
+
+        if not available_maps:
+            no_map_text = self.medium_font.render("未找到地图文件，按ESC返回", True, RED)
+            screen.blit(no_map_text, (SCREEN_WIDTH//2 - no_map_text.get_width()//2, 250))
+
+            hint_text = small_font.render("请在assets/maps 目录下放置JSON地图文件", True, BLACK)
+            screen.blit(hint_text, (SCREEN_WIDTH//2 - hint_text.get_width()//2, 320))
+            return
+
+        # 计算滚动偏移量，确保选中的地图在可视区域内
+        visible_count = 8  # 一次显示8个地图
+        scroll_offset = max(0, min(self.selected_map_index - visible_count // 2,
+                                   len(available_maps) - visible_count))
+        self.scroll_offset = scroll_offset
+
+        # 当前可见的地图优先生成缩略图
+        visible_maps = available_maps[scroll_offset:scroll_offset + visible_count]
+        if thumbnail_cache:
+            thumbnail_cache.request(visible_maps, urgent=True)
+
+        # 绘制地图列表（左侧小图标 + 名称）
+        for i in range(scroll_offset, min(scroll_offset + visible_count, len(available_maps))):
+            map_path = available_maps[i]
+            map_name = os.path.splitext(os.path.basename(map_path))[0]
+            color = SELECTED_COLOR if i == self.selected_map_index else BLACK
+            map_text = self.medium_font.render(map_name, True, color)
+            y_pos = 120 + (i - scroll_offset) * 50
+            thumbs = thumbnail_cache.get(map_path) if thumbnail_cache else None
+            icon_rect = pygame.Rect(120, y_pos, 48, 36)
+            if thumbs:
+                screen.blit(thumbs[1], icon_rect)
+            else:
+                pygame.draw.rect(screen, (200, 200, 200), icon_rect, 1)  # 生成中的占位框
+            screen.blit(map_text, (185, y_pos))
+
+        # 右侧显示选中地图的大图预览
+        preview_rect = pygame.Rect(560, 140, 160, 120)
+        thumbs = thumbnail_cache.get(available_maps[self.selected_map_index]) if thumbnail_cache else None
+        if thumbs:
+            screen.blit(thumbs[0], preview_rect)
+        else:
+            pygame.draw.rect(screen, (200, 200, 200), preview_rect, 1)
+            loading_text = small_font.render("预览生成中...", True, BLACK)
+            screen.blit(loading_text, (preview_rect.centerx - loading_text.get_width()//2,
+                                       preview_rect.centery - loading_text.get_height()//2))
+
+        # 绘制滚动提示（当地图数量超过可视数量时）
+        if len(available_maps) > visible_count:
+            scroll_hint = small_font.render("↑↓ 键滚动查看更多地图", True, BLACK)
+            screen.blit(scroll_hint, (20, SCREEN_HEIGHT - 30))
+
+        hint_text = small_font.render("空格键确认选择 | ESC返回菜单", True, BLACK)
+        screen.blit(hint_text, (SCREEN_WIDTH//2 - hint_text.get_width()//2, 550))
+
+    def update_playing(self):
+        """推进一帧对局并绘制，返回画面是否已交给渲染线程"""
+        match = self.match
+        frame_start = time.perf_counter()
+        # 推进一帧对局模拟（坦克、子弹碰撞、波次、血包拾取）
+        keys = pygame.key.get_pressed()
+        match.step(keys)
+        self.particles.update()
+        if self.world_publisher:
+            self.world_publisher.publish(match, self.current_mode)
+        if match.over:
+            self.winner_text = match.winner_text
+            self.state = "GAME_OVER"
+
+        # 生成渲染数据包并绘制（线程模式下交给渲染线程）
+        packet = self.packet_builder.build(match, self.current_mode, self.particles)
+        submitted = False
+        if self.render_thread:
+            self.render_thread.submit(packet)
+            submitted = True
+        else:
+            self.frame_renderer.render(packet)
+        if self.telemetry:
+            self.telemetry.record_frame((time.perf_counter() - frame_start) * 1000)
+        return submitted
+
+    def draw_game_over(self):
+        screen = self.screen
+        match = self.match
+        winner_text = self.winner_text
+        screen.fill(WHITE)
+        result_text = self.large_font.render(winner_text, True, RED if "AI" in winner_text or "出错" in winner_text else GREEN)
+        screen.blit(result_text, (SCREEN_WIDTH//2 - result_text.get_width()//2, 200))
+
+        game_map = match.game_map if match else None
+        if self.current_mode == "ENDLESS" and match:
+            stats_text = self.medium_font.render(f"最终波次: {match.current_wave} | 最终等级: {match.player_level}", True, BLACK)
+            screen.blit(stats_text, (SCREEN_WIDTH//2 - stats_text.get_width()//2, 280))
+        else:
+            map_text = self.medium_font.render(f"地图: {getattr(game_map, 'name', '未知')}", True, BLACK)
+            screen.blit(map_text, (SCREEN_WIDTH//2 - map_text.get_width()//2, 280))
+
+        stats_text2 = self.small_font.render(f"剩余掩体: {game_map.cover_count() if game_map else 0}", True, BLACK)
+        screen.blit(stats_text2, (SCREEN_WIDTH//2 - stats_text2.get_width()//2, 330))
+
+        if self.current_mode == "ENDLESS":
+            restart_text = self.small_font.render("按R键重新开始 | 按ESC键返回菜单 | 按*键复活", True, BLACK)
+        else:
+            restart_text = self.small_font.render("按R键重新开始 | 按ESC键返回菜单", True, BLACK)
+        screen.blit(restart_text, (SCREEN_WIDTH//2 - restart_text.get_width()//2, 380))
+
+    def run(self):
+        """游戏主循环（退出时释放所有资源）"""
+        self.running = True
+        try:
+            while self.running:
+                frame_submitted = False  # 本帧画面是否已交给渲染线程
+                try:
+                    self.refresh_maps()
+                except Exception as e:
+                    print(f"刷新地图列表失败: {e}")
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        self.running = False
+                    if event.type == pygame.KEYDOWN:
+                        try:
+                            self.handle_key(event.key)
+                        except Exception as e:
+                            print(f"事件处理错误: {e}")
+                            traceback.print_exc()
+
+                # 主线程绘制其他界面前，确保渲染线程已空闲
+                if self.render_thread and self.state != "PLAYING":
+                    self.render_thread.wait_idle()
+
+                if self.state == "MENU":
+                    try:
+                        self.draw_menu()
+                    except Exception as e:
+                        print(f"菜单渲染错误: {e}")
+
+                elif self.state == "MAP_SELECT":
+                    try:
+                        self.draw_map_select()
+                    except Exception as e:
+                        print(f"地图选择界面渲染错误: {e}")
+                        traceback.print_exc()
+                        self.state = "MENU"
+
+                elif self.state == "PLAYING":
+                    try:
+                        frame_submitted = self.update_playing()
+                    except Exception as e:
+                        print(f"游戏逻辑错误: {e}")
+                        traceback.print_exc()
+                        self.state = "GAME_OVER"
+                        self.winner_text = "游戏出错!"
+
+                elif self.state == "GAME_OVER":
+                    try:
+                        self.draw_game_over()
+                    except Exception as e:
+                        print(f"游戏结束界面错误: {e}")
+
+                if not frame_submitted:
+                    pygame.display.flip()
+                self.clock.tick(FPS)
+
+        except Exception as e:
+            print(f"主循环错误: {e}")
+            traceback.print_exc()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        if self.render_thread:
+            self.render_thread.stop()
+        if self.thumbnail_cache:
+            self.thumbnail_cache.stop()
+        if self.telemetry:
+            self.telemetry.finish()
+        if self.telemetry_writer:
+            self.telemetry_writer.close()
+        if self.world_publisher:
+            self.world_publisher.close()
+        if self.boss_planner:
+            self.boss_planner.close()
+        pygame.quit()
+        print("游戏已退出")
+
+
+def main():
+    """启动游戏"""
+    Game().run()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,26 +2,123 @@ import pygame
 import random
 import json
 import os
+from collections import Counter
 from game_objects import GameObject
+from cover import CoverIndex
+from map_generator import generate_obstacle_rects
+from tile_terrain import TileTerrain, TILE_HP, SCREEN_WIDTH, SCREEN_HEIGHT
+from chunked_map import ChunkStream, CHUNKED_SUFFIX
+
+# 地图JSON中两类障碍物的字段名、默认尺寸与默认颜色
+OBSTACLE_KINDS = (
+    ("obstacles", 50, (100, 100, 100)),
+    ("destroyable_obstacles", 40, (0, 200, 0)),
+)
+
+
+def obstacle_signature(obs_data, default_size, default_color):
+    """障碍物在地图文件中的标识：(x, y, 宽, 高, 颜色)"""
+    return (
+        obs_data.get("x", 0),
+        obs_data.get("y", 0),
+        obs_data.get("width", default_size),
+        obs_data.get("height", default_size),
+        tuple(obs_data.get("color", default_color)),
+    )
+
+
+def _live_signature(obstacle):
+    rect = obstacle.rect
+    return (rect.x, rect.y, rect.width, rect.height, tuple(obstacle.color))
 
 class Map:
     """地图类，支持从JSON文件加载和可破坏掩体"""
-    def __init__(self, map_path=None):  # 支持传入路径或名称
+    def __init__(self, map_path=None, tile_terrain=None, rng=None):  # 支持传入路径或名称
         self.obstacles = []  # 不可破坏的边界
-        self.destroyable_obstacles = []  # 可破坏的掩体
+        self.destroyable_obstacles = []  # 可破坏的掩体（砖块地形模式下为空）
+        # 砖块地形：True/False 强制开启/关闭，None 时由地图文件的 "terrain": "tiles" 决定
+        self.tile_terrain = tile_terrain
+        self.terrain = None  # 砖块地形模式下可破坏掩体转换成的 TileTerrain
+        self._tile_hp = TILE_HP
         self.name = "默认地图"
         self.description = "系统默认生成的地图"
+        self.cover_index = None  # 掩护点索引（加载完成后构建）
+        self.path = None  # 地图文件路径（默认地图为None）
+        self.revision = 0  # 障碍物被热更新的次数（渲染缓存据此失效）
+        self._source = {}  # 上次加载的文件中各类障碍物的标识计数
+        self.stream = None  # 分块地图的区块流（只有玩家附近的区块在障碍物列表中）
         
         if map_path:
             # 判断传入的是路径还是名称
-            if os.path.isfile(map_path) or map_path.endswith('.json'):
+            if map_path.endswith(CHUNKED_SUFFIX):
+                self.load_chunked(map_path)
+            elif os.path.isfile(map_path) or map_path.endswith('.json'):
                 self.load_from_path(map_path)
             else:
                 self.load_from_name(map_path)
         else:
             # 使用默认地图
             self._generate_borders()
-            self._generate_destroyable_obstacles()
+            self._generate_destroyable_obstacles(random if rng is None else rng)
+
+        if self.tile_terrain:
+            self._convert_to_tiles()
+        self.rebuild_cover_index()
+
+    def _convert_to_tiles(self):
+        """把可破坏掩体转换为砖块地形（原掩体列表清空，由地形负责碰撞和破坏）"""
+        try:
+            self.terrain = TileTerrain.from_obstacles(self.destroyable_obstacles, max_hp=self._tile_hp)
+            self.destroyable_obstacles = []
+        except Exception as e:
+            print(f"转换砖块地形失败: {e}")
+            self.terrain = None
+
+    def cover_count(self):
+        """剩余的可破坏掩体数量（砖块地形中仍有砖块的掩体也计入）"""
+        count = len(self.destroyable_obstacles)
+        if self.terrain is not None:
+            count += self.terrain.blocks_left
+        return count
+
+    def cover_obstacles(self):
+        """参与掩护点计算的全部障碍物（砖块地形中仍有砖块的原始掩体也计入）"""
+        obstacles = self.obstacles + self.destroyable_obstacles
+        if self.terrain is not None:
+            obstacles += self.terrain.live_blocks()
+        return obstacles
+
+    def rebuild_cover_index(self):
+        """重新计算掩护点索引（障碍物列表被整体替换后调用）"""
+        try:
+            self.cover_index = CoverIndex(self)
+        except Exception as e:
+            print(f"构建掩护点索引失败: {e}")
+            self.cover_index = None
+
+    def find_cover(self, pos, threat_pos, radius):
+        """查找半径内离pos最近、且被障碍物挡住threat_pos视线的掩护点"""
+        if self.cover_index is None:
+            return None
+        return self.cover_index.find_cover(pos, threat_pos, radius)
+
+    def remove_destroyable(self, obstacle):
+        """移除被摧毁的掩体，并同步更新掩护点索引"""
+        if obstacle in self.destroyable_obstacles:
+            self.destroyable_obstacles.remove(obstacle)
+        if self.stream is not None:
+            self.stream.mark_destroyed(obstacle)
+        if self.cover_index is not None:
+            self.cover_index.remove_obstacle(obstacle)
+
+    def remove_obstacle(self, obstacle):
+        """移除不可破坏的障碍物（如压住坦克的墙体），分块地图重新加载区块时不再出现"""
+        if obstacle in self.obstacles:
+            self.obstacles.remove(obstacle)
+        if self.stream is not None:
+            self.stream.mark_destroyed(obstacle)
+        if self.cover_index is not None:
+            self.cover_index.remove_obstacle(obstacle)
 
     def get_maps_directory(self):
         """获取地图目录（支持多种路径）"""
@@ -63,10 +160,15 @@ class Map:
             
             with open(map_path, 'r', encoding='utf-8') as f:
                 map_data = json.load(f)
+            self.path = map_path
+            self._source = self._source_signatures(map_data)
             
             # 加载地图基本信息
             self.name = map_data.get("name", os.path.splitext(os.path.basename(map_path))[0])
             self.description = map_data.get("description", "无描述")
+            if self.tile_terrain is None:
+                self.tile_terrain = map_data.get("terrain") == "tiles"
+            self._tile_hp = map_data.get("tile_hp", TILE_HP)
             
             # 加载不可破坏障碍物
             for obs_data in map_data.get("obstacles", []):
@@ -108,6 +210,152 @@ class Map:
             print(f"加载地图失败 '{map_path}': {e}")
             self._generate_default_map()
 
+    def load_chunked(self, map_path):
+        """打开分块地图：只读取文件头和区块目录，障碍物由 stream_around 按玩家位置流式加载
+
+        地图元数据中的 terrain、tile_hp 与JSON地图的同名字段作用相同。
+        要求砖块地形时，掩体都在画面内的地图（如资源包中预编译的地图）一次加载全部障碍物、
+        不再流式加载，之后照常转换为砖块地形；更大的地图不支持砖块地形，提示后使用普通掩体。
+        """
+        try:
+            stream = ChunkStream(map_path)
+            self.path = map_path
+            self.name = stream.name
+            self.description = stream.description or "分块地图"
+            if self.tile_terrain is None:
+                self.tile_terrain = stream.terrain == "tiles"
+            if stream.tile_hp is not None:
+                self._tile_hp = stream.tile_hp
+            if self.tile_terrain and stream.covers_within(SCREEN_WIDTH, SCREEN_HEIGHT):
+                walls, covers = stream.load_all()
+                stream.close()
+                self.obstacles.extend(walls)
+                self.destroyable_obstacles.extend(covers)
+                print(f"成功加载分块地图: {self.name}（{len(walls) + len(covers)} 个障碍物，使用砖块地形）")
+                return
+            if self.tile_terrain:
+                print(f"分块地图 {self.name} 超出画面范围，不支持砖块地形，使用普通掩体")
+            self.tile_terrain = False
+            self.stream = stream
+            print(f"成功打开分块地图: {self.name}（{len(stream)} 个障碍物，按区块加载）")
+        except Exception as e:
+            print(f"加载分块地图失败 '{map_path}': {e}")
+            self.stream = None
+            self._generate_default_map()
+
+    def stream_around(self, pos, complete=False, keep_clear=()):
+        """分块地图：加载pos附近的区块、卸下最久未用的区块，有变化时返回True
+
+        平时每帧只加载几个区块，complete=True 时一次加载完（开局时使用）。
+        新加载的障碍物与 keep_clear 中的对象（坦克）重叠时直接移除并记入区块流，与开局时的处理相同。
+        """
+        if self.stream is None:
+            return False
+        walls, covers, removed = self.stream.focus(*pos, complete)
+        if not (walls or covers or removed):
+            return False
+        if keep_clear and (walls or covers):
+            rects = [obj.rect for obj in keep_clear]
+            blocked = {obstacle for obstacle in walls + covers if obstacle.rect.collidelist(rects) != -1}
+            if blocked:
+                for obstacle in blocked:
+                    self.stream.mark_destroyed(obstacle)
+                walls = [obstacle for obstacle in walls if obstacle not in blocked]
+                covers = [obstacle for obstacle in covers if obstacle not in blocked]
+        if removed:
+            gone = set(removed)
+            self.obstacles = [obstacle for obstacle in self.obstacles if obstacle not in gone]
+            self.destroyable_obstacles = [obstacle for obstacle in self.destroyable_obstacles if obstacle not in gone]
+        self.obstacles.extend(walls)
+        self.destroyable_obstacles.extend(covers)
+        self.revision += 1
+        if self.cover_index is not None:
+            self.cover_index.update_obstacles(self, removed, walls + covers)
+        return True
+
+    @staticmethod
+    def _source_signatures(map_data):
+        return {
+            kind: Counter(obstacle_signature(obs, size, color) for obs in map_data.get(kind, []))
+            for kind, size, color in OBSTACLE_KINDS
+        }
+
+    def apply_file_changes(self, map_path=None):
+        """地图文件被修改后，只把新增和删除的障碍物应用到当前地图（不重置对局）
+
+        与上次加载的文件内容逐项比较：文件中删除的障碍物从地图移除，新增的加入地图，
+        未改动的保持原状（已被摧毁的掩体不会复活）。返回新增的障碍物列表，
+        文件无法解析时（例如正在编辑中）返回None并保留当前地图。
+        """
+        map_path = map_path or self.path
+        if not map_path or self.stream is not None:
+            return None
+        try:
+            with open(map_path, 'r', encoding='utf-8') as f:
+                map_data = json.load(f)
+            new_source = self._source_signatures(map_data)
+        except Exception as e:
+            print(f"热更新地图失败 '{map_path}': {e}")
+            return None
+
+        removed = []
+        added = []
+        for kind, size, color in OBSTACLE_KINDS:
+            old = self._source.get(kind, Counter())
+            new = new_source[kind]
+            if kind == "destroyable_obstacles" and self.terrain is not None:
+                if old != new:
+                    removed.extend(self.terrain.live_blocks())
+                    added.extend(self._reload_terrain(map_data, size, color))
+                continue
+            live = getattr(self, kind)
+            for signature, count in (old - new).items():
+                for obstacle in live[:]:
+                    if count == 0:
+                        break
+                    if _live_signature(obstacle) == signature:
+                        live.remove(obstacle)
+                        removed.append(obstacle)
+                        count -= 1
+            for signature, count in (new - old).items():
+                x, y, width, height, obs_color = signature
+                for _ in range(count):
+                    try:
+                        obstacle = GameObject(x, y, width, height, obs_color)
+                    except Exception as e:
+                        print(f"加载障碍物失败: {e}")
+                        continue
+                    live.append(obstacle)
+                    added.append(obstacle)
+
+        self.path = map_path
+        self._source = new_source
+        self.name = map_data.get("name", self.name)
+        self.description = map_data.get("description", self.description)
+        if removed or added:
+            self.revision += 1
+            if self.cover_index is not None:
+                self.cover_index.update_obstacles(self, removed, added)
+            print(f"地图热更新: {self.name} 新增{len(added)}个, 移除{len(removed)}个障碍物")
+        return added
+
+    def _reload_terrain(self, map_data, default_size, default_color):
+        """砖块地形模式下掩体有变化时按文件重建整个地形（已造成的破坏不保留），返回新的原始掩体"""
+        blocks = []
+        for obs_data in map_data.get("destroyable_obstacles", []):
+            x, y, width, height, obs_color = obstacle_signature(obs_data, default_size, default_color)
+            try:
+                blocks.append(GameObject(x, y, width, height, obs_color))
+            except Exception as e:
+                print(f"加载可破坏障碍物失败: {e}")
+        self._tile_hp = map_data.get("tile_hp", self._tile_hp)
+        try:
+            self.terrain = TileTerrain.from_obstacles(blocks, max_hp=self._tile_hp)
+        except Exception as e:
+            print(f"转换砖块地形失败: {e}")
+            return []
+        return blocks
+
     def _generate_default_map(self):
         """生成默认地图"""
         self.name = "应急默认地图"
@@ -121,28 +369,12 @@ class Map:
         self.obstacles.append(GameObject(0, -10, 800, 10, (100, 100, 100)))
         self.obstacles.append(GameObject(0, 600, 800, 10, (100, 100, 100)))
 
-    def _generate_destroyable_obstacles(self):
-        """生成可破坏的掩体"""
-        for _ in range(15):
-            try:
-                while True:
-                    x = random.randint(50, 700)
-                    y = random.randint(50, 500)
-                    width = random.randint(30, 50)
-                    height = random.randint(30, 50)
-                    new_obstacle = GameObject(x, y, width, height, (0, 200, 0))
-                    
-                    # 检查是否与现有障碍物重叠
-                    overlap = False
-                    for obs in self.obstacles + self.destroyable_obstacles:
-                        if new_obstacle.rect.colliderect(obs.rect):
-                            overlap = True
-                            break
-                    if not overlap:
-                        self.destroyable_obstacles.append(new_obstacle)
-                        break
-            except Exception:
-                continue
+    def _generate_destroyable_obstacles(self, rng=random):
+        """生成可破坏的掩体（网格放置，互不重叠且不会死循环）"""
+        # 掩体左上角范围与原先一致：x 50-700, y 50-500，边长 30-50
+        for x, y, width, height in generate_obstacle_rects(rng, 15, (50, 50, 700, 500), 30, 50):
+            new_obstacle = GameObject(x, y, width, height, (0, 200, 0))
+            self.destroyable_obstacles.append(new_obstacle)
 
     def check_collision(self, rect):
         """检测是否与任何障碍物碰撞"""
@@ -150,6 +382,8 @@ class Map:
             for obstacle in self.obstacles + self.destroyable_obstacles:
                 if rect and obstacle.rect and rect.colliderect(obstacle.rect):
                     return True
+            if self.terrain is not None and rect:
+                return self.terrain.collides(rect)
         except Exception:
             pass
         return False
@@ -166,7 +400,17 @@ class Map:
             # 检查可破坏障碍物
             for obstacle in self.destroyable_obstacles[:]:
                 if bullet and bullet.rect and obstacle.rect and bullet.rect.colliderect(obstacle.rect):
-                    self.destroyable_obstacles.remove(obstacle)
+                    self.remove_destroyable(obstacle)
+                    bullet.active = False
+                    return True
+
+            # 砖块地形：只破坏命中位置附近的砖块，整块掩体被打穿时移除其掩护点
+            if self.terrain is not None and bullet and bullet.rect:
+                destroyed = self.terrain.hit(bullet.rect)
+                if destroyed is not None:
+                    if self.cover_index is not None:
+                        for block in destroyed:
+                            self.cover_index.remove_obstacle(block)
                     bullet.active = False
                     return True
         except Exception as e:
@@ -181,6 +425,8 @@ class Map:
                 obstacle.draw(screen)
             for obstacle in self.destroyable_obstacles:
                 obstacle.draw(screen)
+            if self.terrain is not None:
+                self.terrain.draw(screen)
         except Exception as e:
             print(f"绘制地图失败: {e}")
 
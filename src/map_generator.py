@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+import random
+import time
+
+# 颜色配置（与手工地图保持一致）
+WALL_COLOR = [100, 100, 100]
+COVER_COLOR = [0, 200, 0]
+
+# 对称方式：none 无对称, mirror 左右镜像（如镜像战场）, flip 上下镜像,
+# quad 四象限对称, rotate 中心旋转180度对称
+SYMMETRIES = ["none", "mirror", "flip", "quad", "rotate"]
+
+
+def _regions(symmetry):
+    """返回对称方式的基本区域份数（横向份数, 纵向份数）"""
+    if symmetry in ("mirror", "rotate"):
+        return 2, 1
+    if symmetry == "flip":
+        return 1, 2
+    if symmetry == "quad":
+        return 2, 2
+    return 1, 1
+
+
+def _reflect(rects, symmetry, width, height):
+    """把基本区域内的矩形按对称方式复制到整张地图"""
+    result = list(rects)
+    for x, y, w, h in rects:
+        mirrored_x = width - x - w
+        mirrored_y = height - y - h
+        if symmetry == "mirror":
+            result.append((mirrored_x, y, w, h))
+        elif symmetry == "flip":
+            result.append((x, mirrored_y, w, h))
+        elif symmetry == "rotate":
+            result.append((mirrored_x, mirrored_y, w, h))
+        elif symmetry == "quad":
+            result.append((mirrored_x, y, w, h))
+            result.append((x, mirrored_y, w, h))
+            result.append((mirrored_x, mirrored_y, w, h))
+    return result
+
+
+def _place_in_grid(rng, count, area, cell_w, cell_h, size_fn, gap, blocked=None):
+    """网格放置：每个单元格最多放一个障碍物并在格内随机抖动
+
+    障碍物严格位于各自单元格内，因此天然互不重叠，不需要两两检测，
+    复杂度为 O(单元格数)，也不会像拒绝采样那样在拥挤地图上死循环。
+    """
+    ax, ay, aw, ah = area
+    cols = max(0, aw // cell_w)
+    rows = max(0, ah // cell_h)
+    cells = [(col, row) for row in range(rows) for col in range(cols)
+             if not (blocked and (col, row) in blocked)]
+    rng.shuffle(cells)
+    if count > len(cells):
+        print(f"[地图生成] 空间不足：需要{count}个障碍物，最多只能放置{len(cells)}个")
+        count = len(cells)
+
+    rects = []
+    for col, row in cells[:count]:
+        w, h = size_fn()
+        w = min(w, cell_w - gap)
+        h = min(h, cell_h - gap)
+        x = ax + col * cell_w + rng.randint(0, cell_w - gap - w)
+        y = ay + row * cell_h + rng.randint(0, cell_h - gap - h)
+        rects.append((x, y, w, h))
+    return rects
+
+
+def _blocked_cells(rects, area, cell_w, cell_h):
+    """计算被已有矩形占用的网格单元（用于让掩体避开墙体）"""
+    ax, ay = area[0], area[1]
+    blocked = set()
+    for x, y, w, h in rects:
+        for col in range((x - ax) // cell_w, (x + w - 1 - ax) // cell_w + 1):
+            for row in range((y - ay) // cell_h, (y + h - 1 - ay) // cell_h + 1):
+                blocked.add((col, row))
+    return blocked
+
+
+def generate_obstacle_rects(rng, count, area, min_size=30, max_size=50, gap=5):
+    """在区域内生成count个互不重叠的随机尺寸矩形，返回 (x, y, w, h) 列表"""
+    cell = max_size + gap
+    return _place_in_grid(
+        rng, count, area, cell, cell,
+        lambda: (rng.randint(min_size, max_size), rng.randint(min_size, max_size)),
+        gap
+    )
+
+
+def generate_map(seed=None, width=800, height=600, obstacles=15, walls=0, symmetry="none",
+                 min_size=30, max_size=50, margin=50, name=None, rng=None):
+    """生成一张地图，返回与 assets/maps 相同格式的字典
+
+    obstacles/walls 为整张地图的数量，有对称时会按对称份数均分到基本区域。
+    """
+    if symmetry not in SYMMETRIES:
+        raise ValueError(f"未知的对称方式: {symmetry}")
+    if rng is None:
+        rng = random.Random(seed)
+
+    x_parts, y_parts = _regions(symmetry)
+    copies = x_parts * y_parts
+    # 基本区域：对称地图只在左/上部分生成，再镜像到其余部分
+    area = (margin, margin, (width - 2 * margin) // x_parts, (height - 2 * margin) // y_parts)
+
+    # 不可破坏墙体：长条形，放在粗网格上
+    wall_rects = []
+    if walls > 0:
+        bar_long, bar_short = max_size * 3, max_size
+        cell = bar_long + max_size
+
+        def wall_size():
+            return (bar_long, bar_short) if rng.random() < 0.5 else (bar_short, bar_long)
+
+        wall_rects = _place_in_grid(rng, max(1, walls // copies), area, cell, cell, wall_size, max_size)
+
+    # 可破坏掩体：细网格，跳过被墙体占用的单元格
+    cover_cell = max_size + 5
+    blocked = _blocked_cells(wall_rects, area, cover_cell, cover_cell)
+    cover_rects = _place_in_grid(
+        rng, max(0, obstacles // copies), area, cover_cell, cover_cell,
+        lambda: (rng.randint(min_size, max_size), rng.randint(min_size, max_size)),
+        5, blocked
+    )
+
+    if symmetry != "none":
+        wall_rects = _reflect(wall_rects, symmetry, width, height)
+        cover_rects = _reflect(cover_rects, symmetry, width, height)
+
+    borders = [
+        (-10, 0, 10, height),
+        (width, 0, 10, height),
+        (0, -10, width, 10),
+        (0, height, width, 10),
+    ]
+    return {
+        "name": name or f"随机地图_{seed}",
+        "description": f"程序生成地图（种子: {seed}, 对称: {symmetry}）",
+        "obstacles": [_obstacle(r, WALL_COLOR) for r in borders + wall_rects],
+        "destroyable_obstacles": [_obstacle(r, COVER_COLOR) for r in cover_rects],
+    }
+
+
+def _obstacle(rect, color):
+    x, y, w, h = rect
+    return {"x": x, "y": y, "width": w, "height": h, "color": list(color)}
+
+
+def dump_map(map_data, f):
+    """按手工地图的排版写出JSON（每个障碍物占一行）"""
+    def obstacle_lines(items):
+        return ",\n".join("        " + json.dumps(item, ensure_ascii=False) for item in items)
+
+    f.write("{\n")
+    f.write(f'    "name": {json.dumps(map_data["name"], ensure_ascii=False)},\n')
+    f.write(f'    "description": {json.dumps(map_data["description"], ensure_ascii=False)},\n')
+    f.write('    "obstacles": [\n' + obstacle_lines(map_data["obstacles"]) + "\n    ],\n")
+    f.write('    "destroyable_obstacles": [\n' + obstacle_lines(map_data["destroyable_obstacles"]) + "\n    ]\n")
+    f.write("}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量生成随机地图（JSON格式与assets/maps一致）")
+    parser.add_argument("--out", default="generated_maps", help="输出目录")
+    parser.add_argument("--count", type=int, default=10, help="生成地图数量")
+    parser.add_argument("--seed", type=int, default=0, help="起始种子（第i张地图使用 seed+i）")
+    parser.add_argument("--obstacles", type=int, default=15, help="每张地图的可破坏掩体数量")
+    parser.add_argument("--walls", type=int, default=4, help="每张地图的不可破坏墙体数量")
+    parser.add_argument("--symmetry", choices=SYMMETRIES, default="none", help="对称方式")
+    parser.add_argument("--width", type=int, default=800)
+    parser.add_argument("--height", type=int, default=600)
+    parser.add_argument("--min-size", type=int, default=30, help="掩体最小边长")
+    parser.add_argument("--max-size", type=int, default=50, help="掩体最大边长")
+    parser.add_argument("--prefix", default="随机地图", help="地图名称前缀")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    total_obstacles = 0
+    start = time.perf_counter()
+    for i in range(args.count):
+        seed = args.seed + i
+        name = f"{args.prefix}_{seed}"
+        map_data = generate_map(
+            seed, args.width, args.height, args.obstacles, args.walls, args.symmetry,
+            args.min_size, args.max_size, name=name
+        )
+        total_obstacles += len(map_data["destroyable_obstacles"]) + len(map_data["obstacles"])
+        with open(os.path.join(args.out, f"{name}.json"), "w", encoding="utf-8") as f:
+            dump_map(map_data, f)
+    elapsed = time.perf_counter() - start
+    print(f"生成 {args.count} 张地图，共 {total_obstacles} 个障碍物，耗时 {elapsed * 1000:.1f}ms -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import os
+import time
+from collections import namedtuple
+
+# 一次轮询发现的变化（均为文件路径列表）
+MapChanges = namedtuple("MapChanges", "added changed removed")
+
+
+class MapWatcher:
+    """轮询地图目录的修改时间，发现新增、修改和删除的地图文件
+
+    不依赖系统文件通知，按interval秒间隔调用os.scandir，数百个文件也只需不到一毫秒，
+    可以直接在主循环中每帧调用poll()。
+    """
+    def __init__(self, directory, interval=1.0, suffix=".json"):
+        self.directory = directory
+        self.interval = interval
+        self.suffix = suffix
+        self._last_poll = time.monotonic()
+        self._known = self._scan()  # 路径 -> (修改时间ns, 文件大小)
+
+    def paths(self):
+        return list(self._known)
+
+    def _scan(self):
+        snapshot = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(self.suffix):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue  # 文件在扫描过程中被删除
+                    path = os.path.normpath(os.path.join(self.directory, entry.name))
+                    snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            pass  # 目录暂时不可访问时视为空
+        return snapshot
+
+    def poll(self, force=False):
+        """到达轮询间隔时扫描目录，有变化返回MapChanges，否则返回None"""
+        now = time.monotonic()
+        if not force and now - self._last_poll < self.interval:
+            return None
+        self._last_poll = now
+
+        snapshot = self._scan()
+        known = self._known
+        added = [path for path in snapshot if path not in known]
+        removed = [path for path in known if path not in snapshot]
+        changed = [path for path, stamp in snapshot.items() if path in known and known[path] != stamp]
+        self._known = snapshot
+        if added or changed or removed:
+            return MapChanges(sorted(added), changed, removed)
+        return None
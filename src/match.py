@@ -0,0 +1,406 @@
+import random
+from collections import deque, namedtuple
+from tank import Tank
+from ai_scheduler import AIScheduler
+from parallel_ai import ParallelAI
+from wave_builder import WaveBuilder, build_enemies, SPAWN_INTERVAL, SAFE_DISTANCE
+from map import Map
+from events import (EventBus, HIT, KILL, COVER_DESTROYED, PICKUP, LEVEL_UP,
+                    WAVE, SPAWN, GAME_OVER, VICTORY)
+
+MAX_HEALTH_PACKS = 10  # 场上最多保留的血包数量（超出时移除最早掉落的）
+
+# 等待进场的敌人：frame 为进场帧，alternates 为离玩家太近时改用的备用出生点
+PendingSpawn = namedtuple("PendingSpawn", "frame tank alternates")
+
+
+def find_bullet_target(bullet, tanks, shooter=None):
+    """按坦克列表顺序返回第一辆被子弹命中的存活坦克（开火者除外），没有命中时返回None"""
+    for target in tanks:
+        if target is not shooter and target.health > 0 and bullet.rect.colliderect(target.rect):
+            return target
+    return None
+
+
+class Match:
+    """单局对战模拟，负责地图、坦克、波次、经验和碰撞结算（不涉及绘制）"""
+    def __init__(self, map_path=None, mode="CLASSIC", sound_manager=None, verbose=True, ai_budget_ms=None,
+                 tile_terrain=None, ai_threads=None, rng=None, boss_planner=None, prebuild_waves=False):
+        self.map_path = map_path
+        self.mode = mode
+        self.tile_terrain = tile_terrain  # 砖块地形：None 时由地图文件决定
+        self.sound_manager = sound_manager
+        # 对局的随机数来源：默认为全局 random 模块（录像、训练环境用 random.seed 复现），
+        # 同一进程托管多局时每局传入独立的 random.Random，互不干扰
+        self.rng = random if rng is None else rng
+        self.verbose = verbose  # 是否打印波次等调试信息
+        # 帧事件总线：模拟只记录事件，音效等副作用在帧末批量处理
+        self.events = EventBus()
+        if sound_manager:
+            self.events.subscribe(sound_manager.handle_events)
+        # AI调度器：为None时每个敌人每帧都做完整决策（训练环境等需要确定性的场景）；启用并行AI时不使用
+        self.ai_scheduler = AIScheduler(ai_budget_ms) if ai_budget_ms and not ai_threads else None
+        # 并行AI：每帧所有敌人完整决策，无GIL时分给 ai_threads 个线程（取代时间预算调度）
+        self.ai_parallel = ParallelAI(ai_threads, rng=self.rng) if ai_threads else None
+        # BOSS前瞻规划器（boss_planner.BossPlanner，由调用方创建和关闭，可在多局之间复用）
+        self.boss_planner = boss_planner
+        # 无尽模式波次预先准备：下一波在后台线程中构造，波次切换时敌人分几帧依次进场
+        self.wave_builder = WaveBuilder() if prebuild_waves else None
+        self.spawn_queue = deque()
+
+        self.game_map = None
+        self.player_tank = None
+        self.tanks = []  # 玩家坦克固定在第一位，阵亡敌人每帧结束时移出
+        self.orphan_bullets = []  # 阵亡坦克遗留的子弹，由世界统一更新
+        self.dropped_health_packs = []  # 阵亡敌人掉落的血包
+        self.boss_tank = None
+        self.current_wave = 1
+        self.player_level = 1
+        self.player_exp = 0
+        self.winner_text = ""
+        self.over = False  # 对局是否结束
+        self.result = None  # "win" / "lose"
+        self.frame = 0
+
+        self.reset()
+
+    def reset(self):
+        """重置对局（加载地图、生成坦克、清理与坦克重叠的掩体）"""
+        self.current_wave = 1
+        self.player_level = 1
+        self.player_exp = 0
+        self.boss_tank = None
+        self.winner_text = ""
+        self.over = False
+        self.result = None
+        self.frame = 0
+        self.orphan_bullets = []
+        self.dropped_health_packs = []
+        self.spawn_queue.clear()
+        if self.wave_builder:
+            self.wave_builder.cancel()
+        self.events.clear()
+        if self.ai_scheduler:
+            self.ai_scheduler.reset()
+
+        try:
+            self.game_map = Map(self.map_path or None, self.tile_terrain, self.rng)
+        except Exception as e:
+            print(f"加载选中地图失败: {e}")
+            self.game_map = Map(rng=self.rng)
+
+        # 初始化坦克（无尽模式初始敌人更少）
+        rng = self.rng
+        self.player_tank = Tank(100, 100, (0, 0, 255), is_player=True, rng=rng)
+        if self.mode == "ENDLESS":
+            self.tanks = [self.player_tank] + [Tank(rng.randint(100, 700), rng.randint(100, 500), (255, 0, 0), rng=rng)]
+            self.spawn_wave()  # 生成第一波敌人
+            self._prepare_next_wave()
+        else:
+            self.tanks = [
+                self.player_tank,
+                Tank(600, 100, (255, 0, 0), rng=rng),
+                Tank(100, 400, (0, 255, 0), rng=rng),
+                Tank(600, 400, (255, 255, 0), rng=rng),
+            ]
+
+        self.game_map.stream_around(self.player_tank.rect.center, complete=True, keep_clear=self.tanks)
+        self._remove_obstacles_under_tanks()
+
+    def _remove_obstacles_under_tanks(self):
+        """检查并移除与坦克重叠的掩体"""
+        game_map = self.game_map
+
+        def is_overlapping_tank(obstacle):
+            for tank in self.tanks:
+                if obstacle.rect.colliderect(tank.rect):
+                    return True
+            return False
+
+        # 逐个经由地图移除，分块地图会记住被移除的障碍物，区块重新加载时不再出现
+        walls = [obs for obs in game_map.obstacles if is_overlapping_tank(obs)]
+        for obstacle in walls:
+            game_map.remove_obstacle(obstacle)
+        removed_obstacles = len(walls)
+
+        covers = [obs for obs in game_map.destroyable_obstacles if is_overlapping_tank(obs)]
+        for obstacle in covers:
+            game_map.remove_destroyable(obstacle)
+        removed_destroyable = len(covers)
+
+        # 砖块地形：清空坦克所在位置的砖块
+        cleared_tiles = False
+        if game_map.terrain is not None:
+            version = game_map.terrain.version
+            for tank in self.tanks:
+                game_map.terrain.clear(tank.rect)
+            cleared_tiles = game_map.terrain.version != version
+
+        if removed_obstacles > 0 or removed_destroyable > 0 or cleared_tiles:
+            game_map.rebuild_cover_index()
+            if self.verbose:
+                print(f"移除与坦克重叠的掩体: 不可破坏{removed_obstacles}个, 可破坏{removed_destroyable}个"
+                      + ("，并清空坦克位置的砖块" if cleared_tiles else ""))
+
+    def reload_map(self):
+        """地图文件被修改后热更新当前地图（新增的障碍物若压住坦克则移除）"""
+        added = self.game_map.apply_file_changes()
+        if added:
+            self._remove_obstacles_under_tanks()
+        return added is not None
+
+    def spawn_wave(self):
+        """生成敌人波次"""
+        # 清除现有敌人（保留玩家），阵亡敌人的遗留子弹交给世界继续飞行
+        self._compact_dead_tanks()
+        if len(self.tanks) > 1:
+            del self.tanks[1:]
+
+        enemies = build_enemies(self.current_wave, self.rng)
+        self.boss_tank = next((tank for tank in enemies if tank.is_boss), None)
+        self.tanks.extend(enemies)
+
+        self.events.emit(WAVE, actor=self.current_wave)
+        if self.verbose:
+            print(f"第 {self.current_wave} 波敌人生成，共 {len(self.tanks)-1} 个敌人")
+
+    def _prepare_next_wave(self):
+        """让后台线程开始准备下一波（种子和障碍物快照在主线程取得，结果可复现）"""
+        if self.wave_builder is None or self.mode != "ENDLESS":
+            return
+        obstacles = [tuple(obstacle.rect) for obstacle in self.game_map.cover_obstacles()]
+        self.wave_builder.request(self.current_wave + 1, self.rng.getrandbits(64), obstacles, self.rng)
+
+    def _start_wave(self):
+        """进入下一波：取用预先准备好的敌人并排队依次进场，没有准备好时当场生成"""
+        plan = self.wave_builder.take(self.current_wave) if self.wave_builder else None
+        if plan is None:
+            self.spawn_wave()
+            self._prepare_next_wave()
+            return
+        self._compact_dead_tanks()
+        if len(self.tanks) > 1:
+            del self.tanks[1:]
+        first = self.frame + 1
+        self.spawn_queue.extend(PendingSpawn(first + i * SPAWN_INTERVAL, tank, alternates)
+                                for i, (tank, alternates) in enumerate(zip(plan.tanks, plan.alternates)))
+        self.events.emit(WAVE, actor=self.current_wave)
+        if self.verbose:
+            print(f"第 {self.current_wave} 波敌人生成，共 {len(plan.tanks)} 个敌人（分批进场）")
+
+    def _spawn_pending(self):
+        """让到达进场帧的敌人进场（出生点离玩家太近时改用备用出生点）"""
+        queue = self.spawn_queue
+        player = self.tanks[0].rect
+        while queue and queue[0].frame <= self.frame:
+            pending = queue.popleft()
+            tank = pending.tank
+            for x, y in pending.alternates:
+                dx = tank.rect.centerx - player.centerx
+                dy = tank.rect.centery - player.centery
+                if dx * dx + dy * dy >= SAFE_DISTANCE * SAFE_DISTANCE:
+                    break
+                tank.rect.topleft = (x, y)
+            if tank.is_boss:
+                self.boss_tank = tank
+            self.tanks.append(tank)
+            self.events.emit(SPAWN, tank.rect.centerx, tank.rect.centery, tank)
+        if not queue:
+            # 全部进场后再开始准备下一波，不与波次切换挤在同一帧
+            self._prepare_next_wave()
+
+    def level_up_player(self):
+        """玩家升级"""
+        self.player_level += 1
+        self.player_tank.max_health += 1
+        self.player_tank.health = self.player_tank.max_health  # 升级满血
+        self.player_tank.speed += 0.3  # 提升移速
+        if self.verbose:
+            print(f"玩家升级到 {self.player_level} 级！速度: {self.player_tank.speed:.1f}, 最大生命值: {self.player_tank.max_health}")
+        self.events.emit(LEVEL_UP, self.player_tank.rect.centerx, self.player_tank.rect.centery, self.player_level)
+
+    def revive_player(self):
+        """开发者复活：恢复玩家满血并继续对局"""
+        self.player_tank.health = self.player_tank.max_health
+        self.player_tank.alive = True
+        self.over = False
+        self.result = None
+        self.winner_text = ""
+
+    def keep_player_alive(self):
+        """测试和基准用的玩家无敌：每帧前恢复满血，因玩家阵亡而结束的对局当场复活继续"""
+        if self.over and self.result == "lose":
+            self.revive_player()
+        else:
+            self.player_tank.health = self.player_tank.max_health
+            self.player_tank.alive = True
+
+    def alive_enemies(self):
+        """返回存活的敌方坦克列表"""
+        return [tank for tank in self.tanks[1:] if tank.health > 0]
+
+    def step(self, keys=None):
+        """推进一帧：坦克更新、子弹碰撞、胜负判定、血包拾取和阵亡清理"""
+        if self.over or not self.tanks:
+            return
+        self.frame += 1
+
+        events = self.events
+        if self.spawn_queue:
+            self._spawn_pending()
+        # 更新玩家坦克
+        self.tanks[0].update(keys, self.game_map, None, None, events)
+        if self.game_map.stream is not None:
+            self.game_map.stream_around(self.tanks[0].rect.center, keep_clear=self.tanks)
+
+        # 更新AI坦克（BOSS规划器只收取结果和提交请求，不等待推演）
+        if self.boss_planner is not None:
+            self.boss_planner.update(self)
+        if self.ai_parallel:
+            self.ai_parallel.update(self.tanks[1:], self.tanks[0], self.game_map, None, events)
+        elif self.ai_scheduler:
+            self.ai_scheduler.update(self.tanks[1:], self.tanks[0], self.game_map, None, events)
+        else:
+            for tank in self.tanks[1:]:
+                if tank.health > 0:
+                    tank.update(None, self.game_map, self.tanks[0], None, events)
+
+        self._resolve_bullets()
+        self._resolve_orphan_bullets()
+        # 胜负判定需要在清理阵亡坦克之前进行（依赖本帧的坦克列表）
+        self._check_match_end()
+        self._check_health_pickup()
+        self._compact_dead_tanks()
+        # 帧末把本帧事件批量分发给订阅者（音效、统计等）
+        events.flush()
+
+    def damage_tank(self, target, damage=1, attacker=None):
+        """对坦克造成伤害，阵亡时记录击毁事件并掉落血包"""
+        target.health -= damage
+        x, y = target.rect.centerx, target.rect.centery
+        self.events.emit(HIT, x, y, attacker, target)
+        if target.health <= 0:
+            target.alive = False
+            self.events.emit(KILL, x, y, attacker, target)
+            # 敌人死亡时掉落血包
+            health_pack = target.drop_health()
+            if health_pack:
+                target.health_pack = None
+                self.dropped_health_packs.append(health_pack)
+                if len(self.dropped_health_packs) > MAX_HEALTH_PACKS:
+                    self.dropped_health_packs.pop(0)
+
+    def _compact_dead_tanks(self):
+        """把阵亡敌人移出坦克列表，遗留子弹交给世界统一管理"""
+        if all(tank.health > 0 for tank in self.tanks[1:]):
+            return
+        survivors = [self.tanks[0]]
+        for tank in self.tanks[1:]:
+            if tank.health > 0:
+                survivors.append(tank)
+                continue
+            self.orphan_bullets.extend(bullet for bullet in tank.bullets if bullet.active)
+            tank.bullets = []
+            if tank is self.boss_tank:
+                self.boss_tank = None
+        self.tanks = survivors
+
+    def _resolve_bullets(self):
+        """子弹碰撞检测（地图障碍物与坦克）"""
+        game_map = self.game_map
+        tanks = self.tanks
+        for tank in tanks:
+            if tank.health <= 0:
+                continue
+            # 遍历子弹副本进行安全操作
+            for bullet in tank.bullets[:]:
+                if not bullet.active:
+                    continue
+                # 更新子弹位置
+                bullet.update()
+
+                # 首先检测子弹与地图障碍物的碰撞（包括灰色和绿色掩体）
+                cover_count = game_map.cover_count()
+                if game_map.check_bullet_collision(bullet):
+                    bullet.active = False
+                    # 如果是可破坏掩体被击中，需要处理掩体销毁
+                    for obstacle in game_map.destroyable_obstacles[:]:
+                        if bullet.rect.colliderect(obstacle.rect):
+                            game_map.remove_destroyable(obstacle)
+                            break
+                    for _ in range(cover_count - game_map.cover_count()):
+                        self.events.emit(COVER_DESTROYED, bullet.rect.x, bullet.rect.y, tank)
+                    continue
+
+                # 然后检测子弹与其他坦克的碰撞
+                target = find_bullet_target(bullet, tanks, tank)
+                if target is not None:
+                    bullet.active = False
+                    self.damage_tank(target, 1, tank)
+
+                # 移除失效子弹
+                if not bullet.active and bullet in tank.bullets:
+                    tank.bullets.remove(bullet)
+
+    def _resolve_orphan_bullets(self):
+        """更新阵亡坦克遗留的子弹（可以击中任何存活坦克）"""
+        if not self.orphan_bullets:
+            return
+        game_map = self.game_map
+        for bullet in self.orphan_bullets:
+            bullet.update()
+            if not bullet.active:
+                continue
+            cover_count = game_map.cover_count()
+            if game_map.check_bullet_collision(bullet):
+                bullet.active = False
+                if game_map.cover_count() < cover_count:
+                    self.events.emit(COVER_DESTROYED, bullet.rect.x, bullet.rect.y)
+                continue
+            target = find_bullet_target(bullet, self.tanks)
+            if target is not None:
+                bullet.active = False
+                self.damage_tank(target)
+        self.orphan_bullets = [bullet for bullet in self.orphan_bullets if bullet.active]
+
+    def _check_match_end(self):
+        """检查游戏结束条件，无尽模式下推进波次"""
+        alive_enemies = self.alive_enemies()
+
+        if self.tanks[0].health <= 0:
+            if self.mode == "ENDLESS":
+                self.winner_text = f"无尽模式结束！波次: {self.current_wave} | 等级: {self.player_level}"
+            else:
+                self.winner_text = "AI胜利!"
+            self.over = True
+            self.result = "lose"
+            self.events.emit(GAME_OVER, self.tanks[0].rect.centerx, self.tanks[0].rect.centery)
+        elif len(alive_enemies) == 0 and len(self.tanks) > 1 and not self.spawn_queue:
+            if self.mode == "ENDLESS":
+                # 无尽模式下波次完成
+                self.current_wave += 1
+                self._start_wave()
+                # 玩家获得波次奖励
+                self.player_exp += 100 * self.current_wave
+                # 检查是否升级
+                if self.player_exp >= self.player_level * 200:
+                    self.player_exp -= self.player_level * 200
+                    self.level_up_player()
+            else:
+                self.winner_text = "玩家胜利!"
+                self.over = True
+                self.result = "win"
+                self.events.emit(VICTORY)
+
+    def _check_health_pickup(self):
+        """检测玩家拾取血包"""
+        player = self.tanks[0]
+        for health_pack in self.dropped_health_packs[:]:
+            if player.rect.colliderect(health_pack.rect):
+                player.health = min(player.health + 1, player.max_health)
+                self.dropped_health_packs.remove(health_pack)
+                self.events.emit(PICKUP, health_pack.rect.centerx, health_pack.rect.centery, player)
+
+    def health_packs(self):
+        """返回场上所有血包"""
+        return self.dropped_health_packs
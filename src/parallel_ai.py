@@ -0,0 +1,154 @@
+import argparse
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+MIN_PARALLEL = 8  # 存活敌人少于该数量时串行决策（线程调度开销大于收益）
+
+# AI决策看到的目标坦克：位置副本和子弹列表快照，决策期间不会被任何线程修改
+TargetView = namedtuple("TargetView", "rect bullets alive")
+
+_executors = {}  # 线程数 -> 共享线程池（同一进程内的多局对局复用）
+
+
+def free_threaded():
+    """当前解释器是否运行在无GIL模式（CPython 3.13+ 的自由线程构建）"""
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def _executor(workers):
+    executor = _executors.get(workers)
+    if executor is None:
+        executor = ThreadPoolExecutor(workers, thread_name_prefix="tank-ai")
+        _executors[workers] = executor
+    return executor
+
+
+def _think_chunk(tanks, target, game_map):
+    """工作线程：依次完成一组坦克的决策，返回各自是否开火"""
+    return [tank.ai_update(target, game_map) for tank in tanks]
+
+
+class ParallelAI:
+    """并行AI更新：把敌人的决策分给线程池，再按坦克顺序合并开火意图
+
+    每个坦克首次出现时从对局的随机序列取种子，换用独立的 random.Random，
+    决策阶段只读取目标快照和地图、只修改坦克自身；开火、子弹推进和事件记录
+    在合并阶段按坦克列表顺序串行执行。因此结果只取决于对局种子，
+    与线程数、线程调度以及是否真的并行都无关。
+
+    只有在无GIL的解释器上才使用线程池（有GIL时多线程只会更慢），
+    否则以同样的方式串行决策；parallel=True 可强制使用线程池（测试用）。
+    """
+    def __init__(self, workers=None, parallel=None, min_parallel=MIN_PARALLEL, rng=random):
+        self.rng = rng  # 对局的随机数来源（坦克的初始生成器），用于给每个坦克取种子
+        self.workers = max(1, workers or default_workers())
+        if parallel is None:
+            parallel = free_threaded()
+        self.parallel = parallel and self.workers > 1
+        self.min_parallel = min_parallel
+
+        # 最近一帧的统计（调试与性能测试用）
+        self.last_thinks = 0
+        self.last_parallel = False
+        self.last_ms = 0.0
+
+    def update(self, tanks, target, game_map, sound_manager=None, events=None):
+        """推进所有AI坦克一帧"""
+        active = [tank for tank in tanks if tank.health > 0]
+        for tank in active:
+            if tank.ai_rng is self.rng:
+                tank.ai_rng = random.Random(self.rng.getrandbits(64))
+
+        start = time.perf_counter()
+        view = TargetView(target.rect.copy(), tuple(target.bullets), target.alive)
+        chunks = min(self.workers, len(active))
+        if self.parallel and len(active) >= self.min_parallel:
+            if game_map is not None and game_map.terrain is not None:
+                # 砖块地形的前缀和在首次查询时才重建，先在主线程建好，避免多个线程重复计算
+                game_map.terrain.collides(target.rect)
+            executor = _executor(self.workers)
+            # 交错分组：BOSS等开销大的坦克不会集中在同一个线程
+            futures = [executor.submit(_think_chunk, active[i::chunks], view, game_map) for i in range(chunks)]
+            shots = [False] * len(active)
+            for i, future in enumerate(futures):
+                shots[i::chunks] = future.result()
+            self.last_parallel = True
+        else:
+            shots = _think_chunk(active, view, game_map)
+            self.last_parallel = False
+
+        # 合并：按坦克顺序开火、推进子弹，事件顺序与串行一致
+        for tank, shoot in zip(active, shots):
+            if shoot:
+                tank.shoot(sound_manager, events)
+            tank.update_bullets()
+
+        self.last_thinks = len(active)
+        self.last_ms = (time.perf_counter() - start) * 1000.0
+
+
+def benchmark(enemies=40, frames=300, workers=None, seed=0):
+    """大波次压力测试：同一局面分别串行和使用线程池推进，比较AI耗时并校验结果一致"""
+    from match import Match
+    from tank import Tank
+
+    def run(parallel):
+        random.seed(seed)
+        match = Match(None, "ENDLESS", verbose=False, ai_threads=workers or default_workers())
+        match.ai_parallel.parallel = parallel and match.ai_parallel.workers > 1
+        match.ai_parallel.min_parallel = 1
+        del match.tanks[1:]
+        for _ in range(enemies):
+            enemy = Tank(random.randint(100, 700), random.randint(100, 500), (255, 0, 0))
+            enemy.ai_difficulty = 2
+            match.tanks.append(enemy)
+        ai_ms = []
+        for _ in range(frames):
+            if match.over:
+                break
+            match.keep_player_alive()
+            match.step()
+            ai_ms.append(match.ai_parallel.last_ms)
+        state = [(tank.rect.topleft, tank.health, len(tank.bullets)) for tank in match.tanks]
+        return sum(ai_ms) / max(1, len(ai_ms)), state, len(ai_ms)
+
+    serial_ms, serial_state, steps = run(False)
+    parallel_ms, parallel_state, _ = run(True)
+    return {
+        "free_threaded": free_threaded(),
+        "workers": workers or default_workers(),
+        "enemies": enemies,
+        "frames": steps,
+        "serial_ms": serial_ms,
+        "parallel_ms": parallel_ms,
+        "identical": serial_state == parallel_state,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="并行AI：大波次下串行与线程池决策的耗时对比")
+    parser.add_argument("--enemies", type=int, default=40, help="敌人数量")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=None, help="线程数（默认为CPU核数）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    result = benchmark(args.enemies, args.frames, args.workers, args.seed)
+    print(f"解释器: Python {sys.version.split()[0]}，{'无GIL（自由线程）' if result['free_threaded'] else '有GIL，游戏中将串行决策'}")
+    print(f"敌人 {result['enemies']} 个, {result['frames']} 帧, 线程 {result['workers']} 个")
+    print(f"每帧AI耗时: 串行 {result['serial_ms']:.3f}ms, 线程池 {result['parallel_ms']:.3f}ms "
+          f"({result['serial_ms'] / result['parallel_ms'] if result['parallel_ms'] else 0:.2f}x)")
+    print(f"结果一致: {'是' if result['identical'] else '否'}")
+
+
+if __name__ == "__main__":
+    main()
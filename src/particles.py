@@ -0,0 +1,252 @@
+import argparse
+import math
+import time
+import numpy as np
+import pygame
+import pygame.surfarray
+from collections import namedtuple
+from events import SHOT, HIT, KILL, COVER_DESTROYED, SPAWN
+from sprites import GUN_LENGTH
+
+MAX_PARTICLES = 2048  # 全局上限：场上粒子数超过后新粒子直接丢弃，每帧开销有界
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 600
+MUZZLE_OFFSET = GUN_LENGTH  # 炮口到坦克中心的距离（炮管从中心画出，子弹也在此处生成）
+
+# 粒子效果配置：数量、速度范围、寿命范围（帧）、阻尼、尺寸范围、颜色表
+Effect = namedtuple("Effect", "count speed life drag size colors")
+MUZZLE_FLASH = Effect(6, (1.0, 2.5), (4, 8), 0.80, (2, 3), ((255, 240, 120), (255, 180, 60)))
+IMPACT = Effect(14, (1.0, 3.5), (8, 16), 0.88, (1, 3), ((255, 255, 255), (255, 200, 80), (255, 120, 40)))
+EXPLOSION = Effect(60, (0.5, 5.0), (20, 45), 0.92, (2, 4), ((255, 80, 20), (255, 160, 40), (255, 230, 120), (90, 90, 90)))
+BOSS_EXPLOSION = EXPLOSION._replace(count=160, speed=(0.5, 7.0), life=(30, 60))
+DEBRIS = Effect(18, (0.5, 3.0), (15, 30), 0.90, (2, 3), ((0, 200, 0), (0, 140, 0), (120, 90, 40)))
+SPAWN_IN = Effect(28, (1.5, 2.5), (10, 18), 0.85, (2, 3), ((120, 160, 255), (200, 220, 255), (255, 255, 255)))
+
+EVENT_KINDS = (SHOT, HIT, KILL, COVER_DESTROYED, SPAWN)  # 粒子系统订阅的事件类型
+
+MAX_SIZE = max(effect.size[1] for effect in (MUZZLE_FLASH, IMPACT, EXPLOSION, BOSS_EXPLOSION, DEBRIS, SPAWN_IN))
+
+
+def _size_tables(max_size):
+    """按粒子尺寸查表：覆盖的网格掩码，以及每个网格位置相对粒子中心的像素偏移"""
+    grid_x, grid_y = (grid.ravel() for grid in np.meshgrid(np.arange(max_size), np.arange(max_size), indexing="ij"))
+    masks = np.zeros((max_size + 1, max_size * max_size), bool)
+    dx = np.zeros((max_size + 1, max_size * max_size), np.int32)
+    dy = np.zeros_like(dx)
+    for size in range(max_size + 1):
+        masks[size] = (grid_x < size) & (grid_y < size)
+        dx[size] = grid_x - size // 2
+        dy[size] = grid_y - size // 2
+    return masks, dx, dy
+
+
+_SIZE_MASKS, _SIZE_DX, _SIZE_DY = _size_tables(MAX_SIZE)
+
+# 渲染数据包中的粒子快照（只读数组），与对局状态解耦，可安全交给渲染线程
+ParticleView = namedtuple("ParticleView", "x y size color alpha")
+
+
+class ParticleSystem:
+    """固定容量的粒子系统：位置、速度、寿命和颜色都存放在NumPy数组中
+
+    存活粒子始终紧凑排列在数组前 count 个位置，更新、压缩和绘制全部向量化，
+    不为单个粒子创建Python对象。只用于画面效果，使用独立的随机数生成器，
+    不影响对局本身的随机序列。
+    """
+    def __init__(self, capacity=MAX_PARTICLES, seed=None):
+        self.capacity = capacity
+        self.count = 0
+        self.pos = np.zeros((capacity, 2), np.float32)
+        self.vel = np.zeros((capacity, 2), np.float32)
+        self.drag = np.zeros(capacity, np.float32)
+        self.life = np.zeros(capacity, np.float32)  # 剩余帧数
+        self.max_life = np.ones(capacity, np.float32)
+        self.size = np.zeros(capacity, np.uint8)
+        self.color = np.zeros((capacity, 3), np.uint8)
+        self.rng = np.random.default_rng(seed)
+
+        # 统计（调试与性能测试用）
+        self.dropped = 0  # 因达到上限被丢弃的粒子数
+        self.last_update_ms = 0.0
+
+    def clear(self):
+        self.count = 0
+
+    def emit(self, x, y, effect, direction=None, spread=math.pi):
+        """在(x, y)生成一组粒子；direction 为发射方向（弧度），None 表示向四周扩散"""
+        n = min(effect.count, self.capacity - self.count)
+        self.dropped += effect.count - n
+        if n <= 0:
+            return
+        rng = self.rng
+        start, end = self.count, self.count + n
+        center = 0.0 if direction is None else direction
+        angles = center + rng.uniform(-spread, spread, n)
+        speeds = rng.uniform(effect.speed[0], effect.speed[1], n)
+        self.pos[start:end, 0] = x
+        self.pos[start:end, 1] = y
+        self.vel[start:end, 0] = np.cos(angles) * speeds
+        self.vel[start:end, 1] = np.sin(angles) * speeds
+        self.drag[start:end] = effect.drag
+        life = rng.integers(effect.life[0], effect.life[1] + 1, n).astype(np.float32)
+        self.life[start:end] = life
+        self.max_life[start:end] = life
+        self.size[start:end] = rng.integers(effect.size[0], effect.size[1] + 1, n)
+        palette = np.asarray(effect.colors, np.uint8)
+        self.color[start:end] = palette[rng.integers(0, len(palette), n)]
+        self.count = end
+
+    def handle_events(self, events):
+        """订阅对局事件：开火产生炮口火光，命中产生火花，击毁产生爆炸，敌人进场产生光环"""
+        for event in events:
+            kind = event.kind
+            if kind == SHOT:
+                dx, dy = event.actor.direction if event.actor is not None else (0, -1)
+                length = math.hypot(dx, dy) or 1.0
+                ux, uy = dx / length, dy / length
+                self.emit(event.x + ux * MUZZLE_OFFSET, event.y + uy * MUZZLE_OFFSET,
+                          MUZZLE_FLASH, math.atan2(uy, ux), 0.5)
+            elif kind == HIT:
+                self.emit(event.x, event.y, IMPACT)
+            elif kind == KILL:
+                boss = event.target is not None and event.target.is_boss
+                self.emit(event.x, event.y, BOSS_EXPLOSION if boss else EXPLOSION)
+            elif kind == COVER_DESTROYED:
+                self.emit(event.x, event.y, DEBRIS)
+            elif kind == SPAWN:
+                self.emit(event.x, event.y, SPAWN_IN)
+
+    def update(self):
+        """推进一帧：积分位置、施加阻尼、减少寿命并压缩掉死亡粒子"""
+        start_time = time.perf_counter()
+        n = self.count
+        if n:
+            pos = self.pos[:n]
+            vel = self.vel[:n]
+            pos += vel
+            vel *= self.drag[:n, None]
+            life = self.life[:n]
+            life -= 1
+            alive = life > 0
+            alive &= (pos[:, 0] >= 0) & (pos[:, 0] < SCREEN_WIDTH) & (pos[:, 1] >= 0) & (pos[:, 1] < SCREEN_HEIGHT)
+            keep = np.flatnonzero(alive)
+            if len(keep) < n:
+                m = len(keep)
+                for array in (self.pos, self.vel, self.drag, self.life, self.max_life, self.size, self.color):
+                    array[:m] = array[keep]
+                self.count = m
+        self.last_update_ms = (time.perf_counter() - start_time) * 1000
+
+    def snapshot(self):
+        """复制当前存活粒子的绘制数据（整数坐标、尺寸、颜色和透明度），没有粒子时返回None"""
+        n = self.count
+        if not n:
+            return None
+        pos = self.pos[:n].astype(np.int32)
+        alpha = self.life[:n] / self.max_life[:n]
+        view = ParticleView(pos[:, 0], pos[:, 1], self.size[:n].copy(), self.color[:n].copy(), alpha)
+        for array in view:
+            array.setflags(write=False)
+        return view
+
+
+def _pixel_coords(view, width, height):
+    """把每个粒子展开为其覆盖的像素（尺寸为s的粒子占s×s个像素），返回坐标、颜色和透明度
+
+    按尺寸查表得到每个粒子覆盖的网格位置和偏移，整个过程只有固定几次数组运算。
+    """
+    rows, cells = np.nonzero(_SIZE_MASKS[view.size])
+    sizes = view.size[rows]
+    px = view.x[rows] + _SIZE_DX[sizes, cells]
+    py = view.y[rows] + _SIZE_DY[sizes, cells]
+    # 屏幕边缘的粒子夹到边界上（粒子离开屏幕后即被移除，最多偏出几个像素）
+    np.clip(px, 0, width - 1, out=px)
+    np.clip(py, 0, height - 1, out=py)
+    return px, py, view.color[rows].astype(np.float32), view.alpha[rows, None]
+
+
+def draw_particles(surface, view):
+    """批量绘制粒子：展开为像素后在像素数组上一次性按透明度混合，不逐个调用绘图函数"""
+    if view is None:
+        return
+    width, height = surface.get_size()
+    px, py, color, alpha = _pixel_coords(view, width, height)
+    if surface.get_bytesize() == 4:
+        # 32位表面：按通道位移解包/打包，一次读取、一次写回
+        pixels = pygame.surfarray.pixels2d(surface)  # 绘制期间锁定表面
+        try:
+            packed = pixels[px, py]
+            shifts = surface.get_shifts()[:3]
+            channels = np.stack([(packed >> shift) & 0xFF for shift in shifts], axis=1).astype(np.float32)
+            blended = (channels + (color - channels) * alpha).astype(np.uint32)
+            keep_mask = ~np.uint32(sum(0xFF << shift for shift in shifts))
+            result = packed & keep_mask
+            for i, shift in enumerate(shifts):
+                result |= blended[:, i] << np.uint32(shift)
+            pixels[px, py] = result
+        finally:
+            del pixels  # 释放像素视图以解除表面锁定
+    else:
+        pixels = pygame.surfarray.pixels3d(surface)
+        try:
+            background = pixels[px, py].astype(np.float32)
+            pixels[px, py] = (background + (color - background) * alpha).astype(np.uint8)
+        finally:
+            del pixels
+
+
+def benchmark(frames=600, capacity=MAX_PARTICLES, kills_per_frame=4, seed=0):
+    """BOSS战压力测试：每帧生成多次爆炸，测量达到上限时更新、快照和绘制的耗时"""
+    import os
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    surface = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    system = ParticleSystem(capacity, seed)
+    rng = np.random.default_rng(seed)
+    update_ms, draw_ms, counts = [], [], []
+    for _ in range(frames):
+        for _ in range(kills_per_frame):
+            x, y = rng.uniform(50, 750), rng.uniform(50, 550)
+            system.emit(x, y, BOSS_EXPLOSION)
+            system.emit(x, y, IMPACT)
+        system.update()
+        update_ms.append(system.last_update_ms)
+        surface.fill((240, 240, 240))
+        start = time.perf_counter()
+        draw_particles(surface, system.snapshot())
+        draw_ms.append((time.perf_counter() - start) * 1000)
+        counts.append(system.count)
+    pygame.quit()
+
+    def stats(values):
+        ordered = sorted(values)
+        return sum(values) / len(values), ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], ordered[-1]
+
+    return {
+        "frames": frames,
+        "capacity": capacity,
+        "mean_particles": sum(counts) / len(counts),
+        "dropped": system.dropped,
+        "update_ms": stats(update_ms),
+        "draw_ms": stats(draw_ms),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="粒子系统压力测试（达到全局上限时的每帧开销）")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--capacity", type=int, default=MAX_PARTICLES, help="全局粒子上限")
+    parser.add_argument("--kills", type=int, default=4, help="每帧生成的爆炸数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    result = benchmark(args.frames, args.capacity, args.kills, args.seed)
+    print(f"帧数: {result['frames']}  上限: {result['capacity']}  平均粒子数: {result['mean_particles']:.0f}  "
+          f"丢弃: {result['dropped']}")
+    for name in ("update_ms", "draw_ms"):
+        mean, p99, worst = result[name]
+        print(f"{'更新' if name == 'update_ms' else '绘制'}: 平均 {mean:.3f}ms  p99 {p99:.3f}ms  最长 {worst:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
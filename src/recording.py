@@ -0,0 +1,98 @@
+import json
+import random
+from match import Match
+from tank_env import ActionKeys, NUM_ACTIONS
+
+RECORDING_VERSION = 1
+ACTION_BASE = ord("a")  # 每帧动作编码为一个字母（a-r），录像文件保持可读且紧凑
+
+
+class Recording:
+    """对局录像：随机种子、地图、模式和玩家每帧的离散动作
+
+    Match 的随机性全部来自 random 模块，且不启用按时间预算的AI调度，
+    因此相同种子加相同动作序列可以逐帧复现整局。
+    """
+    def __init__(self, seed=0, map_path=None, mode="CLASSIC", actions=None):
+        self.seed = seed
+        self.map_path = map_path
+        self.mode = mode
+        self.actions = bytearray(actions or b"")
+
+    def __len__(self):
+        return len(self.actions)
+
+    def append(self, action):
+        self.actions.append(action)
+
+    def save(self, path):
+        data = {
+            "version": RECORDING_VERSION,
+            "seed": self.seed,
+            "map": self.map_path,
+            "mode": self.mode,
+            "frames": len(self.actions),
+            "actions": "".join(chr(ACTION_BASE + action) for action in self.actions),
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != RECORDING_VERSION:
+            raise ValueError(f"不支持的录像版本: {data.get('version')}")
+        actions = bytearray(ord(ch) - ACTION_BASE for ch in data.get("actions", ""))
+        if any(action >= NUM_ACTIONS for action in actions):
+            raise ValueError("录像中包含无效动作")
+        return cls(data.get("seed", 0), data.get("map"), data.get("mode", "CLASSIC"), actions)
+
+
+def replay(recording):
+    """逐帧重放录像，每帧推进后产出对局（对局提前结束时停止）"""
+    random.seed(recording.seed)
+    match = Match(recording.map_path, recording.mode, verbose=False)
+    keys = ActionKeys()
+    for action in recording.actions:
+        keys.set_action(action)
+        match.step(keys)
+        yield match
+        if match.over:
+            break
+
+
+class RandomPolicy:
+    """随机策略：动作保持若干帧再切换，看起来更接近真人操作
+
+    使用独立的随机数生成器，不影响对局本身的随机序列。
+    """
+    def __init__(self, seed=0, change_prob=0.1):
+        self.rng = random.Random(seed ^ 0x5EED)
+        self.change_prob = change_prob
+        self.action = self.rng.randrange(NUM_ACTIONS)
+
+    def act(self):
+        if self.rng.random() < self.change_prob:
+            self.action = self.rng.randrange(NUM_ACTIONS)
+        return self.action
+
+
+def simulate(seed=0, map_path=None, mode="CLASSIC", frames=3600, change_prob=0.1, recording=None):
+    """用随机策略控制玩家自动对局，逐帧产出对局，并把动作写入recording
+
+    策略不影响对局本身的随机序列，保证录像可复现。
+    """
+    recording = recording if recording is not None else Recording(seed, map_path, mode)
+    policy = RandomPolicy(seed, change_prob)
+    random.seed(seed)
+    match = Match(map_path, mode, verbose=False)
+    keys = ActionKeys()
+    for _ in range(frames):
+        action = policy.act()
+        recording.append(action)
+        keys.set_action(action)
+        match.step(keys)
+        yield match
+        if match.over:
+            break
@@ -0,0 +1,191 @@
+import threading
+from collections import namedtuple
+import pygame
+from sprites import SPRITE_PAD, HEALTH_BAR_OFFSET
+from particles import draw_particles
+from tile_terrain import TerrainLayer
+
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 600
+WHITE = (240, 240, 240)
+BLACK = (0, 0, 0)
+BOSS_COLOR = (128, 0, 128)
+HINT_COLOR = (128, 128, 128)
+TEXT_CACHE_LIMIT = 256  # 文字渲染缓存上限
+
+# 渲染数据包：模拟线程每帧生成一份，全部由元组组成，生成后不可修改，
+# 渲染线程无需加锁即可安全读取
+RectView = namedtuple("RectView", "x y width height color")
+TankView = namedtuple("TankView", "x y color is_boss angle health max_health bullets")
+HudLine = namedtuple("HudLine", "text color x y")
+# particles 为粒子系统的只读快照（没有粒子时为None），terrain 为砖块地形快照（未启用时为None）
+FramePacket = namedtuple("FramePacket", "frame obstacles tanks bullets health_packs hud particles terrain")
+
+
+def _rect_view(obj):
+    rect = obj.rect
+    return RectView(rect.x, rect.y, rect.width, rect.height, obj.color)
+
+
+class PacketBuilder:
+    """从对局状态生成渲染数据包（障碍物视图只在地图变化时重建）"""
+    def __init__(self):
+        self._obstacle_key = None
+        self._obstacles = ()
+
+    def _obstacle_views(self, game_map):
+        key = (id(game_map), getattr(game_map, "revision", 0),
+               len(game_map.obstacles), len(game_map.destroyable_obstacles))
+        if key != self._obstacle_key:
+            self._obstacle_key = key
+            self._obstacles = tuple(_rect_view(obs) for obs in game_map.obstacles + game_map.destroyable_obstacles)
+        return self._obstacles
+
+    def build(self, match, mode, particles=None):
+        tanks = tuple(
+            TankView(
+                tank.rect.x, tank.rect.y, tank.color, tank.is_boss, tank.angle,
+                tank.health, tank.max_health,
+                tuple(_rect_view(bullet) for bullet in tank.bullets)
+            )
+            for tank in match.tanks if tank.health > 0
+        )
+        return FramePacket(
+            match.frame,
+            self._obstacle_views(match.game_map),
+            tanks,
+            tuple(_rect_view(bullet) for bullet in match.orphan_bullets),
+            tuple(_rect_view(pack) for pack in match.health_packs()),
+            build_hud(match, mode),
+            particles.snapshot() if particles is not None else None,
+            match.game_map.terrain.snapshot() if match.game_map.terrain is not None else None
+        )
+
+
+def build_hud(match, mode):
+    """生成对局界面的信息文字（内容与位置）"""
+    game_map = match.game_map
+    lines = []
+    if mode == "ENDLESS":
+        lines.append(HudLine(f"波次: {match.current_wave}", BLACK, 10, 10))
+        lines.append(HudLine(f"等级: {match.player_level}", BLACK, 10, 40))
+        lines.append(HudLine(f"经验: {match.player_exp}/{match.player_level * 200}", BLACK, 10, 70))
+        boss_tank = match.boss_tank
+        if boss_tank and boss_tank.health > 0:
+            lines.append(HudLine(f"BOSS生命值: {boss_tank.health}/{boss_tank.max_health}", BOSS_COLOR, SCREEN_WIDTH - 200, 10))
+    else:
+        lines.append(HudLine(f"地图: {getattr(game_map, 'name', '未知')}", BLACK, 10, 10))
+
+    endless = mode == "ENDLESS"
+    lines.append(HudLine(f"敌方剩余: {len(match.alive_enemies())}", BLACK, 10, 100 if endless else 40))
+    player_tank = match.player_tank
+    lines.append(HudLine(f"玩家生命值: {player_tank.health}/{player_tank.max_health}", BLACK, 10, 130 if endless else 70))
+    lines.append(HudLine(f"掩体剩余: {game_map.cover_count()}", BLACK, 10, 160 if endless else 100))
+
+    # 显示开发者复活提示（仅在无尽模式）
+    if endless:
+        lines.append(HudLine("按*键复活（开发者功能）", HINT_COLOR, SCREEN_WIDTH - 220, SCREEN_HEIGHT - 30))
+    return tuple(lines)
+
+
+class FrameRenderer:
+    """把渲染数据包绘制到屏幕（障碍物、坦克和文字都走批量blit）"""
+    def __init__(self, screen, atlas, font):
+        self.screen = screen
+        self.atlas = atlas
+        self.font = font
+        self._text_cache = {}
+        self._terrain_layer = None  # 砖块地形图层（首次遇到地形时创建）
+
+    def _text(self, text, color):
+        key = (text, color)
+        surface = self._text_cache.get(key)
+        if surface is None:
+            if len(self._text_cache) >= TEXT_CACHE_LIMIT:
+                self._text_cache.clear()
+            surface = self.font.render(text, True, color)
+            self._text_cache[key] = surface
+        return surface
+
+    def render(self, packet):
+        atlas = self.atlas
+        rect_sprite = atlas.rect_sprite
+        blit_sequence = []
+        append = blit_sequence.append
+
+        for obs in packet.obstacles:
+            append((rect_sprite(obs.width, obs.height, obs.color), (obs.x, obs.y)))
+        for tank in packet.tanks:
+            append((atlas.tank_sprite(tank.color, tank.is_boss, tank.angle), (tank.x - SPRITE_PAD, tank.y - SPRITE_PAD)))
+            append((atlas.health_bar(tank.health, tank.max_health, tank.is_boss), (tank.x, tank.y - HEALTH_BAR_OFFSET)))
+            for bullet in tank.bullets:
+                append((rect_sprite(bullet.width, bullet.height, bullet.color), (bullet.x, bullet.y)))
+        for bullet in packet.bullets:
+            append((rect_sprite(bullet.width, bullet.height, bullet.color), (bullet.x, bullet.y)))
+        for pack in packet.health_packs:
+            append((rect_sprite(pack.width, pack.height, pack.color), (pack.x, pack.y)))
+
+        if packet.terrain is not None:
+            # 砖块地形连同背景色画在独立图层上，每帧只重绘变化的砖块，再整层贴到屏幕
+            if self._terrain_layer is None:
+                self._terrain_layer = TerrainLayer((SCREEN_WIDTH, SCREEN_HEIGHT), WHITE)
+            self.screen.blit(self._terrain_layer.update(packet.terrain), (0, 0))
+        else:
+            self.screen.fill(WHITE)
+        self.screen.blits(blit_sequence, doreturn=False)
+        # 粒子画在场景之上、文字之下
+        if packet.particles is not None:
+            draw_particles(self.screen, packet.particles)
+        self.screen.blits([(self._text(line.text, line.color), (line.x, line.y)) for line in packet.hud], doreturn=False)
+
+
+class RenderThread(threading.Thread):
+    """渲染线程：只处理最新的数据包（旧包直接丢弃），完成绘制和 display.flip"""
+    def __init__(self, renderer):
+        super().__init__(name="render", daemon=True)
+        self.renderer = renderer
+        self._condition = threading.Condition()
+        self._packet = None
+        self._busy = False
+        self._running = True
+        self.frames_rendered = 0
+        self.frames_dropped = 0
+
+    def submit(self, packet):
+        """提交最新数据包；如果上一包还没开始渲染则被替换"""
+        with self._condition:
+            if self._packet is not None:
+                self.frames_dropped += 1
+            self._packet = packet
+            self._condition.notify_all()
+
+    def wait_idle(self):
+        """等待渲染线程处理完所有数据包（主线程自己绘制界面前调用）"""
+        with self._condition:
+            self._condition.wait_for(lambda: (self._packet is None and not self._busy) or not self._running)
+
+    def run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._packet is not None or not self._running)
+                if not self._running:
+                    break
+                packet = self._packet
+                self._packet = None
+                self._busy = True
+            try:
+                self.renderer.render(packet)
+                pygame.display.flip()
+                self.frames_rendered += 1
+            except Exception as e:
+                print(f"渲染线程错误: {e}")
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        self.join(timeout=1)
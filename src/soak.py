@@ -0,0 +1,115 @@
+import argparse
+import array
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from match import Match
+from tank_env import ActionKeys, NUM_ACTIONS
+
+
+def current_rss():
+    """返回当前进程的常驻内存（字节），非Linux平台退化为峰值常驻内存"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource  # Windows 上没有该模块
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 单位为字节，Linux 为KB
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return 0
+
+
+def growth_per_wave(samples):
+    """最小二乘拟合每波的内存增长斜率（字节/波）"""
+    n = len(samples)
+    if n < 2:
+        return 0.0
+    mean_x = (n - 1) / 2
+    mean_y = sum(samples) / n
+    numerator = sum((i - mean_x) * (y - mean_y) for i, y in enumerate(samples))
+    denominator = sum((i - mean_x) ** 2 for i in range(n))
+    return numerator / denominator
+
+
+def finish_wave(match):
+    """把本波剩余敌人按正常阵亡流程击毁（掉落血包、遗留子弹转交世界）"""
+    for tank in match.alive_enemies():
+        match.damage_tank(tank, tank.health)
+
+
+def run_soak(waves=1000, frames_per_wave=60, seed=0, warmup=100, max_growth=512, report_every=100):
+    """无界面自动游玩无尽模式，逐波记录内存；持续增长时返回False
+
+    玩家坦克保持满血（阵亡时当场复活）并随机行动；每波最多模拟frames_per_wave帧，
+    之后剩余敌人被直接击毁，以便在合理时间内推进到指定波次。没有完成全部波次时同样判为失败。
+    """
+    random.seed(seed)
+    keys = ActionKeys()
+    tracemalloc.start()
+    match = Match(None, "ENDLESS", verbose=False)
+    # 采样数组预先分配，避免测量本身造成的内存增长
+    traced = array.array("q", bytes(8 * waves))
+    rss = array.array("q", bytes(8 * waves))
+    start = time.perf_counter()
+
+    print(f"{'波次':>6} {'坦克':>4} {'遗留子弹':>8} {'血包':>4} {'tracemalloc(KB)':>16} {'RSS(MB)':>8}")
+    for wave in range(1, waves + 1):
+        start_wave = match.current_wave
+        for _ in range(frames_per_wave):
+            match.keep_player_alive()
+            keys.set_action(random.randrange(NUM_ACTIONS))
+            match.step(keys)
+            if match.current_wave != start_wave:
+                break
+        if match.current_wave == start_wave:
+            finish_wave(match)
+            match.keep_player_alive()
+            match.step(keys)
+
+        gc.collect()
+        traced[wave - 1] = tracemalloc.get_traced_memory()[0]
+        rss[wave - 1] = current_rss()
+        if wave % report_every == 0 or wave == waves:
+            print(f"{match.current_wave:>6} {len(match.tanks):>4} {len(match.orphan_bullets):>8} "
+                  f"{len(match.dropped_health_packs):>4} {traced[wave - 1] / 1024:>16.1f} {rss[wave - 1] / 1048576:>8.1f}")
+
+    tracemalloc.stop()
+    elapsed = time.perf_counter() - start
+    steady = traced[warmup:] if len(traced) > warmup + 1 else traced
+    slope = growth_per_wave(steady)
+    rss_slope = growth_per_wave(rss[warmup:] if len(rss) > warmup + 1 else rss)
+    print(f"完成 {waves} 波，耗时 {elapsed:.1f}s")
+    print(f"tracemalloc 增长: {slope:.1f} 字节/波, RSS 增长: {rss_slope:.1f} 字节/波（预热{warmup}波后）")
+
+    if match.current_wave < waves + 1:
+        # 对局没有推进时内存自然不增长，测试结果没有意义
+        print(f"[内存测试失败] 只推进到第 {match.current_wave} 波（应完成 {waves} 波）")
+        return False
+    if slope > max_growth:
+        print(f"[内存测试失败] 内存持续增长（阈值 {max_growth} 字节/波）")
+        return False
+    print("[内存测试通过]")
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="无尽模式内存浸泡测试")
+    parser.add_argument("--waves", type=int, default=1000, help="自动游玩的波数")
+    parser.add_argument("--frames-per-wave", type=int, default=60, help="每波最多模拟的帧数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warmup", type=int, default=100, help="不计入增长判定的预热波数")
+    parser.add_argument("--max-growth", type=int, default=512, help="允许的内存增长（字节/波）")
+    args = parser.parse_args(argv)
+    ok = run_soak(args.waves, args.frames_per_wave, args.seed, args.warmup, args.max_growth)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
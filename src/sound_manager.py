@@ -1,6 +1,8 @@
 import pygame
 import os
 import sys
+from events import SHOT, HIT, KILL, PICKUP, LEVEL_UP, GAME_OVER, VICTORY
+from asset_pack import default_pack
 
 
 class SoundManager:
@@ -11,6 +13,8 @@ class SoundManager:
         self.base_path = self._get_base_path()
         # 音效目录：基于根目录拼接
         self.sounds_dir = os.path.join(self.base_path, "assets", "sounds")
+        # 资源包（打包时使用）：音效已转换为混音器格式，直接从映射内存创建，不再逐个打开文件
+        self.pack = default_pack()
         
         # 加载音效（若无文件则使用默认音效）
         self.shoot_sound = self._load_sound("shoot.wav", None)
@@ -29,8 +33,12 @@ class SoundManager:
             return os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 
     def _load_sound(self, filename, default=None):
-        """加载音效文件，失败则返回默认"""
+        """加载音效文件（优先从资源包），失败则返回默认"""
         try:
+            if self.pack is not None:
+                sound = self.pack.load_sound(filename)
+                if sound is not None:
+                    return sound
             sound_path = os.path.join(self.sounds_dir, filename)
             print(f"[音效调试] 尝试加载: {sound_path} {'(存在)' if os.path.exists(sound_path) else '(不存在)'}" )
             if os.path.exists(sound_path):
@@ -73,4 +81,22 @@ class SoundManager:
     def play_levelup_sound(self):
         """播放升级音效"""
         if self.levelup_sound:
-            self.levelup_sound.play()
\ No newline at end of file
+            self.levelup_sound.play()
+
+    def handle_events(self, events):
+        """批量处理一帧的游戏事件，同类音效每帧只播放一次"""
+        kinds = {event.kind for event in events}
+        if SHOT in kinds:
+            self.play_shoot_sound()
+        if HIT in kinds:
+            self.play_hit_sound()
+        if KILL in kinds:
+            self.play_explosion_sound()
+        if PICKUP in kinds:
+            self.play_powerup_sound()
+        if LEVEL_UP in kinds:
+            self.play_levelup_sound()
+        if GAME_OVER in kinds:
+            self.play_game_over_sound()
+        if VICTORY in kinds:
+            self.play_victory_sound()
\ No newline at end of file
@@ -0,0 +1,89 @@
+import math
+import pygame
+
+# 精灵配置
+TANK_SIZE = 30
+GUN_LENGTH = 20
+SPRITE_PAD = 8  # 炮管会伸出车身，四周留出边距
+ANGLES = [0, 45, 90, 135, 180, 225, 270, 315]
+HEALTH_BAR_HEIGHT = 5
+HEALTH_BAR_OFFSET = 10
+
+# 游戏中用到的坦克颜色，启动时预渲染（其他颜色首次出现时再补建）
+TANK_COLORS = [
+    (0, 0, 255),  # 玩家
+    (255, 0, 0),  # 普通敌人
+    (0, 255, 0),
+    (255, 255, 0),
+    (255, 165, 0),  # 小弟
+]
+BOSS_COLORS = [(128, 0, 128)]  # BOSS
+
+
+class SpriteAtlas:
+    """坦克、血条、子弹和血包的预渲染图集，每帧用一次 Surface.blits 批量绘制"""
+    def __init__(self, tank_colors=TANK_COLORS, boss_colors=BOSS_COLORS):
+        self._convert = pygame.display.get_surface() is not None  # 已有窗口时转换为显示格式以加速blit
+        self.tank_sprites = {}  # (颜色, 是否BOSS, 角度) -> Surface
+        self.health_bars = {}  # (血量像素宽度, 是否BOSS) -> Surface
+        self.rect_sprites = {}  # (宽, 高, 颜色) -> Surface（子弹、血包）
+
+        for color in tank_colors:
+            self._build_tank(color, False)
+        for color in boss_colors:
+            self._build_tank(color, True)
+        for width in range(TANK_SIZE + 1):
+            self._build_health_bar(width, False)
+            self._build_health_bar(width, True)
+
+    def _finish(self, surface):
+        if self._convert:
+            return surface.convert_alpha()
+        return surface
+
+    def _build_tank(self, color, is_boss):
+        """预渲染一种颜色的8个角度（车身 + 炮管）"""
+        size = TANK_SIZE + SPRITE_PAD * 2
+        gun_width = 5 if is_boss else 3
+        center = (SPRITE_PAD + TANK_SIZE // 2, SPRITE_PAD + TANK_SIZE // 2)
+        for angle in ANGLES:
+            surface = pygame.Surface((size, size), pygame.SRCALPHA)
+            pygame.draw.rect(surface, color, (SPRITE_PAD, SPRITE_PAD, TANK_SIZE, TANK_SIZE))
+            # 与 Tank.draw 相同的炮管计算
+            rad_angle = math.radians(angle)
+            end_x = center[0] + math.cos(rad_angle) * GUN_LENGTH
+            end_y = center[1] - math.sin(rad_angle) * GUN_LENGTH
+            pygame.draw.line(surface, (0, 0, 0), center, (end_x, end_y), gun_width)
+            self.tank_sprites[(color, is_boss, angle)] = self._finish(surface)
+
+    def _build_health_bar(self, width, is_boss):
+        surface = pygame.Surface((TANK_SIZE, HEALTH_BAR_HEIGHT), pygame.SRCALPHA)
+        surface.fill((200, 0, 0))
+        if width > 0:
+            # BOSS坦克使用紫色血条
+            surface.fill((128, 0, 128) if is_boss else (0, 200, 0), (0, 0, width, HEALTH_BAR_HEIGHT))
+        self.health_bars[(width, is_boss)] = self._finish(surface)
+
+    def tank_sprite(self, color, is_boss, angle):
+        key = (color, is_boss, angle)
+        sprite = self.tank_sprites.get(key)
+        if sprite is None:
+            self._build_tank(color, is_boss)
+            sprite = self.tank_sprites[key]
+        return sprite
+
+    def health_bar(self, health, max_health, is_boss):
+        width = int((health / max_health) * TANK_SIZE)
+        width = max(0, min(TANK_SIZE, width))
+        return self.health_bars[(width, is_boss)]
+
+    def rect_sprite(self, width, height, color):
+        key = (width, height, color)
+        sprite = self.rect_sprites.get(key)
+        if sprite is None:
+            sprite = pygame.Surface((width, height))
+            sprite.fill(color)
+            if self._convert:
+                sprite = sprite.convert()
+            self.rect_sprites[key] = sprite
+        return sprite
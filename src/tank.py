@@ -3,10 +3,11 @@ import pygame
 import random
 from game_objects import GameObject
 from bullet import Bullet
+from events import SHOT
 
 class Tank(GameObject):
     """坦克类，优化炮管动画和AI智能"""
-    def __init__(self, x, y, color, is_player=False, is_boss=False):
+    def __init__(self, x, y, color, is_player=False, is_boss=False, rng=None):
         super().__init__(x, y, 30, 30, color)
         self.speed = 2
         self.direction = (0, -1)  # 方向向量
@@ -24,6 +25,11 @@ class Tank(GameObject):
         self.ai_shoot_timer = 0
         self.ai_target = None
         self.ai_difficulty = 1  # AI难度等级（影响反应速度）
+        self.cover_search_radius = 150  # 寻找掩护点的搜索半径
+        self.ai_dodge_dir = None  # 最近一次决策得出的躲避方向（降频时沿用）
+        self.ai_plan = None  # BOSS规划器给出的逐帧动作 deque[(dx, dy, 开火)]，用完后回到原有AI
+        # AI决策和血包掉落使用的随机数生成器（默认为 random 模块；并行AI为每个坦克换成独立的 random.Random）
+        self.ai_rng = random if rng is None else rng
         
         # 血包掉落相关
         self.drop_health_prob = 0.5  # 50%概率掉落血包
@@ -66,13 +72,14 @@ class Tank(GameObject):
             self.rect.x = new_x
             self.rect.y = new_y
 
-    def shoot(self, sound_manager=None):
-        """发射子弹（播放音效）"""
+    def shoot(self, sound_manager=None, events=None):
+        """发射子弹（有事件总线时记录开火事件，否则直接播放音效）"""
         if not self.alive or self.shoot_cooldown > 0:
             return
         
-        # 播放射击音效
-        if sound_manager:
+        if events is not None:
+            events.emit(SHOT, self.rect.centerx, self.rect.centery, self)
+        elif sound_manager:
             sound_manager.play_shoot_sound()
         
         # 计算炮口位置（根据角度偏移）
@@ -99,7 +106,7 @@ class Tank(GameObject):
 
     def drop_health(self):
         """掉落血包（50%概率）"""
-        if random.random() < self.drop_health_prob and not self.is_player:
+        if self.ai_rng.random() < self.drop_health_prob and not self.is_player:
             self.health_pack = GameObject(
                 self.rect.x, self.rect.y, 15, 15, (255, 0, 255)  # 粉色血包
             )
@@ -115,12 +122,12 @@ class Tank(GameObject):
         # BOSS坦克更擅长走位
         if self.is_boss:
             # 更多横向移动和规避动作
-            if random.random() < 0.4:
+            if self.ai_rng.random() < 0.4:
                 # 随机横向移动
-                return (random.choice([-1, 1, 0]), random.choice([-1, 1, 0]))
+                return (self.ai_rng.choice([-1, 1, 0]), self.ai_rng.choice([-1, 1, 0]))
             # 更频繁地改变方向
             if self.ai_move_timer % 5 == 0:
-                move_dir = (random.choice([-1, 1, 0]), random.choice([-1, 1, 0]))
+                move_dir = (self.ai_rng.choice([-1, 1, 0]), self.ai_rng.choice([-1, 1, 0]))
                 return move_dir
         
         # 理想距离控制在150-250之间
@@ -141,11 +148,21 @@ class Tank(GameObject):
                 move_dir = (move_x, move_y)
             else:
                 move_dir = (move_x, move_y)
-        # 距离适中则保持并横向移动
+        # 距离适中则寻找掩护，没有掩护时横向移动
         else:
+            cover = None
+            if game_map and hasattr(game_map, 'find_cover'):
+                cover = game_map.find_cover(self.rect.center, target_pos, self.cover_search_radius)
+            if cover:
+                # 向最近的隐蔽掩护点移动，已到达则原地固守
+                cover_dx = cover.x - self.rect.x
+                cover_dy = cover.y - self.rect.y
+                move_x = 0 if abs(cover_dx) < self.speed else (1 if cover_dx > 0 else -1)
+                move_y = 0 if abs(cover_dy) < self.speed else (1 if cover_dy > 0 else -1)
+                move_dir = (move_x, move_y)
             # 随机横向移动保持活跃
-            if random.random() < 0.7:
-                move_dir = (random.choice([-1, 1, 0]), random.choice([-1, 1, 0]))
+            elif self.ai_rng.random() < 0.7:
+                move_dir = (self.ai_rng.choice([-1, 1, 0]), self.ai_rng.choice([-1, 1, 0]))
             else:
                 move_x = 1 if dx > 0 else -1 if dx < 0 else 0
                 move_y = 1 if dy > 0 else -1 if dy < 0 else 0
@@ -161,7 +178,7 @@ class Tank(GameObject):
         
         if game_map and game_map.check_collision(temp_rect):
             directions = [(1,0), (-1,0), (0,1), (0,-1), (1,1), (1,-1), (-1,1), (-1,-1)]
-            random.shuffle(directions)
+            self.ai_rng.shuffle(directions)
             for dir in directions:
                 temp_rect = pygame.Rect(
                     self.rect.x + dir[0] * self.speed,
@@ -249,74 +266,114 @@ class Tank(GameObject):
                 return (1 if dx > 0 else -1, 1 if dy > 0 else -1)
             return (0, 1 if dy > 0 else -1)
 
-    def update(self, keys=None, game_map=None, target_tank=None, sound_manager=None):
+    def update(self, keys=None, game_map=None, target_tank=None, sound_manager=None, events=None, think=True):
+        """推进一帧；think=False 时AI只执行廉价的惯性步（由AI调度器控制）"""
         if not self.alive:
             return
-        if self.shoot_cooldown > 0:
-            self.shoot_cooldown -= 1
+        if self.is_player:
+            if self.shoot_cooldown > 0:
+                self.shoot_cooldown -= 1
+            if keys:
+                # 8方向移动控制
+                dx, dy = 0, 0
+                if keys[pygame.K_w]:
+                    dy = -1
+                if keys[pygame.K_s]:
+                    dy = 1
+                if keys[pygame.K_a]:
+                    dx = -1
+                if keys[pygame.K_d]:
+                    dx = 1
 
-        if self.is_player and keys:
-            # 8方向移动控制
-            dx, dy = 0, 0
-            if keys[pygame.K_w]:
-                dy = -1
-            if keys[pygame.K_s]:
-                dy = 1
-            if keys[pygame.K_a]:
-                dx = -1
-            if keys[pygame.K_d]:
-                dx = 1
-            
-            if dx != 0 or dy != 0:
-                self.move(dx, dy, game_map)
-            
-            if keys[pygame.K_SPACE]:
-                self.shoot(sound_manager)
-        
-        elif not self.is_player and target_tank and target_tank.alive:
-            self.ai_target = target_tank
-            self.ai_move_timer += 1
-            self.ai_shoot_timer += 1
-            
-            # BOSS坦克射击冷却更短
-            shoot_interval = 10 if self.is_boss else 15
-            # AI难度影响射击频率
-            shoot_interval = max(5, shoot_interval - self.ai_difficulty)
-            
-            # 检查是否需要躲避子弹
-            dodge_dir = self._predict_bullet_path(target_tank, game_map)
-            
-            if dodge_dir:
-                # 立即执行躲避动作
-                self.move(dodge_dir[0], dodge_dir[1], game_map)
-                self.ai_move_timer = 0  # 重置移动计时器
-            elif self.ai_move_timer >= random.randint(10, 20 - self.ai_difficulty * 2):
-                self.ai_move_timer = 0
-                if random.random() < 0.8 + (self.ai_difficulty * 0.1):  # 难度越高越可能追踪目标
-                    target_pos = (self.ai_target.rect.centerx, self.ai_target.rect.centery)
-                    move_dir = self._ai_find_path(target_pos, game_map)
-                else:
-                    # 随机移动增加不可预测性
-                    move_dir = (random.choice([-1, 0, 1]), random.choice([-1, 0, 1]))
-                
-                self.move(move_dir[0], move_dir[1], game_map)
-            
-            # 射击逻辑
-            if self.ai_shoot_timer >= shoot_interval:
-                self.ai_shoot_timer = 0
-                # 瞄准目标
-                aim_dir = self._ai_aim((target_tank.rect.centerx, target_tank.rect.centery))
-                self.direction = aim_dir
-                self.update_angle()
-                # 有一定概率射击（难度越高概率越大）
-                if random.random() < 0.7 + (self.ai_difficulty * 0.1):
-                    self.shoot(sound_manager)
+                if dx != 0 or dy != 0:
+                    self.move(dx, dy, game_map)
+
+                if keys[pygame.K_SPACE]:
+                    self.shoot(sound_manager, events)
+        elif self.ai_update(target_tank, game_map, think):
+            self.shoot(sound_manager, events)
+
+        self.update_bullets()
 
+    def update_bullets(self):
         for bullet in self.bullets[:]:
             bullet.update()
             if not bullet.active:
                 self.bullets.remove(bullet)
 
+    def ai_update(self, target_tank, game_map, think=True):
+        """AI坦克一帧的决策部分，返回本帧是否开火
+
+        只读取目标坦克和地图、只修改自身（随机数来自 ai_rng），开火由调用方执行，
+        因此不同坦克的决策可以在多个线程中同时进行。
+        """
+        if self.shoot_cooldown > 0:
+            self.shoot_cooldown -= 1
+        if not target_tank or not target_tank.alive:
+            return False
+        self.ai_target = target_tank
+        self.ai_move_timer += 1
+        self.ai_shoot_timer += 1
+        if think:
+            return self.ai_think(target_tank, game_map)
+        self.ai_coast(game_map)
+        return False
+
+    def ai_think(self, target_tank, game_map):
+        """完整的AI决策：躲避子弹、寻路和瞄准（开销较大），返回是否开火"""
+        if self.ai_plan:
+            return self._follow_plan(target_tank, game_map)
+        rng = self.ai_rng
+        # BOSS坦克射击冷却更短
+        shoot_interval = 10 if self.is_boss else 15
+        # AI难度影响射击频率
+        shoot_interval = max(5, shoot_interval - self.ai_difficulty)
+        
+        # 检查是否需要躲避子弹
+        dodge_dir = self._predict_bullet_path(target_tank, game_map)
+        self.ai_dodge_dir = dodge_dir
+        
+        if dodge_dir:
+            # 立即执行躲避动作
+            self.move(dodge_dir[0], dodge_dir[1], game_map)
+            self.ai_move_timer = 0  # 重置移动计时器
+        elif self.ai_move_timer >= rng.randint(10, max(10, 20 - self.ai_difficulty * 2)):
+            self.ai_move_timer = 0
+            if rng.random() < 0.8 + (self.ai_difficulty * 0.1):  # 难度越高越可能追踪目标
+                target_pos = (self.ai_target.rect.centerx, self.ai_target.rect.centery)
+                move_dir = self._ai_find_path(target_pos, game_map)
+            else:
+                # 随机移动增加不可预测性
+                move_dir = (rng.choice([-1, 0, 1]), rng.choice([-1, 0, 1]))
+            
+            self.move(move_dir[0], move_dir[1], game_map)
+        
+        # 射击逻辑
+        if self.ai_shoot_timer >= shoot_interval:
+            self.ai_shoot_timer = 0
+            # 瞄准目标
+            aim_dir = self._ai_aim((target_tank.rect.centerx, target_tank.rect.centery))
+            self.direction = aim_dir
+            self.update_angle()
+            # 有一定概率射击（难度越高概率越大）
+            return rng.random() < 0.7 + (self.ai_difficulty * 0.1)
+        return False
+
+    def _follow_plan(self, target_tank, game_map):
+        """执行规划器给出的下一帧动作：移动后瞄准目标，按计划开火"""
+        dx, dy, fire = self.ai_plan.popleft()
+        if dx or dy:
+            self.move(dx, dy, game_map)
+        self.direction = self._ai_aim((target_tank.rect.centerx, target_tank.rect.centery))
+        self.update_angle()
+        return fire
+
+    def ai_coast(self, game_map):
+        """两次决策之间的廉价步：沿上次的躲避方向继续移动，计时器照常累加"""
+        if self.ai_dodge_dir:
+            self.move(self.ai_dodge_dir[0], self.ai_dodge_dir[1], game_map)
+            self.ai_move_timer = 0
+
     def draw_health_bar(self, screen):
         if not self.alive:
             return
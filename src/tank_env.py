@@ -0,0 +1,365 @@
+import argparse
+import multiprocessing
+import os
+import random
+import time
+import numpy as np
+import pygame
+from match import Match
+
+# 观测配置：地图按20像素一格降采样为 40x30 的占据栅格
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 600
+GRID_CELL = 20
+GRID_WIDTH = SCREEN_WIDTH // GRID_CELL
+GRID_HEIGHT = SCREEN_HEIGHT // GRID_CELL
+GRID_EMPTY = 0
+GRID_WALL = 1  # 不可破坏障碍物
+GRID_COVER = 2  # 可破坏掩体
+
+# 坦克特征: [存活, x, y, 方向x, 方向y, 生命比例, 是否玩家, 是否BOSS, 射击冷却]
+MAX_TANKS = 12
+TANK_FEATURES = 9
+# 子弹特征: [有效, x, y, 方向x, 方向y, 是否玩家子弹]
+MAX_BULLETS = 64
+BULLET_FEATURES = 6
+
+# 动作：9个移动方向 x 是否开火，共18个离散动作
+MOVES = [(0, 0), (0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1)]
+NUM_ACTIONS = len(MOVES) * 2
+
+# 奖励配置
+REWARD_HIT = 1.0  # 每造成1点伤害
+REWARD_KILL = 5.0  # 每击毁一辆敌方坦克
+REWARD_DAMAGE = 1.0  # 玩家生命值变化（掉血为负，回血为正）
+REWARD_WAVE = 5.0  # 无尽模式通过一波
+REWARD_WIN = 10.0
+REWARD_LOSE = -10.0
+
+
+class ActionKeys:
+    """把离散动作伪装成 pygame.key.get_pressed() 的按键状态，供 Tank.update 使用"""
+    def __init__(self):
+        self.pressed = {pygame.K_w: False, pygame.K_s: False, pygame.K_a: False,
+                        pygame.K_d: False, pygame.K_SPACE: False}
+
+    def set_action(self, action):
+        dx, dy = MOVES[action // 2]
+        self.pressed[pygame.K_w] = dy < 0
+        self.pressed[pygame.K_s] = dy > 0
+        self.pressed[pygame.K_a] = dx < 0
+        self.pressed[pygame.K_d] = dx > 0
+        self.pressed[pygame.K_SPACE] = action % 2 == 1
+
+    def __getitem__(self, key):
+        return self.pressed.get(key, False)
+
+
+def fill_rect_cells(grid, rect, value):
+    """把矩形覆盖到的栅格标记为指定值"""
+    x0 = max(0, rect.left // GRID_CELL)
+    y0 = max(0, rect.top // GRID_CELL)
+    x1 = min(GRID_WIDTH, -(-rect.right // GRID_CELL))
+    y1 = min(GRID_HEIGHT, -(-rect.bottom // GRID_CELL))
+    if x0 < x1 and y0 < y1:
+        grid[y0:y1, x0:x1] = value
+
+
+def rasterize_walls(game_map, grid):
+    """把不可破坏障碍物栅格化到grid（只在地图加载或变化时调用）"""
+    grid.fill(GRID_EMPTY)
+    for obstacle in game_map.obstacles:
+        fill_rect_cells(grid, obstacle.rect, GRID_WALL)
+
+
+def write_features(match, wall_grid, grid, tanks, bullets):
+    """把对局状态写入预分配的数组：栅格、坦克特征和子弹特征
+
+    坦克和子弹的数量上限由数组行数决定，训练环境和共享内存世界状态共用这套特征。
+    """
+    np.copyto(grid, wall_grid)
+    for obstacle in match.game_map.destroyable_obstacles:
+        fill_rect_cells(grid, obstacle.rect, GRID_COVER)
+    terrain = match.game_map.terrain
+    if terrain is not None:
+        grid[terrain.occupancy(GRID_CELL) & (grid == GRID_EMPTY)] = GRID_COVER
+
+    max_tanks = len(tanks)
+    max_bullets = len(bullets)
+    tanks.fill(0.0)
+    bullets.fill(0.0)
+    b = 0
+    for bullet in match.orphan_bullets:
+        if b >= max_bullets:
+            break
+        row = bullets[b]
+        row[0] = 1.0
+        row[1] = bullet.rect.x / SCREEN_WIDTH
+        row[2] = bullet.rect.y / SCREEN_HEIGHT
+        row[3] = bullet.direction[0]
+        row[4] = bullet.direction[1]
+        b += 1
+    for i, tank in enumerate(match.tanks):
+        if i < max_tanks:
+            row = tanks[i]
+            row[0] = 1.0 if tank.health > 0 else 0.0
+            row[1] = tank.rect.centerx / SCREEN_WIDTH
+            row[2] = tank.rect.centery / SCREEN_HEIGHT
+            row[3] = tank.direction[0]
+            row[4] = tank.direction[1]
+            row[5] = tank.health / tank.max_health
+            row[6] = 1.0 if tank.is_player else 0.0
+            row[7] = 1.0 if tank.is_boss else 0.0
+            row[8] = tank.shoot_cooldown / 15.0
+        for bullet in tank.bullets:
+            if b >= max_bullets:
+                break
+            if bullet.active:
+                row = bullets[b]
+                row[0] = 1.0
+                row[1] = bullet.rect.x / SCREEN_WIDTH
+                row[2] = bullet.rect.y / SCREEN_HEIGHT
+                row[3] = bullet.direction[0]
+                row[4] = bullet.direction[1]
+                row[5] = 1.0 if tank.is_player else 0.0
+                b += 1
+    return b
+
+
+class TankEnv:
+    """单个无界面对局环境，玩家坦克由动作控制，敌人使用现有AI"""
+    def __init__(self, map_paths=None, mode="CLASSIC", frame_skip=1, max_steps=3000):
+        self.map_paths = list(map_paths) if map_paths else [None]
+        self.mode = mode
+        self.frame_skip = frame_skip
+        self.max_steps = max_steps
+        self.keys = ActionKeys()
+        self.match = None
+        self.steps = 0
+        self.episode_return = 0.0
+        self._wall_grid = np.zeros((GRID_HEIGHT, GRID_WIDTH), dtype=np.uint8)
+        self._wall_key = None  # 栅格化时地图的 (对象, 版本, 障碍物数)，变化后重新栅格化
+
+    def reset(self):
+        """开始新对局（随机挑选地图）"""
+        map_path = random.choice(self.map_paths)
+        self.match = Match(map_path, self.mode, verbose=False)
+        self.steps = 0
+        self.episode_return = 0.0
+        self._wall_key = None  # 旧地图释放后新地图可能复用同一个id，换局时总是重新栅格化
+
+    def step(self, action):
+        """执行动作（重复frame_skip帧），返回 (奖励, 是否结束, 信息)"""
+        match = self.match
+        self.keys.set_action(int(action))
+        reward = 0.0
+        for _ in range(self.frame_skip):
+            player = match.player_tank
+            enemies = match.tanks[1:]
+            enemy_health = [tank.health for tank in enemies]
+            player_health = player.health
+            wave = match.current_wave
+
+            match.step(self.keys)
+
+            for tank, health in zip(enemies, enemy_health):
+                if health > 0:
+                    reward += (health - max(tank.health, 0)) * REWARD_HIT
+                    if tank.health <= 0:
+                        reward += REWARD_KILL
+            reward += (player.health - player_health) * REWARD_DAMAGE
+            reward += (match.current_wave - wave) * REWARD_WAVE
+            if match.over:
+                reward += REWARD_WIN if match.result == "win" else REWARD_LOSE
+                break
+
+        self.steps += 1
+        self.episode_return += reward
+        truncated = not match.over and self.steps >= self.max_steps
+        done = match.over or truncated
+        info = None
+        if done:
+            info = {
+                "result": match.result,
+                "truncated": truncated,
+                "wave": match.current_wave,
+                "return": self.episode_return,
+                "length": self.steps,
+            }
+        return reward, done, info
+
+    def observe(self, grid, tanks, bullets):
+        """把当前状态写入预分配的观测数组（避免每步分配内存）"""
+        # 不可破坏障碍物只在换图、地图热更新或区块流式加载后重新栅格化
+        game_map = self.match.game_map
+        wall_key = (id(game_map), game_map.revision, len(game_map.obstacles))
+        if wall_key != self._wall_key:
+            rasterize_walls(game_map, self._wall_grid)
+            self._wall_key = wall_key
+        write_features(self.match, self._wall_grid, grid, tanks, bullets)
+
+
+class VectorTankEnv:
+    """在同一进程内同步推进N个独立对局，返回批量NumPy观测"""
+    def __init__(self, num_envs, map_paths=None, mode="CLASSIC", frame_skip=1, max_steps=3000, seed=None):
+        if seed is not None:
+            random.seed(seed)
+        self.num_envs = num_envs
+        self.envs = [TankEnv(map_paths, mode, frame_skip, max_steps) for _ in range(num_envs)]
+        self.grid = np.zeros((num_envs, GRID_HEIGHT, GRID_WIDTH), dtype=np.uint8)
+        self.tanks = np.zeros((num_envs, MAX_TANKS, TANK_FEATURES), dtype=np.float32)
+        self.bullets = np.zeros((num_envs, MAX_BULLETS, BULLET_FEATURES), dtype=np.float32)
+        self.rewards = np.zeros(num_envs, dtype=np.float32)
+        self.dones = np.zeros(num_envs, dtype=bool)
+
+    def _observations(self):
+        return {"grid": self.grid, "tanks": self.tanks, "bullets": self.bullets}
+
+    def reset(self):
+        """重置所有对局，返回观测字典"""
+        for i, env in enumerate(self.envs):
+            env.reset()
+            env.observe(self.grid[i], self.tanks[i], self.bullets[i])
+        return self._observations()
+
+    def step(self, actions):
+        """推进所有对局一步，结束的对局自动重置；返回 (观测, 奖励, 结束标记, 信息列表)
+
+        返回的数组在下一次调用step时会被覆盖，需要保留时请自行复制。
+        """
+        infos = [None] * self.num_envs
+        for i, env in enumerate(self.envs):
+            reward, done, info = env.step(actions[i])
+            self.rewards[i] = reward
+            self.dones[i] = done
+            if done:
+                infos[i] = info
+                env.reset()
+            env.observe(self.grid[i], self.tanks[i], self.bullets[i])
+        return self._observations(), self.rewards, self.dones, infos
+
+    def close(self):
+        pass
+
+
+def _worker(remote, num_envs, map_paths, mode, frame_skip, max_steps, seed):
+    """工作进程：托管一部分对局并响应主进程的命令"""
+    env = VectorTankEnv(num_envs, map_paths, mode, frame_skip, max_steps, seed)
+    try:
+        while True:
+            command, data = remote.recv()
+            if command == "step":
+                obs, rewards, dones, infos = env.step(data)
+                remote.send((obs, rewards, dones, infos))
+            elif command == "reset":
+                remote.send(env.reset())
+            elif command == "close":
+                break
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        remote.close()
+
+
+class SubprocVectorTankEnv:
+    """把N个对局分片到多个工作进程中并行推进，接口与 VectorTankEnv 相同"""
+    def __init__(self, num_envs, num_workers, map_paths=None, mode="CLASSIC", frame_skip=1, max_steps=3000, seed=None):
+        num_workers = max(1, min(num_workers, num_envs))
+        self.num_envs = num_envs
+        # 尽量平均分配对局
+        self.shards = [num_envs // num_workers + (1 if i < num_envs % num_workers else 0) for i in range(num_workers)]
+        self.remotes = []
+        self.processes = []
+        for i, shard in enumerate(self.shards):
+            remote, worker_remote = multiprocessing.Pipe()
+            worker_seed = None if seed is None else seed + i
+            process = multiprocessing.Process(
+                target=_worker,
+                args=(worker_remote, shard, map_paths, mode, frame_skip, max_steps, worker_seed),
+                daemon=True
+            )
+            process.start()
+            worker_remote.close()
+            self.remotes.append(remote)
+            self.processes.append(process)
+
+    def _merge(self, observations):
+        return {key: np.concatenate([obs[key] for obs in observations]) for key in observations[0]}
+
+    def reset(self):
+        for remote in self.remotes:
+            remote.send(("reset", None))
+        return self._merge([remote.recv() for remote in self.remotes])
+
+    def step(self, actions):
+        start = 0
+        for remote, shard in zip(self.remotes, self.shards):
+            remote.send(("step", actions[start:start + shard]))
+            start += shard
+        results = [remote.recv() for remote in self.remotes]
+        observations = self._merge([r[0] for r in results])
+        rewards = np.concatenate([r[1] for r in results])
+        dones = np.concatenate([r[2] for r in results])
+        infos = [info for r in results for info in r[3]]
+        return observations, rewards, dones, infos
+
+    def close(self):
+        for remote in self.remotes:
+            try:
+                remote.send(("close", None))
+            except (BrokenPipeError, EOFError):
+                pass
+        for process in self.processes:
+            process.join(timeout=1)
+
+
+def make_vector_env(num_envs, num_workers=0, **kwargs):
+    """创建向量化环境：num_workers为0时在当前进程内运行"""
+    if num_workers and num_workers > 0:
+        return SubprocVectorTankEnv(num_envs, num_workers, **kwargs)
+    return VectorTankEnv(num_envs, **kwargs)
+
+
+def benchmark(num_envs=16, steps=1000, num_workers=0, mode="CLASSIC", map_paths=None, seed=0):
+    """测量吞吐量（环境步数/秒/核），动作随机"""
+    env = make_vector_env(num_envs, num_workers, map_paths=map_paths, mode=mode, seed=seed)
+    rng = np.random.default_rng(seed)
+    try:
+        env.reset()
+        start = time.perf_counter()
+        for _ in range(steps):
+            env.step(rng.integers(0, NUM_ACTIONS, size=num_envs))
+        elapsed = time.perf_counter() - start
+    finally:
+        env.close()
+    total_steps = num_envs * steps
+    cores = max(1, num_workers)
+    return {
+        "env_steps": total_steps,
+        "seconds": elapsed,
+        "steps_per_second": total_steps / elapsed,
+        "steps_per_second_per_core": total_steps / elapsed / cores,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="坦克大战向量化环境吞吐量测试")
+    parser.add_argument("--envs", type=int, default=16, help="并行对局数量")
+    parser.add_argument("--steps", type=int, default=1000, help="每个对局推进的步数")
+    parser.add_argument("--workers", type=int, default=0, help="工作进程数（0表示单进程）")
+    parser.add_argument("--mode", choices=["CLASSIC", "ENDLESS"], default="CLASSIC")
+    parser.add_argument("--maps", default=None, help="地图目录（默认使用随机生成地图）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    map_paths = None
+    if args.maps:
+        map_paths = [os.path.join(args.maps, f) for f in sorted(os.listdir(args.maps)) if f.endswith(".json")]
+
+    result = benchmark(args.envs, args.steps, args.workers, args.mode, map_paths, args.seed)
+    print(f"环境步数: {result['env_steps']}  耗时: {result['seconds']:.2f}s")
+    print(f"吞吐量: {result['steps_per_second']:.0f} 步/秒, {result['steps_per_second_per_core']:.0f} 步/秒/核")
+
+
+if __name__ == "__main__":
+    main()
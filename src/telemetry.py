@@ -0,0 +1,205 @@
+import array
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import socket
+import time
+import uuid
+from events import SHOT, HIT, KILL, COVER_DESTROYED, WAVE, SPAWN
+
+FPS = 60
+DEFAULT_TELEMETRY_DIR = os.path.join(os.path.expanduser("~"), ".tank_war", "telemetry")
+TELEMETRY_FILE = "telemetry.jsonl"
+MAX_FILE_BYTES = 5 * 1024 * 1024  # 单个文件达到5MB时轮转
+BACKUP_COUNT = 20  # 保留的轮转文件数
+QUEUE_SIZE = 10000  # 写入队列上限，写满时丢弃记录而不阻塞帧循环
+
+
+def percentiles(values, points=(50, 90, 99)):
+    """计算帧耗时百分位（毫秒），返回字典"""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    result = {}
+    for p in points:
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        result[f"p{p}"] = round(ordered[index], 3)
+    result["max"] = round(ordered[-1], 3)
+    return result
+
+
+class TelemetryWriter:
+    """后台线程写入JSON Lines并按大小轮转文件，调用方只做一次非阻塞入队"""
+    def __init__(self, directory=None, max_bytes=MAX_FILE_BYTES, backup_count=BACKUP_COUNT):
+        self.directory = directory or os.environ.get("TANK_WAR_TELEMETRY_DIR", DEFAULT_TELEMETRY_DIR)
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, TELEMETRY_FILE)
+        self.dropped = 0
+
+        handler = logging.handlers.RotatingFileHandler(
+            self.path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self._queue = queue.Queue(QUEUE_SIZE)
+        # QueueListener 在独立线程中完成序列化后的磁盘写入与轮转
+        self._listener = logging.handlers.QueueListener(self._queue, handler)
+        self._listener.start()
+
+    def write(self, record):
+        """提交一条记录（不会阻塞；队列满时丢弃并计数）"""
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+        entry = logging.makeLogRecord({"msg": line, "levelno": logging.INFO, "levelname": "INFO"})
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """写完队列中剩余的记录并停止后台线程"""
+        self._listener.stop()
+        for handler in self._listener.handlers:
+            handler.close()
+
+
+class MatchTelemetry:
+    """订阅对局事件，统计单局与每波的平衡性数据"""
+    def __init__(self, match, writer, map_name=None):
+        self.match = match
+        self.writer = writer
+        self.match_id = uuid.uuid4().hex
+        self.host = socket.gethostname()
+        self.map_name = map_name or getattr(match.game_map, "name", "未知")
+        self.mode = match.mode
+        self.started = time.time()
+        self.finished = False
+
+        # 整局统计
+        self.shots_fired = 0
+        self.shots_hit = 0
+        self.enemy_shots_fired = 0
+        self.enemy_shots_hit = 0
+        self.cover_destroyed = 0
+        self.kills = 0
+        self.boss_ttk = []  # 每个BOSS从出场到被击毁的秒数
+        self.frame_times = array.array("f")  # 整局帧耗时，紧凑存储
+
+        self._boss_spawn = {}  # id(BOSS) -> 出场帧
+        self._start_wave(match.current_wave)
+        self._track_boss(match.events.frame)
+        match.events.subscribe(self.handle_events)
+
+    def _start_wave(self, wave):
+        # 分批进场时新一波的敌人还在排队，计数由之后的 SPAWN 事件累加
+        self.wave = wave
+        self.wave_started = time.time()
+        self.wave_start_frame = self.match.frame
+        self.wave_enemies = len(self.match.tanks) - 1
+        self.wave_shots_fired = 0
+        self.wave_shots_hit = 0
+        self.wave_damage_taken = 0
+        self.wave_cover_destroyed = 0
+        self.wave_frame_times = []
+
+    def _track_boss(self, frame, boss=None):
+        boss = boss or self.match.boss_tank
+        if boss is not None and id(boss) not in self._boss_spawn:
+            self._boss_spawn[id(boss)] = frame
+
+    def record_frame(self, frame_ms):
+        """记录一帧的耗时（毫秒）"""
+        self.frame_times.append(frame_ms)
+        self.wave_frame_times.append(frame_ms)
+
+    def handle_events(self, events):
+        player = self.match.player_tank
+        for event in events:
+            kind = event.kind
+            if kind == SHOT:
+                if event.actor is player:
+                    self.shots_fired += 1
+                    self.wave_shots_fired += 1
+                else:
+                    self.enemy_shots_fired += 1
+            elif kind == HIT:
+                if event.actor is player:
+                    self.shots_hit += 1
+                    self.wave_shots_hit += 1
+                elif event.target is player:
+                    self.wave_damage_taken += 1
+                    self.enemy_shots_hit += 1
+                else:
+                    self.enemy_shots_hit += 1
+            elif kind == KILL:
+                target = event.target
+                if target is not player:
+                    self.kills += 1
+                spawn_frame = self._boss_spawn.pop(id(target), None) if target is not None and target.is_boss else None
+                if spawn_frame is not None:
+                    self.boss_ttk.append(round((event.frame - spawn_frame) / FPS, 3))
+            elif kind == COVER_DESTROYED:
+                self.cover_destroyed += 1
+                self.wave_cover_destroyed += 1
+            elif kind == WAVE and event.actor != self.wave:
+                # 新一波开始：先写出上一波的记录
+                self._write_wave()
+                self._start_wave(event.actor)
+                self._track_boss(event.frame)
+            elif kind == SPAWN:
+                # 预先准备的波次：敌人逐个进场，BOSS从进场时开始计时
+                self.wave_enemies += 1
+                if event.actor is not None and event.actor.is_boss:
+                    self._track_boss(event.frame, event.actor)
+
+    def _base_record(self, record_type):
+        return {
+            "type": record_type,
+            "match_id": self.match_id,
+            "host": self.host,
+            "time": round(time.time(), 3),
+            "map": self.map_name,
+            "mode": self.mode,
+        }
+
+    def _write_wave(self):
+        record = self._base_record("wave")
+        record.update({
+            "wave": self.wave,
+            "duration_s": round(time.time() - self.wave_started, 3),
+            "frames": self.match.frame - self.wave_start_frame,
+            "enemies": self.wave_enemies,
+            "boss_wave": self.wave % 5 == 0 and self.mode == "ENDLESS",
+            "shots_fired": self.wave_shots_fired,
+            "shots_hit": self.wave_shots_hit,
+            "damage_taken": self.wave_damage_taken,
+            "cover_destroyed": self.wave_cover_destroyed,
+            "frame_ms": percentiles(self.wave_frame_times),
+        })
+        self.writer.write(record)
+
+    def finish(self, result=None):
+        """对局结束：写出最后一波和整局记录（只写一次）"""
+        if self.finished:
+            return
+        self.finished = True
+        self.match.events.unsubscribe(self.handle_events)
+        self._write_wave()
+        record = self._base_record("match")
+        record.update({
+            "result": result or self.match.result or "quit",
+            "duration_s": round(time.time() - self.started, 3),
+            "frames": self.match.frame,
+            "waves_reached": self.match.current_wave,
+            "player_level": self.match.player_level,
+            "kills": self.kills,
+            "shots_fired": self.shots_fired,
+            "shots_hit": self.shots_hit,
+            "accuracy": round(self.shots_hit / self.shots_fired, 4) if self.shots_fired else None,
+            "enemy_shots_fired": self.enemy_shots_fired,
+            "enemy_shots_hit": self.enemy_shots_hit,
+            "cover_destroyed": self.cover_destroyed,
+            "boss_ttk_s": self.boss_ttk,
+            "frame_ms": percentiles(self.frame_times),
+        })
+        self.writer.write(record)
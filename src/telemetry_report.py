@@ -0,0 +1,167 @@
+import argparse
+import glob
+import json
+import os
+import statistics
+from collections import defaultdict
+from multiprocessing import Pool
+
+
+def find_files(paths):
+    """展开目录为其中所有遥测文件（含轮转出的 .jsonl.N）"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "**", "*.jsonl*"), recursive=True))
+        else:
+            files.extend(glob.glob(path))
+    return sorted(set(files))
+
+
+def _new_summary():
+    return {
+        "files": 0,
+        "bad_lines": 0,
+        # 地图 -> 统计量
+        "maps": defaultdict(lambda: {"matches": 0, "wins": 0, "losses": 0, "waves": 0, "shots": 0, "hits": 0, "cover": 0}),
+        # 波次 -> 统计量
+        "waves": defaultdict(lambda: {"count": 0, "duration": 0.0, "damage": 0, "p99": []}),
+        "boss_ttk": [],
+        "frame_p99": [],
+        "levels": [],
+    }
+
+
+def summarize_file(path):
+    """统计单个文件（在工作进程中执行），返回可合并的部分结果"""
+    summary = _new_summary()
+    summary["files"] = 1
+    maps = summary["maps"]
+    waves = summary["waves"]
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                summary["bad_lines"] += 1
+                continue
+            record_type = record.get("type")
+            frame_ms = record.get("frame_ms") or {}
+            if record_type == "match":
+                stats = maps[record.get("map", "未知")]
+                stats["matches"] += 1
+                if record.get("result") == "win":
+                    stats["wins"] += 1
+                elif record.get("result") == "lose":
+                    stats["losses"] += 1
+                stats["waves"] += record.get("waves_reached", 0)
+                stats["shots"] += record.get("shots_fired", 0)
+                stats["hits"] += record.get("shots_hit", 0)
+                stats["cover"] += record.get("cover_destroyed", 0)
+                summary["boss_ttk"].extend(record.get("boss_ttk_s", []))
+                summary["levels"].append(record.get("player_level", 1))
+                if "p99" in frame_ms:
+                    summary["frame_p99"].append(frame_ms["p99"])
+            elif record_type == "wave":
+                stats = waves[record.get("wave", 0)]
+                stats["count"] += 1
+                stats["duration"] += record.get("duration_s", 0.0)
+                stats["damage"] += record.get("damage_taken", 0)
+                if "p99" in frame_ms:
+                    stats["p99"].append(frame_ms["p99"])
+    # defaultdict 的工厂函数是lambda，转成普通dict后才能跨进程传回
+    summary["maps"] = dict(maps)
+    summary["waves"] = dict(waves)
+    return summary
+
+
+def merge(total, part):
+    """把部分结果合并到总结果中"""
+    total["files"] += part["files"]
+    total["bad_lines"] += part["bad_lines"]
+    for name, stats in part["maps"].items():
+        target = total["maps"][name]
+        for key, value in stats.items():
+            target[key] += value
+    for wave, stats in part["waves"].items():
+        target = total["waves"][wave]
+        target["count"] += stats["count"]
+        target["duration"] += stats["duration"]
+        target["damage"] += stats["damage"]
+        target["p99"].extend(stats["p99"])
+    total["boss_ttk"].extend(part["boss_ttk"])
+    total["frame_p99"].extend(part["frame_p99"])
+    total["levels"].extend(part["levels"])
+    return total
+
+
+def summarize(files, workers=None):
+    """并行统计所有文件（文件较少时直接在当前进程处理）"""
+    total = _new_summary()
+    if len(files) < 8 or workers == 1:
+        for path in files:
+            merge(total, summarize_file(path))
+        return total
+    with Pool(workers) as pool:
+        for part in pool.imap_unordered(summarize_file, files, chunksize=16):
+            merge(total, part)
+    return total
+
+
+def _median(values):
+    return statistics.median(values) if values else 0.0
+
+
+def print_report(total, max_waves=20):
+    print(f"文件数: {total['files']}  损坏行: {total['bad_lines']}")
+    matches = sum(stats["matches"] for stats in total["maps"].values())
+    print(f"对局总数: {matches}  平均玩家等级: {statistics.mean(total['levels']) if total['levels'] else 0:.2f}")
+
+    print("\n[地图]")
+    print(f"{'地图':<12} {'对局':>6} {'胜率':>7} {'平均波次':>8} {'命中率':>7} {'场均掩体':>8}")
+    for name, stats in sorted(total["maps"].items(), key=lambda item: -item[1]["matches"]):
+        n = stats["matches"] or 1
+        decided = stats["wins"] + stats["losses"]
+        win_rate = stats["wins"] / decided if decided else 0.0
+        accuracy = stats["hits"] / stats["shots"] if stats["shots"] else 0.0
+        print(f"{name:<12} {stats['matches']:>6} {win_rate:>7.1%} {stats['waves'] / n:>8.2f} "
+              f"{accuracy:>7.1%} {stats['cover'] / n:>8.1f}")
+
+    print("\n[波次]")
+    print(f"{'波次':>4} {'次数':>7} {'平均时长(s)':>11} {'平均掉血':>8} {'帧耗时p99中位数(ms)':>20}")
+    for wave in sorted(total["waves"])[:max_waves]:
+        stats = total["waves"][wave]
+        n = stats["count"] or 1
+        print(f"{wave:>4} {stats['count']:>7} {stats['duration'] / n:>11.1f} {stats['damage'] / n:>8.2f} "
+              f"{_median(stats['p99']):>20.2f}")
+
+    print("\n[BOSS击杀耗时]")
+    if total["boss_ttk"]:
+        ttk = total["boss_ttk"]
+        print(f"样本: {len(ttk)}  中位数: {_median(ttk):.1f}s  平均: {statistics.mean(ttk):.1f}s  最长: {max(ttk):.1f}s")
+    else:
+        print("无数据")
+
+    print("\n[帧耗时]")
+    if total["frame_p99"]:
+        print(f"各局p99中位数: {_median(total['frame_p99']):.2f}ms  最差: {max(total['frame_p99']):.2f}ms")
+    else:
+        print("无数据")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="汇总多台机器的对局遥测文件（JSON Lines）")
+    parser.add_argument("paths", nargs="+", help="遥测文件或目录（目录会递归查找 *.jsonl*）")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数（默认CPU核数）")
+    parser.add_argument("--max-waves", type=int, default=20, help="波次表最多显示的行数")
+    args = parser.parse_args(argv)
+
+    files = find_files(args.paths)
+    if not files:
+        print("未找到遥测文件")
+        return
+    print_report(summarize(files, args.workers), args.max_waves)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import collections
+import hashlib
+import json
+import os
+import threading
+import pygame
+from asset_pack import default_pack, is_pack_path
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".tank_war", "cache", "thumbnails")
+THUMBNAIL_SIZE = (160, 120)  # 预览图尺寸（800x600 地图等比缩小5倍）
+ICON_SIZE = (48, 36)  # 列表中的小图标尺寸
+WORLD_SIZE = (800, 600)
+BACKGROUND = (240, 240, 240)
+BORDER_COLOR = (100, 100, 100)
+CACHE_VERSION = 1  # 绘制方式变化时递增，使旧缓存失效
+
+
+def file_digest(path):
+    """计算地图文件内容的哈希（缓存键）"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def render_thumbnail(map_data, size=THUMBNAIL_SIZE):
+    """根据地图JSON中的障碍物数据绘制缩略图（不需要显示窗口）"""
+    surface = pygame.Surface(size)
+    surface.fill(BACKGROUND)
+    scale_x = size[0] / WORLD_SIZE[0]
+    scale_y = size[1] / WORLD_SIZE[1]
+    for key, default_size, default_color in (("obstacles", 50, (100, 100, 100)),
+                                             ("destroyable_obstacles", 40, (0, 200, 0))):
+        for obs in map_data.get(key, []):
+            try:
+                rect = pygame.Rect(
+                    int(obs.get("x", 0) * scale_x),
+                    int(obs.get("y", 0) * scale_y),
+                    max(1, int(obs.get("width", default_size) * scale_x)),
+                    max(1, int(obs.get("height", default_size) * scale_y)),
+                )
+                pygame.draw.rect(surface, tuple(obs.get("color", default_color)), rect)
+            except (TypeError, ValueError):
+                continue
+    pygame.draw.rect(surface, BORDER_COLOR, surface.get_rect(), 1)
+    return surface
+
+
+class ThumbnailCache:
+    """后台线程生成地图缩略图，按文件内容哈希缓存到磁盘
+
+    主线程只调用 request/get，二者都不会阻塞：缩略图生成完成前 get 返回 None，
+    界面先显示占位框，生成完成后下一帧自动出现。
+    """
+    def __init__(self, cache_dir=None, size=THUMBNAIL_SIZE, icon_size=ICON_SIZE):
+        self.cache_dir = cache_dir or os.environ.get("TANK_WAR_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.size = size
+        self.icon_size = icon_size
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except OSError as e:
+            print(f"[缩略图] 无法创建缓存目录，仅缓存在内存: {e}")
+            self.cache_dir = None
+
+        self._ready = {}  # 地图路径 -> (缩略图, 小图标)
+        self._failed = set()
+        self._queue = collections.deque()
+        self._queued = set()
+        self._generation = {}  # 地图路径 -> 失效次数（生成期间文件被修改时丢弃旧结果）
+        self._cond = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="thumbnails", daemon=True)
+        self._thread.start()
+
+    def request(self, paths, urgent=False):
+        """请求生成缩略图；urgent=True 时插到队首（如当前可见的列表项）"""
+        with self._cond:
+            for path in paths:
+                if path in self._ready or path in self._failed:
+                    continue
+                if urgent:
+                    # 队列中可能已有同一路径，工作线程会跳过已完成的重复项
+                    self._queue.appendleft(path)
+                elif path not in self._queued:
+                    self._queue.append(path)
+                self._queued.add(path)
+            self._cond.notify()
+
+    def get(self, path):
+        """返回 (缩略图, 小图标)，尚未生成时返回 None"""
+        return self._ready.get(path)
+
+    def invalidate(self, path):
+        """地图文件被修改或删除后丢弃内存中的缩略图"""
+        with self._cond:
+            self._ready.pop(path, None)
+            self._failed.discard(path)
+            self._queued.discard(path)
+            self._generation[path] = self._generation.get(path, 0) + 1
+
+    def pending(self):
+        return len(self._queued)
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout=1.0)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._queue:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                path = self._queue.popleft()
+                if path not in self._queued:
+                    continue  # 已完成的重复项或已失效
+                generation = self._generation.get(path, 0)
+            try:
+                thumbnail = self._load_or_render(path)
+                icon = pygame.transform.smoothscale(thumbnail, self.icon_size)
+            except Exception as e:
+                print(f"[缩略图] 生成失败 {os.path.basename(path)}: {e}")
+                with self._cond:
+                    if self._generation.get(path, 0) == generation:
+                        self._queued.discard(path)
+                        self._failed.add(path)
+                continue
+            with self._cond:
+                # 生成期间文件被修改过：丢弃旧结果，重新排队的请求会生成新的缩略图
+                if path in self._queued and self._generation.get(path, 0) == generation:
+                    self._queued.discard(path)
+                    self._ready[path] = (thumbnail, icon)
+
+    def _cache_path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}_{self.size[0]}x{self.size[1]}_v{CACHE_VERSION}.png")
+
+    def _load_or_render(self, path):
+        if is_pack_path(path):
+            # 资源包中的地图在构建时已绘制好缩略图
+            pack = default_pack()
+            thumbnail = pack.thumbnail(path, self.size) if pack is not None else None
+            if thumbnail is None:
+                raise FileNotFoundError(f"资源包中没有缩略图: {path}")
+            return thumbnail
+        digest = file_digest(path)
+        cache_path = self._cache_path(digest) if self.cache_dir else None
+        if cache_path and os.path.exists(cache_path):
+            try:
+                return pygame.image.load(cache_path)
+            except pygame.error:
+                pass  # 缓存文件损坏，重新生成
+
+        with open(path, "r", encoding="utf-8") as f:
+            map_data = json.load(f)
+        thumbnail = render_thumbnail(map_data, self.size)
+        if cache_path:
+            try:
+                # 先写临时文件再替换，避免并发读到半个文件
+                tmp_path = f"{cache_path}.{os.getpid()}.tmp.png"
+                pygame.image.save(thumbnail, tmp_path)
+                os.replace(tmp_path, cache_path)
+            except (OSError, pygame.error) as e:
+                print(f"[缩略图] 写入缓存失败: {e}")
+        return thumbnail
@@ -0,0 +1,301 @@
+import argparse
+import time
+from collections import namedtuple
+import numpy as np
+import pygame
+
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 600
+TILE_SIZE = 8  # 砖块边长（像素），地图宽高须能被整除
+TILE_HP = 1  # 每块砖的默认生命值（地图JSON可用 "tile_hp" 覆盖）
+BLAST_SIZE = 12  # 子弹命中时破坏的范围（以子弹中心为中心的正方形边长）
+MORTAR_COLOR = (60, 60, 60)  # 砖缝颜色
+NO_BLOCK = -1
+
+# 渲染数据包中的地形快照：hp 为只读副本，block/palette 在地形重建前不会改变
+TerrainView = namedtuple("TerrainView", "uid version tile_size max_hp hp block palette")
+
+
+class TileTerrain:
+    """砖块地形：可破坏掩体按 TILE_SIZE 切成砖块，每块砖用 uint8 记录生命值
+
+    子弹只破坏命中位置附近的砖块，碰撞检测是查二维前缀和表，与掩体数量和矩形大小无关。
+    原始掩体作为"砖块组"保留（block 记录每块砖所属的掩体），
+    组内砖块全部被破坏时才算一个掩体被摧毁（用于事件、界面计数和AI掩护点）。
+    """
+    _next_uid = 0
+
+    def __init__(self, width=SCREEN_WIDTH, height=SCREEN_HEIGHT, tile_size=TILE_SIZE, max_hp=TILE_HP):
+        if width % tile_size or height % tile_size:
+            raise ValueError(f"地图尺寸 {width}x{height} 不能被砖块尺寸 {tile_size} 整除")
+        self.tile_size = tile_size
+        self.max_hp = max(1, min(255, int(max_hp)))
+        self.cols = width // tile_size
+        self.rows = height // tile_size
+        self.hp = np.zeros((self.rows, self.cols), np.uint8)
+        self.block = np.full((self.rows, self.cols), NO_BLOCK, np.int32)  # int16 在掩体超过32767个时会溢出
+        self.blocks = []  # 原始掩体（GameObject），下标即 block 中的编号
+        self.block_tiles = np.zeros(0, np.int32)  # 每个掩体剩余的砖块数
+        self.palette = np.zeros((0, 3), np.uint8)
+        self.blocks_left = 0  # 仍有砖块的掩体数量
+        self.version = 0  # 每次有砖块被破坏时递增（渲染据此只重绘变化的砖块）
+        TileTerrain._next_uid += 1
+        self.uid = TileTerrain._next_uid
+        self._snapshot = None
+        self._occupancy = {}
+        self._sums = None  # 存活砖块的二维前缀和（展平的Python列表），地形变化后按需重建
+
+    @classmethod
+    def from_obstacles(cls, obstacles, width=SCREEN_WIDTH, height=SCREEN_HEIGHT, tile_size=TILE_SIZE, max_hp=TILE_HP):
+        """把矩形掩体列表转换为砖块地形（读取现有地图时使用）"""
+        terrain = cls(width, height, tile_size, max_hp)
+        for obstacle in obstacles:
+            terrain.add_block(obstacle)
+        return terrain
+
+    def _span(self, start, end, limit):
+        """像素区间 [start, end) 覆盖的砖块下标区间（按砖块中心取整，尽量保持原尺寸）
+
+        不足半块砖或没有对齐的窄掩体取整后可能一块砖也没有，此时取区间中点所在的砖块，
+        保证非空的掩体至少占一块砖（否则会从碰撞和掩体计数中消失）。
+        """
+        half = self.tile_size // 2
+        first, last = max(0, (start + half) // self.tile_size), min(limit, (end + half) // self.tile_size)
+        if first >= last and end > start:
+            middle = (start + end) // 2 // self.tile_size
+            if 0 <= middle < limit:
+                return middle, middle + 1
+        return first, last
+
+    def _touching(self, rect):
+        """与rect有重叠的砖块下标区间 (行起, 行止, 列起, 列止)"""
+        size = self.tile_size
+        return (max(0, rect.top // size), min(self.rows, (rect.bottom - 1) // size + 1),
+                max(0, rect.left // size), min(self.cols, (rect.right - 1) // size + 1))
+
+    def add_block(self, obstacle):
+        """把一个矩形掩体加入地形（与已有掩体重叠的砖块归属后加入的掩体）"""
+        rect = obstacle.rect.copy()
+        rect.normalize()
+        r0, r1 = self._span(rect.top, rect.bottom, self.rows)
+        c0, c1 = self._span(rect.left, rect.right, self.cols)
+        index = len(self.blocks)
+        self.blocks.append(obstacle)
+        self.palette = np.vstack([self.palette, np.asarray(obstacle.color[:3], np.uint8)])
+        self.block_tiles = np.append(self.block_tiles, 0)
+        if r0 < r1 and c0 < c1:
+            owners = self.block[r0:r1, c0:c1]
+            taken = owners[owners != NO_BLOCK]
+            if taken.size:
+                np.subtract.at(self.block_tiles, taken, 1)
+            owners[...] = index
+            self.hp[r0:r1, c0:c1] = self.max_hp
+            self.block_tiles[index] = (r1 - r0) * (c1 - c0)
+        self.blocks_left = int(np.count_nonzero(self.block_tiles))
+        self._changed()
+        return index
+
+    def _changed(self):
+        self.version += 1
+        self._snapshot = None
+        self._occupancy.clear()
+        self._sums = None
+
+    def _prefix_sums(self):
+        sums = np.zeros((self.rows + 1, self.cols + 1), np.int32)
+        np.cumsum(np.cumsum(self.hp > 0, axis=0), axis=1, out=sums[1:, 1:])
+        self._sums = sums.ravel().tolist()
+        return self._sums
+
+    def live_blocks(self):
+        """仍有砖块的原始掩体"""
+        return [self.blocks[i] for i in np.flatnonzero(self.block_tiles)]
+
+    def collides(self, rect):
+        """rect 是否与任何砖块重叠（前缀和查表，与矩形大小和掩体数量无关）"""
+        x, y, w, h = rect
+        if w <= 0 or h <= 0:
+            if not w or not h:
+                return False  # 与 Rect.colliderect 一致：零宽高的矩形不会碰撞
+            rect = rect.copy()
+            rect.normalize()
+            x, y, w, h = rect
+        size = self.tile_size
+        r0, c0 = y // size, x // size
+        r1, c1 = (y + h - 1) // size + 1, (x + w - 1) // size + 1
+        # 裁剪到地图范围内（热路径上避免调用 min/max）
+        r0 = r0 if r0 > 0 else 0
+        c0 = c0 if c0 > 0 else 0
+        r1 = r1 if r1 < self.rows else self.rows
+        c1 = c1 if c1 < self.cols else self.cols
+        if r0 >= r1 or c0 >= c1:
+            return False
+        sums = self._sums or self._prefix_sums()
+        stride = self.cols + 1
+        return sums[r1 * stride + c1] - sums[r0 * stride + c1] - sums[r1 * stride + c0] + sums[r0 * stride + c0] > 0
+
+    def _damage(self, r0, r1, c0, c1, damage):
+        """对区域内的砖块造成伤害，返回因此被完全摧毁的掩体"""
+        hp = self.hp[r0:r1, c0:c1]
+        alive = hp > 0
+        if not alive.any():
+            return []
+        before = alive.copy()
+        np.subtract(hp, np.minimum(hp, damage), out=hp, where=alive)
+        broken = before & (hp == 0)
+        destroyed = []
+        if broken.any():
+            owners = self.block[r0:r1, c0:c1][broken]
+            owners = owners[owners != NO_BLOCK]
+            if owners.size:
+                counts = np.bincount(owners, minlength=len(self.blocks))
+                was_alive = self.block_tiles > 0
+                self.block_tiles -= counts.astype(np.int32)
+                destroyed = [self.blocks[i] for i in np.flatnonzero(was_alive & (self.block_tiles <= 0))]
+                self.blocks_left -= len(destroyed)
+        self._changed()
+        return destroyed
+
+    def hit(self, rect, damage=1):
+        """子弹命中检测：与砖块重叠时破坏子弹中心附近的砖块
+
+        未命中返回None，命中时返回因此被完全摧毁的原始掩体列表（可能为空）。
+        """
+        if not self.collides(rect):
+            return None
+        blast = pygame.Rect(0, 0, BLAST_SIZE, BLAST_SIZE)
+        blast.center = rect.center
+        r0, r1, c0, c1 = self._touching(blast)
+        return self._damage(r0, r1, c0, c1, damage)
+
+    def clear(self, rect):
+        """移除与rect重叠的全部砖块（例如坦克出生点），返回被完全摧毁的掩体"""
+        r0, r1, c0, c1 = self._touching(rect)
+        if r0 >= r1 or c0 >= c1:
+            return []
+        return self._damage(r0, r1, c0, c1, 255)
+
+    def snapshot(self):
+        """当前地形的只读快照（地形没有变化时返回同一个对象）"""
+        if self._snapshot is None:
+            hp = self.hp.copy()
+            hp.setflags(write=False)
+            block = self.block.view()
+            block.setflags(write=False)
+            palette = self.palette.view()
+            palette.setflags(write=False)
+            self._snapshot = TerrainView(self.uid, self.version, self.tile_size, self.max_hp, hp, block, palette)
+        return self._snapshot
+
+    def draw(self, surface):
+        """直接绘制全部存活的砖块"""
+        view = self.snapshot()
+        rows, cols = np.nonzero(view.hp)
+        draw_tiles(surface, view, rows, cols)
+
+    def occupancy(self, cell):
+        """按 cell 像素一格降采样的占据栅格（任一砖块存活即为True），供训练观测使用"""
+        grid = self._occupancy.get(cell)
+        if grid is None:
+            solid = self.hp > 0
+            rows = np.arange(0, self.rows * self.tile_size, cell) // self.tile_size
+            cols = np.arange(0, self.cols * self.tile_size, cell) // self.tile_size
+            grid = np.logical_or.reduceat(np.logical_or.reduceat(solid, rows, axis=0), cols, axis=1)
+            self._occupancy[cell] = grid
+        return grid
+
+
+def tile_colors(view, rows, cols):
+    """指定砖块的绘制颜色：按所属掩体取色，受损的砖块颜色变暗"""
+    block = view.block[rows, cols]
+    colors = view.palette[np.maximum(block, 0)].astype(np.float32)
+    shade = 0.55 + 0.45 * view.hp[rows, cols] / view.max_hp
+    return (colors * shade[:, None]).astype(np.uint8)
+
+
+def draw_tiles(surface, view, rows, cols, background=None):
+    """绘制指定砖块；已被破坏的砖块用背景色填充（background为None时跳过）"""
+    size = view.tile_size
+    fill = surface.fill
+    colors = tile_colors(view, rows, cols).tolist()
+    for row, col, hp, color in zip(rows.tolist(), cols.tolist(), view.hp[rows, cols].tolist(), colors):
+        rect = (col * size, row * size, size, size)
+        if hp:
+            # 右下各留1像素砖缝，拼出砖墙的样子
+            fill(MORTAR_COLOR, rect)
+            fill(color, (rect[0], rect[1], size - 1, size - 1))
+        elif background is not None:
+            fill(background, rect)
+
+
+class TerrainLayer:
+    """渲染端的地形图层：背景色加全部砖块，地形变化时只重绘变化的砖块
+
+    模拟端只交出只读快照，图层与上一次绘制的快照逐块比较，
+    因此渲染线程丢弃中间的数据包也不会漏画。
+    """
+    def __init__(self, size, background):
+        self.surface = pygame.Surface(size).convert() if pygame.display.get_surface() else pygame.Surface(size)
+        self.background = background
+        self._uid = None
+        self._drawn = None  # 上次绘制时各砖块的生命值
+        self._version = None
+        self.tiles_redrawn = 0  # 最近一次更新重绘的砖块数
+
+    def update(self, view):
+        if view.uid == self._uid and view.version == self._version:
+            self.tiles_redrawn = 0
+            return self.surface
+        if view.uid != self._uid or self._drawn is None or self._drawn.shape != view.hp.shape:
+            # 新地形：整层重画
+            self.surface.fill(self.background)
+            rows, cols = np.nonzero(view.hp)
+        else:
+            rows, cols = np.nonzero(view.hp != self._drawn)
+        draw_tiles(self.surface, view, rows, cols, self.background)
+        self._uid, self._version = view.uid, view.version
+        self._drawn = view.hp.copy()
+        self.tiles_redrawn = len(rows)
+        return self.surface
+
+
+def benchmark(seed=0, covers=(15, 60, 150, 220), queries=20000):
+    """比较矩形列表逐个扫描与砖块数组索引的碰撞检测耗时（掩体越密集差距越大）"""
+    import random
+    from game_objects import GameObject
+    from map_generator import generate_obstacle_rects
+
+    rng = random.Random(seed)
+    results = []
+    for count in covers:
+        rects = generate_obstacle_rects(rng, count, (10, 10, 780, 580), 10, 40, gap=2)
+        obstacles = [GameObject(x, y, w, h, (0, 200, 0)) for x, y, w, h in rects]
+        terrain = TileTerrain.from_obstacles(obstacles)
+        probes = [pygame.Rect(rng.randint(0, 795), rng.randint(0, 595), 5, 5) for _ in range(queries)]
+
+        start = time.perf_counter()
+        for probe in probes:
+            for obstacle in obstacles:
+                if probe.colliderect(obstacle.rect):
+                    break
+        list_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for probe in probes:
+            terrain.collides(probe)
+        tile_time = time.perf_counter() - start
+        results.append((len(obstacles), list_time / queries * 1e6, tile_time / queries * 1e6))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="砖块地形：碰撞检测耗时对比（矩形列表 vs 砖块数组）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=20000)
+    args = parser.parse_args(argv)
+    for count, list_us, tile_us in benchmark(args.seed, queries=args.queries):
+        print(f"掩体 {count:>4} 个: 矩形列表 {list_us:.2f}us/次, 砖块数组 {tile_us:.2f}us/次 ({list_us / tile_us:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import shared_memory
+
+# 离屏导出不需要窗口和声音；必须在导入pygame之前设置
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+
+FRAME_SIZE = (800, 600)
+PIXEL_FORMAT = "RGBX"  # 每像素4字节，可直接作为Surface的像素缓冲区
+BYTES_PER_PIXEL = 4
+FORMATS = ("png", "raw")
+
+# 编码进程的全局状态（由 _init_worker 在每个进程中初始化一次）
+_worker = {}
+
+
+def _init_worker(shm_name, frame_size, fmt, out_path):
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    _worker["shm"] = shared_memory.SharedMemory(name=shm_name)
+    _worker["size"] = frame_size
+    _worker["frame_bytes"] = frame_size[0] * frame_size[1] * BYTES_PER_PIXEL
+    _worker["fmt"] = fmt
+    _worker["out"] = out_path
+    if fmt == "raw":
+        _worker["file"] = open(out_path, "r+b")
+
+
+def _encode(slot, frame_index):
+    """编码共享内存中slot号缓冲区的帧，返回slot以便主进程复用"""
+    frame_bytes = _worker["frame_bytes"]
+    view = _worker["shm"].buf[slot * frame_bytes:(slot + 1) * frame_bytes]
+    try:
+        if _worker["fmt"] == "raw":
+            # 各帧写入固定偏移，多个进程可以乱序写同一个文件
+            f = _worker["file"]
+            f.seek(frame_index * frame_bytes)
+            f.write(view)
+            f.flush()
+        else:
+            surface = pygame.image.frombuffer(view, _worker["size"], PIXEL_FORMAT)
+            path = os.path.join(_worker["out"], f"frame_{frame_index:06d}.png")
+            pygame.image.save(surface, path)
+            del surface
+    finally:
+        view.release()
+    return slot
+
+
+class FrameExporter:
+    """把帧交给编码进程池：帧缓冲区位于共享内存中，渲染直接画进去，不做额外拷贝
+
+    共享内存被划分为若干个槽位（环形缓冲），每个槽位上创建一个以其为像素缓冲区的Surface。
+    主进程在空闲槽位上绘制完一帧后只向进程池提交 (槽位, 帧号)，
+    编码进程按同一块共享内存读取像素并写出PNG或原始视频，完成后归还槽位。
+    """
+    def __init__(self, out_path, fmt="png", workers=None, frame_size=FRAME_SIZE, slots=None):
+        if fmt not in FORMATS:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+        self.out_path = out_path
+        self.fmt = fmt
+        self.frame_size = frame_size
+        self.frame_bytes = frame_size[0] * frame_size[1] * BYTES_PER_PIXEL
+        self.workers = workers or os.cpu_count() or 1
+        slots = slots or self.workers * 2 + 2
+
+        if fmt == "png":
+            os.makedirs(out_path, exist_ok=True)
+        else:
+            open(out_path, "wb").close()
+
+        self._shm = shared_memory.SharedMemory(create=True, size=self.frame_bytes * slots)
+        self._views = [self._shm.buf[i * self.frame_bytes:(i + 1) * self.frame_bytes] for i in range(slots)]
+        self.surfaces = [pygame.image.frombuffer(view, frame_size, PIXEL_FORMAT) for view in self._views]
+        self._free = list(range(slots))
+        self._pending = set()
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self._shm.name, frame_size, fmt, out_path),
+        )
+        self.frames = 0
+        self.wait_time = 0.0  # 因所有槽位都在编码而等待的总时间（秒）
+
+    def _reap(self, block):
+        if not self._pending:
+            return
+        start = time.perf_counter()
+        done, _ = wait(self._pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        if block:
+            self.wait_time += time.perf_counter() - start
+        for future in done:
+            self._pending.discard(future)
+            self._free.append(future.result())  # 编码进程中的异常在此抛出
+
+    def acquire(self):
+        """返回一个空闲槽位号，所有槽位都在编码时阻塞等待"""
+        self._reap(block=False)
+        while not self._free:
+            self._reap(block=True)
+        return self._free.pop()
+
+    def submit(self, slot):
+        """提交已绘制完成的槽位，帧号按提交顺序递增"""
+        self._pending.add(self._pool.submit(_encode, slot, self.frames))
+        self.frames += 1
+
+    def close(self):
+        """等待全部帧编码完成并释放共享内存"""
+        try:
+            while self._pending:
+                self._reap(block=True)
+        finally:
+            self._pool.shutdown()
+            # 先释放引用共享内存的Surface和内存视图，否则无法关闭
+            self.surfaces = []
+            for view in self._views:
+                view.release()
+            self._views = []
+            self._shm.close()
+            self._shm.unlink()
+
+
+def _load_font():
+    try:
+        return pygame.font.SysFont(["SimHei", "WenQuanYi Micro Hei", "Heiti SC", "Arial"], 24)
+    except Exception as e:
+        print(f"加载字体失败: {e}")
+        return pygame.font.Font(None, 24)
+
+
+def export_match(matches, out_path, fmt="png", workers=None, every=1, mode="CLASSIC"):
+    """把逐帧产出的对局渲染并导出，every>1 时每隔若干帧导出一帧（降低输出帧率）"""
+    from sprites import SpriteAtlas
+    from render_pipeline import PacketBuilder, FrameRenderer
+    from particles import ParticleSystem, EVENT_KINDS
+
+    pygame.init()
+    pygame.display.set_mode(FRAME_SIZE)  # dummy驱动下的虚拟窗口，仅用于转换精灵格式
+    renderer = FrameRenderer(None, SpriteAtlas(), _load_font())
+    builder = PacketBuilder()
+    particles = ParticleSystem(seed=0)  # 粒子使用独立的随机数生成器，不影响对局复现
+    exporter = FrameExporter(out_path, fmt, workers)
+    start = time.perf_counter()
+    simulated = 0
+    try:
+        for match in matches:
+            simulated += 1
+            if simulated == 1:
+                match.events.subscribe(particles.handle_events, EVENT_KINDS)
+            particles.update()
+            if (simulated - 1) % every:
+                continue
+            slot = exporter.acquire()
+            renderer.screen = exporter.surfaces[slot]
+            renderer.render(builder.build(match, mode, particles))
+            exporter.submit(slot)
+    finally:
+        renderer.screen = None
+        exporter.close()
+        pygame.quit()
+    elapsed = time.perf_counter() - start
+    return {
+        "simulated": simulated,
+        "exported": exporter.frames,
+        "seconds": elapsed,
+        "wait_seconds": exporter.wait_time,
+        "workers": exporter.workers,
+    }
+
+
+def main(argv=None):
+    from recording import Recording, replay, simulate
+
+    parser = argparse.ArgumentParser(description="离屏渲染对局并导出为图片序列或原始视频")
+    parser.add_argument("out", help="输出路径（png 为目录，raw 为文件）")
+    parser.add_argument("--replay", help="要导出的录像文件（不指定则自动模拟一局）")
+    parser.add_argument("--format", choices=FORMATS, default="png")
+    parser.add_argument("--workers", type=int, default=None, help="编码进程数（默认CPU核数）")
+    parser.add_argument("--every", type=int, default=1, help="每隔几帧导出一帧（2 即 30fps）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--map", default=None, help="模拟使用的地图文件")
+    parser.add_argument("--mode", choices=["CLASSIC", "ENDLESS"], default="CLASSIC")
+    parser.add_argument("--frames", type=int, default=3600, help="模拟的帧数（60帧=1秒）")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        recording = Recording.load(args.replay)
+        matches = replay(recording)
+        mode = recording.mode
+    else:
+        matches = simulate(args.seed, args.map, args.mode, args.frames)
+        mode = args.mode
+
+    stats = export_match(matches, args.out, args.format, args.workers, max(1, args.every), mode)
+    game_seconds = stats["simulated"] / 60
+    print(f"导出 {stats['exported']} 帧（对局 {game_seconds:.1f}s）用时 {stats['seconds']:.1f}s，"
+          f"{game_seconds / stats['seconds'] if stats['seconds'] else 0:.1f}x 实时，编码进程 {stats['workers']} 个，"
+          f"等待编码 {stats['wait_seconds']:.1f}s")
+    if args.format == "raw":
+        fps = 60 // max(1, args.every)
+        print(f"转换为视频: ffmpeg -f rawvideo -pix_fmt rgb0 -s {FRAME_SIZE[0]}x{FRAME_SIZE[1]} -r {fps} "
+              f"-i {args.out} out.mp4")
+
+
+if __name__ == "__main__":
+    main()
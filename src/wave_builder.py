@@ -0,0 +1,160 @@
+import argparse
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import pygame
+from tank import Tank
+
+SPAWN_INTERVAL = 4  # 相邻两个敌人进场间隔的帧数
+SPAWN_ATTEMPTS = 30  # 为每个敌人寻找空闲出生点的最多尝试次数
+ALTERNATES = 2  # 每个敌人额外准备的备用出生点（进场时离玩家太近则改用）
+SAFE_DISTANCE = 120  # 敌人进场时与玩家中心的最小距离
+
+# 预先准备好的一波敌人：tanks 为已构造好的坦克，alternates 为每个坦克的备用出生点
+WavePlan = namedtuple("WavePlan", "wave tanks alternates")
+
+_executor = None  # 所有对局共用的后台线程（准备一波敌人只需几十微秒，一个线程足够）
+
+
+def build_enemies(wave, rng, position=None):
+    """按波次构造敌人坦克（组成和属性随波次增强）；position() 返回出生点，默认在场地中随机"""
+    if position is None:
+        def position():
+            return rng.randint(100, 700), rng.randint(100, 500)
+
+    enemies = []
+    if wave % 5 == 0:
+        # BOSS坦克和2个小弟
+        boss = Tank(400, 100, (128, 0, 128), is_boss=True, rng=rng)  # 紫色BOSS坦克
+        boss.max_health = 10 + (wave // 5) * 2
+        boss.health = boss.max_health
+        boss.speed = 3  # BOSS速度稍快
+        enemies.append(boss)
+        for _ in range(2):
+            x, y = position()
+            minion = Tank(x, y, (255, 165, 0), rng=rng)  # 橙色小弟
+            minion.speed = 2.5
+            minion.max_health = 5
+            minion.health = minion.max_health
+            enemies.append(minion)
+    else:
+        # 普通敌人（1-10个）
+        for _ in range(min(1 + wave // 2, 10)):
+            x, y = position()
+            enemy = Tank(x, y, (255, 0, 0), rng=rng)
+            # 敌人随波次增强
+            enemy.max_health = 3 + (wave // 3)
+            enemy.health = enemy.max_health
+            enemy.speed = 2 + (wave // 5) * 0.5
+            enemy.ai_difficulty = 1 + (wave // 5)  # AI难度提升
+            enemies.append(enemy)
+    return enemies
+
+
+def plan_wave(wave, seed, obstacles, tank_rng):
+    """准备一波敌人：出生点避开障碍物且互不重叠，另备几个备用出生点
+
+    只使用由 seed 生成的随机数，结果与在哪个线程、何时执行无关。
+    """
+    rng = random.Random(seed)
+    taken = []
+
+    def free_position():
+        for _ in range(SPAWN_ATTEMPTS):
+            x, y = rng.randint(100, 700), rng.randint(100, 500)
+            rect = pygame.Rect(x, y, 30, 30)
+            if rect.collidelist(obstacles) == -1 and rect.collidelist(taken) == -1:
+                break
+        taken.append(rect)
+        return x, y
+
+    tanks = build_enemies(wave, tank_rng, free_position)
+    alternates = [() if tank.is_boss else tuple(free_position() for _ in range(ALTERNATES)) for tank in tanks]
+    return WavePlan(wave, tanks, alternates)
+
+
+class WaveBuilder:
+    """在后台线程中提前准备下一波敌人，波次切换时直接取用"""
+    def __init__(self):
+        self._pending = None  # (波次, future)
+
+    def request(self, wave, seed, obstacles, tank_rng):
+        """提交下一波的准备任务（obstacles 为障碍物矩形元组的列表，由调用方在主线程复制）"""
+        global _executor
+        if _executor is None:
+            _executor = ThreadPoolExecutor(1, thread_name_prefix="tank-wave")
+        self._pending = (wave, _executor.submit(plan_wave, wave, seed, obstacles, tank_rng))
+
+    def take(self, wave):
+        """取出准备好的一波敌人；没有对应的请求时返回None（调用方改为当场生成）"""
+        pending, self._pending = self._pending, None
+        if pending is None or pending[0] != wave:
+            return None
+        # 整个上一波期间都在准备，这里通常已经完成；未完成时等待（只需几十微秒），保证结果可复现
+        return pending[1].result()
+
+    def cancel(self):
+        self._pending = None
+
+
+def benchmark(waves=30, seed=0, kill_every=60, window=30):
+    """快速推进无尽模式的波次，比较当场生成与预先准备时波次切换前后几帧的模拟耗时"""
+    from match import Match
+
+    def run(prebuild):
+        match = Match(None, "ENDLESS", verbose=False, rng=random.Random(seed), prebuild_waves=prebuild)
+        transition_ms, window_ms, frame_ms = [], [], []
+        frame = 0
+        since_wave = window
+        while match.current_wave < waves and frame < waves * kill_every * 4:
+            frame += 1
+            match.keep_player_alive()
+            if frame % kill_every == 0:
+                for tank in match.tanks[1:]:
+                    match.damage_tank(tank, tank.health)
+            wave = match.current_wave
+            start = time.perf_counter()
+            match.step()
+            elapsed = (time.perf_counter() - start) * 1000.0
+            if match.current_wave != wave:
+                transition_ms.append(elapsed)
+                since_wave = 0
+            elif since_wave < window:
+                window_ms.append(elapsed)
+                since_wave += 1
+            else:
+                frame_ms.append(elapsed)
+            time.sleep(0)  # 游戏每帧都会在 clock.tick 中等待，让出GIL，后台线程在此期间完成准备
+        return transition_ms, window_ms, frame_ms, match.current_wave
+
+    results = {}
+    for name, prebuild in (("inline", False), ("prebuild", True)):
+        transition_ms, window_ms, frame_ms, reached = run(prebuild)
+        window_ms.sort()
+        frame_ms.sort()
+        results[name] = {
+            "waves": reached,
+            "transition_mean_ms": sum(transition_ms) / len(transition_ms) if transition_ms else 0.0,
+            "window_p99_ms": window_ms[int(len(window_ms) * 0.99)] if window_ms else 0.0,
+            "window_max_ms": window_ms[-1] if window_ms else 0.0,
+            "frame_p99_ms": frame_ms[int(len(frame_ms) * 0.99)] if frame_ms else 0.0,
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="波次预先准备：比较波次切换前后的模拟耗时")
+    parser.add_argument("--waves", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    for name, result in benchmark(args.waves, args.seed).items():
+        label = "当场生成" if name == "inline" else "预先准备"
+        print(f"{label}: 到达第 {result['waves']} 波, 切换帧平均 {result['transition_mean_ms']:.3f}ms, "
+              f"切换后30帧 p99 {result['window_p99_ms']:.3f}ms 最长 {result['window_max_ms']:.3f}ms, "
+              f"其他帧 p99 {result['frame_p99_ms']:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+import argparse
+import time
+from collections import namedtuple
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+from tank_env import (SCREEN_WIDTH, SCREEN_HEIGHT, GRID_CELL, GRID_WIDTH, GRID_HEIGHT,
+                      TANK_FEATURES, BULLET_FEATURES, rasterize_walls, write_features)
+
+DEFAULT_NAME = "tank_war_world"  # 共享内存名称，观战/监控进程按名称连接
+LAYOUT_VERSION = 1
+MAX_TANKS = 64  # 无尽模式后期敌人较多，比训练环境的上限更宽
+MAX_BULLETS = 256
+
+# 界面数值（int32），下标即字段在 hud 数组中的位置
+HUD_FIELDS = ("frame", "mode", "result", "wave", "level", "exp", "enemies_left",
+              "player_health", "player_max_health", "covers_left", "boss_health", "boss_max_health",
+              "tank_count", "bullet_count")
+HUD = {name: i for i, name in enumerate(HUD_FIELDS)}
+MODE_CODES = {"CLASSIC": 0, "ENDLESS": 1}
+RESULT_CODES = {None: 0, "win": 1, "lose": 2}
+
+# 共享内存布局：头部 + 两个槽位（双缓冲）。坦克和子弹特征与训练环境相同（坐标为相对屏幕的比例）
+HEADER_VERSION, HEADER_SEQ, HEADER_CLOSED = 0, 1, 2
+HEADER_BYTES = 8 * 4
+WRITING = -1  # 槽位正在被写入
+SLOT_DTYPE = np.dtype([
+    ("seq", "<i8"),
+    ("hud", "<i4", (len(HUD_FIELDS),)),
+    ("tanks", "<f4", (MAX_TANKS, TANK_FEATURES)),
+    ("bullets", "<f4", (MAX_BULLETS, BULLET_FEATURES)),
+    ("grid", "u1", (GRID_HEIGHT, GRID_WIDTH)),
+], align=True)
+SHM_SIZE = HEADER_BYTES + 2 * SLOT_DTYPE.itemsize
+
+# 一帧世界状态（数组为共享内存上的视图，或 snapshot 返回的副本）
+WorldView = namedtuple("WorldView", "seq hud tanks bullets grid")
+
+
+def _map_layout(shm):
+    """在共享内存上建立头部和两个槽位的NumPy视图"""
+    header = np.ndarray((HEADER_BYTES // 8,), np.int64, shm.buf, 0)
+    slots = np.ndarray((2,), SLOT_DTYPE, shm.buf, HEADER_BYTES)
+    views = [WorldView(i, slots["hud"][i], slots["tanks"][i], slots["bullets"][i], slots["grid"][i]) for i in range(2)]
+    return header, slots, views
+
+
+_published = set()  # 本进程创建的共享内存名称
+
+
+def _attach(name):
+    """连接已存在的共享内存（只读方不应在退出时删除它）"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        # 旧版本中连接方也会被资源跟踪器登记，进程退出时会误删游戏进程的共享内存；
+        # 与发布方同进程时登记属于发布方，不能取消
+        if name not in _published:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class WorldPublisher:
+    """游戏进程每帧把世界状态写入共享内存双缓冲
+
+    第n帧写入槽位 n%2：先把槽位序号标记为写入中，写完数据后再写入序号n，
+    最后更新头部的最新序号。读者按最新序号读取另一个已完成的槽位，
+    该槽位要到两帧之后才会被覆盖，读完后核对槽位序号即可确认数据一致，无需加锁。
+    """
+    def __init__(self, name=DEFAULT_NAME):
+        self.name = name
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=SHM_SIZE)
+        except FileExistsError:
+            # 上次异常退出残留的共享内存：删除后重建
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=SHM_SIZE)
+        _published.add(name)
+        self.header, self.slots, self._views = _map_layout(self._shm)
+        self.header[:] = 0
+        self.slots["seq"] = 0
+        self.header[HEADER_VERSION] = LAYOUT_VERSION
+        self.seq = 0
+        self._wall_grid = np.zeros((GRID_HEIGHT, GRID_WIDTH), dtype=np.uint8)
+        self._wall_key = None
+        self.last_publish_ms = 0.0
+
+    def publish(self, match, mode):
+        """写入当前帧的坦克、子弹、障碍物栅格和界面数值"""
+        start = time.perf_counter()
+        game_map = match.game_map
+        # 不可破坏障碍物只在换图或地图热更新后重新栅格化
+        wall_key = (id(game_map), getattr(game_map, "revision", 0), len(game_map.obstacles))
+        if wall_key != self._wall_key:
+            rasterize_walls(game_map, self._wall_grid)
+            self._wall_key = wall_key
+
+        seq = self.seq + 1
+        index = seq & 1
+        view = self._views[index]
+        self.slots["seq"][index] = WRITING
+        bullet_count = write_features(match, self._wall_grid, view.grid, view.tanks, view.bullets)
+
+        hud = view.hud
+        player = match.player_tank
+        boss = match.boss_tank if match.boss_tank is not None and match.boss_tank.health > 0 else None
+        hud[HUD["frame"]] = match.frame
+        hud[HUD["mode"]] = MODE_CODES.get(mode, 0)
+        hud[HUD["result"]] = RESULT_CODES.get(match.result, 0)
+        hud[HUD["wave"]] = match.current_wave
+        hud[HUD["level"]] = match.player_level
+        hud[HUD["exp"]] = match.player_exp
+        hud[HUD["enemies_left"]] = len(match.alive_enemies())
+        hud[HUD["player_health"]] = player.health
+        hud[HUD["player_max_health"]] = player.max_health
+        hud[HUD["covers_left"]] = game_map.cover_count()
+        hud[HUD["boss_health"]] = boss.health if boss else 0
+        hud[HUD["boss_max_health"]] = boss.max_health if boss else 0
+        hud[HUD["tank_count"]] = min(len(match.tanks), MAX_TANKS)
+        hud[HUD["bullet_count"]] = bullet_count
+
+        self.slots["seq"][index] = seq
+        self.header[HEADER_SEQ] = seq  # 最后写入：读者看到新序号时对应槽位已完整
+        self.seq = seq
+        self.last_publish_ms = (time.perf_counter() - start) * 1000
+
+    def close(self):
+        """通知读者游戏已退出并删除共享内存"""
+        if self._shm is None:
+            return
+        self.header[HEADER_CLOSED] = 1
+        # 先释放引用共享内存的数组，否则无法关闭
+        self.header = self.slots = self._views = None
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+        _published.discard(self.name)
+
+
+class WorldReader:
+    """在其他进程中映射共享内存读取世界状态，不复制、不反序列化"""
+    def __init__(self, name=DEFAULT_NAME):
+        self._shm = _attach(name)  # 游戏未运行时抛出 FileNotFoundError
+        self.header, self.slots, self._views = _map_layout(self._shm)
+        if self.header[HEADER_VERSION] != LAYOUT_VERSION:
+            self.close()
+            raise ValueError("共享内存布局版本不匹配")
+
+    @property
+    def seq(self):
+        """最新已完成的帧序号（0表示还没有数据）"""
+        return int(self.header[HEADER_SEQ])
+
+    @property
+    def closed(self):
+        return bool(self.header[HEADER_CLOSED])
+
+    def latest(self):
+        """返回最新一帧的零拷贝视图（没有数据时返回None）
+
+        视图中的数据在两帧后会被覆盖，读完后用 valid() 确认读取期间没有被改写。
+        """
+        while True:
+            seq = self.seq
+            if seq == 0:
+                return None
+            index = seq & 1
+            if self.slots["seq"][index] == seq:
+                return self._views[index]._replace(seq=seq)
+            # 读取头部后写入方已经开始覆盖该槽位（读者落后两帧以上），重新读取
+
+    def valid(self, view):
+        """view 对应的槽位是否仍然保存着同一帧"""
+        return self.slots["seq"][view.seq & 1] == view.seq
+
+    def snapshot(self):
+        """复制最新一帧并确认数据一致（需要长期保存时使用）"""
+        while True:
+            view = self.latest()
+            if view is None:
+                return None
+            copy = WorldView(view.seq, view.hud.copy(), view.tanks.copy(), view.bullets.copy(), view.grid.copy())
+            if self.valid(view):
+                return copy
+
+    def wait(self, after_seq, timeout=1.0, interval=0.001):
+        """等待序号大于 after_seq 的新帧，超时或游戏退出时返回None"""
+        deadline = time.monotonic() + timeout
+        while self.seq <= after_seq:
+            if self.closed or time.monotonic() >= deadline:
+                return None
+            time.sleep(interval)
+        return self.latest()
+
+    def close(self):
+        if self._shm is None:
+            return
+        self.header = self.slots = self._views = None
+        self._shm.close()
+        self._shm = None
+
+
+def _open_reader(name, timeout=10.0):
+    """等待游戏进程创建共享内存"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return WorldReader(name)
+        except FileNotFoundError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.2)
+
+
+def watch(name=DEFAULT_NAME, seconds=None):
+    """实时统计面板：每秒打印一次帧率、波次、敌人和子弹数量"""
+    reader = _open_reader(name)
+    print(f"已连接共享内存: {name}")
+    start = last_report = time.monotonic()
+    last_seq = reader.seq
+    frames = skipped = 0
+    try:
+        while seconds is None or time.monotonic() - start < seconds:
+            view = reader.wait(last_seq)
+            if view is None:
+                if reader.closed:
+                    print("游戏已退出")
+                    break
+                continue
+            skipped += max(0, view.seq - last_seq - 1)
+            frames += 1
+            last_seq = view.seq
+            hud = view.hud
+            line = (f"帧 {hud[HUD['frame']]}  波次 {hud[HUD['wave']]}  敌方剩余 {hud[HUD['enemies_left']]}  "
+                    f"玩家生命 {hud[HUD['player_health']]}/{hud[HUD['player_max_health']]}  "
+                    f"子弹 {hud[HUD['bullet_count']]}  掩体 {hud[HUD['covers_left']]}")
+            if not reader.valid(view):
+                continue  # 读取期间被覆盖（读者太慢），丢弃这一帧
+            now = time.monotonic()
+            if now - last_report >= 1.0:
+                print(f"{line}  | 接收 {frames / (now - last_report):.0f} 帧/秒, 跳过 {skipped}")
+                last_report, frames, skipped = now, 0, 0
+    finally:
+        reader.close()
+
+
+def spectate(name=DEFAULT_NAME, scale=1.0):
+    """观战窗口：按共享内存中的栅格、坦克和子弹绘制简化画面"""
+    import pygame
+    reader = _open_reader(name)
+    pygame.init()
+    width, height = int(SCREEN_WIDTH * scale), int(SCREEN_HEIGHT * scale)
+    screen = pygame.display.set_mode((width, height))
+    pygame.display.set_caption("坦克大战 - 观战")
+    clock = pygame.time.Clock()
+    cell = GRID_CELL * scale
+    palette = np.array([(240, 240, 240), (100, 100, 100), (0, 160, 0)], np.uint8)
+    last_seq = 0
+    try:
+        while not reader.closed:
+            if any(event.type == pygame.QUIT for event in pygame.event.get()):
+                break
+            view = reader.wait(last_seq, timeout=0.1)
+            if view is None:
+                continue
+            last_seq = view.seq
+            # 栅格按颜色表直接放大为背景
+            background = pygame.surfarray.make_surface(palette[view.grid.T])
+            screen.blit(pygame.transform.scale(background, (width, height)), (0, 0))
+            count = view.hud[HUD["tank_count"]]
+            for alive, x, y, dx, dy, health, is_player, is_boss, _ in view.tanks[:count].tolist():
+                if not alive:
+                    continue
+                color = (0, 200, 0) if is_player else (128, 0, 128) if is_boss else (220, 0, 0)
+                center = (x * width, y * height)
+                radius = cell * (1.2 if is_boss else 0.8)
+                pygame.draw.circle(screen, color, center, radius)
+                pygame.draw.line(screen, (0, 0, 0), center, (center[0] + dx * radius * 1.5, center[1] + dy * radius * 1.5), 2)
+            for active, x, y, _, _, from_player in view.bullets[:view.hud[HUD["bullet_count"]]].tolist():
+                if active:
+                    pygame.draw.circle(screen, (0, 0, 255) if from_player else (0, 0, 0), (x * width, y * height), 3)
+            pygame.display.flip()
+            clock.tick(60)
+    finally:
+        reader.close()
+        pygame.quit()
+
+
+def benchmark(frames=3000, mode="ENDLESS", seed=0, name=DEFAULT_NAME):
+    """在自动对局中每帧发布世界状态，比较发布耗时与模拟一帧的耗时"""
+    import os
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    from recording import simulate
+
+    publisher = WorldPublisher(name)
+    reader = WorldReader(name)
+    step_ms, publish_ms = [], []
+    checked = 0
+    try:
+        matches = simulate(seed, None, mode, frames)
+        while True:
+            start = time.perf_counter()
+            match = next(matches, None)
+            if match is None:
+                break
+            step_ms.append((time.perf_counter() - start) * 1000)
+            match.keep_player_alive()
+            publisher.publish(match, mode)
+            publish_ms.append(publisher.last_publish_ms)
+            # 同进程读者校验数据与对局一致
+            view = reader.latest()
+            if view.hud[HUD["frame"]] == match.frame and reader.valid(view):
+                checked += 1
+    finally:
+        reader.close()
+        publisher.close()
+
+    def stats(values):
+        ordered = sorted(values)
+        return sum(values) / len(values), ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+    return {"frames": len(step_ms), "checked": checked, "step_ms": stats(step_ms), "publish_ms": stats(publish_ms)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="共享内存世界状态：观战窗口、实时统计与发布开销测试")
+    parser.add_argument("command", choices=["watch", "spectate", "bench"], help="watch: 实时统计; spectate: 观战窗口; bench: 发布开销")
+    parser.add_argument("--name", default=DEFAULT_NAME, help="共享内存名称")
+    parser.add_argument("--seconds", type=float, default=None, help="watch: 运行时长（默认直到游戏退出）")
+    parser.add_argument("--scale", type=float, default=1.0, help="spectate: 窗口缩放")
+    parser.add_argument("--frames", type=int, default=3000, help="bench: 模拟帧数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "watch":
+        watch(args.name, args.seconds)
+    elif args.command == "spectate":
+        spectate(args.name, args.scale)
+    else:
+        result = benchmark(args.frames, seed=args.seed, name=args.name)
+        step_mean, step_p99 = result["step_ms"]
+        publish_mean, publish_p99 = result["publish_ms"]
+        print(f"帧数: {result['frames']}  读者校验通过: {result['checked']}")
+        print(f"模拟一帧: 平均 {step_mean:.3f}ms  p99 {step_p99:.3f}ms")
+        print(f"发布一帧: 平均 {publish_mean:.3f}ms  p99 {publish_p99:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()